@@ -3,13 +3,19 @@
 仅管理员可访问
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Optional
 from app.core.database import get_db
-from app.core.security import get_current_active_user, require_role
+from app.core.pagination import Page, PageParams, paginate
+from app.core.security import get_current_active_user, require_role, invalidate_principal
 from app.models.user import User, UserRole
 from app.models.course import Course
+from app.core.model_manager import model_manager
+from app.core.service_registry import service_registry
+from app.core.worker_pool import model_worker_pool
+from app.services.semantic_cache_service import semantic_cache_service
 
 router = APIRouter(prefix="/api/admin", tags=["管理员"])
 
@@ -32,26 +38,27 @@ class UserUpdateRequest(BaseModel):
     is_active: Optional[bool] = None
     role: Optional[str] = None
 
-@router.get("/users", response_model=List[UserResponse])
+def user_to_dict(user: User) -> dict:
+    """用户信息序列化"""
+    return {
+        "id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role.value,
+        "is_active": user.is_active,
+        "institution": user.institution,
+        "created_at": user.created_at.isoformat() if user.created_at else None
+    }
+
+@router.get("/users", response_model=Page[UserResponse])
 async def get_all_users(
+    page: PageParams = Depends(),
     current_user: User = Depends(require_role(UserRole.ADMIN)),
     db: Session = Depends(get_db)
 ):
-    """获取所有用户列表（仅管理员）"""
-    users = db.query(User).order_by(User.created_at.desc()).all()
-    return [
-        {
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "full_name": user.full_name,
-            "role": user.role.value,
-            "is_active": user.is_active,
-            "institution": user.institution,
-            "created_at": user.created_at.isoformat() if user.created_at else None
-        }
-        for user in users
-    ]
+    """获取用户列表（仅管理员），按注册时间倒序分页"""
+    return paginate(db, select(User), [(User.id, True)], page, user_to_dict)
 
 @router.put("/users/{user_id}")
 async def update_user(
@@ -76,17 +83,9 @@ async def update_user(
     
     db.commit()
     db.refresh(user)
+    await invalidate_principal(user.id)
     
-    return {
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "full_name": user.full_name,
-        "role": user.role.value,
-        "is_active": user.is_active,
-        "institution": user.institution,
-        "created_at": user.created_at.isoformat() if user.created_at else None
-    }
+    return user_to_dict(user)
 
 @router.delete("/users/{user_id}")
 async def delete_user(
@@ -105,25 +104,108 @@ async def delete_user(
     
     db.delete(user)
     db.commit()
+    await invalidate_principal(user_id)
     
     return {"message": "用户已删除"}
 
-@router.get("/courses", response_model=List[dict])
+@router.get("/courses", response_model=Page[dict])
 async def get_all_courses(
+    page: PageParams = Depends(),
     current_user: User = Depends(require_role(UserRole.ADMIN)),
     db: Session = Depends(get_db)
 ):
-    """获取所有课程（仅管理员）"""
-    courses = db.query(Course).order_by(Course.created_at.desc()).all()
-    return [
-        {
+    """获取课程列表（仅管理员），按创建时间倒序分页"""
+    return paginate(
+        db, select(Course), [(Course.id, True)], page,
+        lambda course: {
             "id": course.id,
             "name": course.name,
             "description": course.description,
             "teacher_id": course.teacher_id,
             "created_at": course.created_at.isoformat() if course.created_at else None
         }
-        for course in courses
-    ]
+    )
+
+@router.get("/models")
+async def get_model_residency(
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """
+    查看本地模型驻留情况：内存占用、加载耗时、最近使用时间，以及服务单例的构建状态（仅管理员）
+    启用推理进程池时模型加载在worker进程中，返回各worker上报的驻留情况
+    """
+    if model_worker_pool.enabled:
+        return {
+            "worker_pool": True,
+            "pinned_models": sorted(model_worker_pool.pinned_models),
+            "workers": model_worker_pool.residency(),
+            "services": service_registry.stats()
+        }
+    return {
+        "worker_pool": False,
+        "memory": model_manager.memory_status(),
+        "models": model_manager.list_models(),
+        "services": service_registry.stats()
+    }
+
+@router.get("/model-workers")
+async def get_model_workers(
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """查看模型推理进程池状态：队列深度、worker存活与回收、超时统计、各worker常驻的模型（仅管理员）"""
+    return model_worker_pool.stats()
+
+async def apply_model_action(action: str, model_name: str) -> dict:
+    """在模型所在的进程中执行管理操作：未启用进程池时为API进程，否则为每个worker"""
+    if not model_worker_pool.enabled:
+        try:
+            return model_manager.apply_action(action, model_name)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    
+    results = await model_worker_pool.apply_model_action(action, model_name)
+    if not any("result" in r for r in results):
+        if results and all(r.get("exc_type") == "ValueError" for r in results):
+            raise HTTPException(status_code=404, detail=results[0]["error"])
+        raise HTTPException(status_code=503, detail={"message": "模型推理进程未完成操作", "workers": results})
+    return {"model": model_name, "workers": results}
+
+@router.post("/models/{model_name}/pin")
+async def pin_model(
+    model_name: str,
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """固定模型，不参与LRU卸载（仅管理员）"""
+    return await apply_model_action("pin", model_name)
+
+@router.post("/models/{model_name}/unpin")
+async def unpin_model(
+    model_name: str,
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """取消固定模型（仅管理员）"""
+    return await apply_model_action("unpin", model_name)
 
+@router.delete("/models/{model_name}")
+async def unload_model(
+    model_name: str,
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """手动卸载模型（仅管理员）"""
+    return await apply_model_action("unload", model_name)
 
+@router.get("/semantic-cache")
+async def get_semantic_cache_stats(
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """查看语义缓存命中率和各课程的缓存条目数（当前进程，仅管理员）"""
+    return semantic_cache_service.stats()
+
+@router.delete("/semantic-cache")
+async def purge_semantic_cache(
+    course_id: Optional[int] = None,
+    current_user: User = Depends(require_role(UserRole.ADMIN))
+):
+    """清除一个课程的语义缓存，不指定课程时全部清除（如课程内容更新后，仅管理员）"""
+    purged = await semantic_cache_service.purge(course_id)
+    return {"course_id": course_id, "purged": purged}
@@ -9,6 +9,7 @@ from app.core.database import get_db
 from app.core.security import get_current_active_user
 from app.models.user import User
 from app.services.audio_service import audio_service
+from app.core.worker_pool import run_model_task
 import os
 import aiofiles
 from app.core.config import settings
@@ -63,7 +64,11 @@ async def analyze_audio(
             await f.write(content)
         
         # 分析音频
-        result = audio_service.analyze_audio(audio_path, scene_context)
+        result = await run_model_task(
+            "app.services.audio_service:audio_service.analyze_audio",
+            audio_path,
+            scene_context
+        )
         
         return AudioAnalysisResponse(
             success=True,
@@ -73,6 +78,10 @@ async def analyze_audio(
             music_suggestions=result.get("music_suggestions", {})
         )
     
+    except HTTPException:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        raise
     except Exception as e:
         # 确保清理临时文件
         if os.path.exists(audio_path):
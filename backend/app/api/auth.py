@@ -3,17 +3,19 @@
 """
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import timedelta
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.core.security import (
-    verify_password,
-    get_password_hash,
+    password_hasher,
     create_access_token,
     get_current_active_user,
-    require_role
+    require_role,
+    invalidate_principal
 )
 from app.core.config import settings
 from app.models.user import User, UserRole
@@ -49,24 +51,27 @@ class Token(BaseModel):
     token_type: str
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """用户注册"""
     # 检查用户名是否已存在
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User).where(User.username == user_data.username)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户名已存在"
         )
     
     # 检查邮箱是否已存在
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User).where(User.email == user_data.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="邮箱已被注册"
         )
     
+    # 结束只读事务，计算密码哈希期间不占用数据库连接
+    await db.commit()
+    
     # 创建新用户
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -77,8 +82,7 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     
     # 注册成功后自动登录，返回token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -92,10 +96,10 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """用户登录"""
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = await db.scalar(select(User).where(User.username == form_data.username))
     
     if not user:
         raise HTTPException(
@@ -104,7 +108,9 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    password_valid = verify_password(form_data.password, user.hashed_password)
+    # 结束只读事务，验证密码期间不占用数据库连接
+    await db.commit()
+    password_valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
     
     if not password_valid:
         raise HTTPException(
@@ -119,6 +125,11 @@ async def login(
             detail="用户已被禁用"
         )
     
+    # 旧格式（bcrypt）或迭代次数不足的哈希，登录成功后升级为当前默认方案
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username, "role": user.role.value},
@@ -158,6 +169,11 @@ async def update_user_profile(
     db: Session = Depends(get_db)
 ):
     """更新用户个人信息"""
+    # current_user来自principal缓存，未绑定会话，修改前重新加载
+    current_user = db.get(User, current_user.id)
+    if current_user is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    
     # 更新用户名（如果提供）
     if user_update.username is not None:
         # 检查用户名是否已被其他用户使用
@@ -183,6 +199,7 @@ async def update_user_profile(
     
     db.commit()
     db.refresh(current_user)
+    await invalidate_principal(current_user.id)
     return current_user
 
 @router.post("/me/avatar")
@@ -219,9 +236,10 @@ async def upload_avatar(
     
     # 更新用户头像URL（相对路径）
     avatar_url = f"/media/avatars/{file_name}"
-    current_user.avatar_url = avatar_url
+    user = db.get(User, current_user.id)
+    user.avatar_url = avatar_url
     db.commit()
-    db.refresh(current_user)
+    await invalidate_principal(user.id)
     
     return {
         "avatar_url": avatar_url,
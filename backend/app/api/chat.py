@@ -1,18 +1,31 @@
 """
 智能对话API
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import uuid
 import json
+import time
+import asyncio
+import anyio
 from datetime import datetime
-from app.services.ai_service import ai_service
+from app.services.ai_service import ai_service, is_mock_reply, STREAM_INTERRUPTED_NOTE
+from app.services.chat_memory_service import chat_memory_service, estimate_tokens
+from app.services.message_store import message_store
+from app.services.semantic_cache_service import semantic_cache_service
 from app.models.chat import Conversation, Message
-from app.core.database import get_db
+from app.models.course import Course, CourseEnrollment
+from app.core.database import get_async_db, AsyncSessionLocal
 from app.core.security import get_current_active_user
-from app.models.user import User
+from app.core.pagination import PageParams, apaginate
+from app.core.config import settings
+from app.core.stream_coalescer import FrameCoalescer, json_chunk_frame, binary_chunk_frame
+from app.models.user import User, UserRole
 
 router = APIRouter()
 
@@ -27,6 +40,8 @@ class ChatRequest(BaseModel):
     message: str
     conversation_id: Optional[str] = None
     stream: bool = False
+    course_id: Optional[int] = None  # 语义缓存按课程隔离
+    use_cache: bool = True  # 为false时不使用语义缓存（如学生要求重新回答）
 
 class ChatResponse(BaseModel):
     """聊天响应模型"""
@@ -35,6 +50,30 @@ class ChatResponse(BaseModel):
     role: str
     timestamp: str
 
+class StreamStats:
+    """一次流式回复的耗时统计：首字延迟（TTFT）和生成速度"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_chunk_at: Optional[float] = None
+    
+    def on_chunk(self):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+    
+    def finish(self, content: str) -> dict:
+        finished = time.perf_counter()
+        tokens = estimate_tokens(content)
+        first = self.first_chunk_at or finished
+        # 生成速度从第一个token算起，不包含排队和首字等待时间
+        generation_seconds = finished - first
+        return {
+            "ttft_ms": round((first - self.started) * 1000, 1),
+            "duration_ms": round((finished - self.started) * 1000, 1),
+            "tokens": tokens,
+            "tokens_per_second": round(tokens / generation_seconds, 1) if generation_seconds > 0 else None
+        }
+
 # WebSocket连接管理
 class ConnectionManager:
     def __init__(self):
@@ -52,74 +91,219 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+async def check_course_access(db: AsyncSession, course_id: int, current_user: User):
+    """检查用户能否访问课程（语义缓存按课程隔离，不能读写其他课程的缓存）"""
+    course = await db.get(Course, course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="课程不存在")
+    
+    # 教师只能使用自己的课程，学生只能使用已加入的课程
+    if current_user.role == UserRole.STUDENT:
+        enrollment = await db.scalar(select(CourseEnrollment.id).where(
+            CourseEnrollment.course_id == course_id,
+            CourseEnrollment.student_id == current_user.id
+        ))
+        if not enrollment:
+            raise HTTPException(status_code=403, detail="无权访问此课程")
+    elif current_user.role == UserRole.TEACHER and course.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="无权访问此课程")
+
+async def start_turn(
+    db: AsyncSession,
+    request: ChatRequest,
+    current_user: User
+) -> Tuple[Conversation, str, List[Dict[str, str]]]:
+    """获取或创建会话并保存用户消息，返回（会话, 会话ID, 发给大模型的消息）"""
+    if request.course_id is not None:
+        await check_course_access(db, request.course_id, current_user)
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    conversation = await db.scalar(select(Conversation).where(
+        Conversation.session_id == conversation_id
+    ))
+    
+    if not conversation:
+        conversation = Conversation(
+            session_id=conversation_id,
+            title=request.message[:50]  # 使用第一条消息作为标题
+        )
+        db.add(conversation)
+        await db.commit()
+        await db.refresh(conversation)
+    
+    # 先写入本会话在队列中尚未保存的消息（如上一轮的流式回复），保证读取到完整的历史
+    await message_store.flush(conversation.id)
+    
+    # 保存用户消息
+    user_message = Message(
+        conversation_id=conversation.id,
+        role="user",
+        content=request.message
+    )
+    db.add(user_message)
+    await db.commit()
+    
+    # 最近几轮原文 + 更早消息的摘要（提示词长度与历史长度无关）
+    formatted_messages = await chat_memory_service.load_context(db, conversation.id)
+    # 结束只读事务，等待大模型期间不占用数据库连接
+    await db.commit()
+    return conversation, conversation_id, formatted_messages
+
+async def lookup_cached_answer(
+    request: ChatRequest,
+    formatted_messages: List[Dict[str, str]]
+) -> Tuple[Optional[Dict[str, Any]], Optional[Callable[[str], None]]]:
+    """
+    查找语义缓存，返回（命中的缓存条目, 未命中时写入缓存的回调）
+    只有没有上下文的问题（会话第一轮）使用缓存，回答不依赖之前的对话
+    """
+    if not (semantic_cache_service.enabled and request.use_cache
+            and semantic_cache_service.is_cacheable(formatted_messages)):
+        return None, None
+    # 没有可用的大模型时回复是模拟内容，不使用缓存（首次检查Ollama会同步探测HTTP服务，在线程中执行）
+    if not await asyncio.to_thread(ai_service.is_llm_available):
+        return None, None
+    hit, vector = await semantic_cache_service.lookup(request.message, request.course_id)
+    if hit is not None or vector is None:
+        return hit, None
+    return None, lambda answer: semantic_cache_service.store(request.message, answer, vector, request.course_id)
+
+def cache_metadata(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """缓存命中的回复在消息元数据中记录来源"""
+    return {"semantic_cache": {"similarity": hit["similarity"], "question": hit["question"]}}
+
+def sse_event(event: str, data: dict) -> str:
+    """格式化一个Server-Sent Events事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def sse_chat_events(
+    conversation_id: int,
+    session_id: str,
+    formatted_messages: List[Dict[str, str]],
+    cached: Optional[Dict[str, Any]] = None,
+    on_complete: Optional[Callable[[str], None]] = None
+):
+    """
+    流式回复的SSE事件：start → chunk（按时间/大小合并的增量）… → end（含TTFT等指标）或 error
+    大模型的流在单独的任务中读取；客户端断开时本生成器被取消，随之取消该任务，关闭到大模型的上游请求
+    cached为语义缓存命中的条目时直接发送缓存的回答；on_complete在大模型完整生成回复后调用（写入语义缓存）
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    coalescer = FrameCoalescer(queue.put)
+    stats = StreamStats()
+    parts: List[str] = []
+    mocked = False  # 大模型调用失败时回复为模拟内容
+    
+    async def cached_stream():
+        yield cached["answer"]
+    
+    async def produce():
+        nonlocal mocked
+        try:
+            source = cached_stream() if cached else ai_service.stream_chat_completion(formatted_messages)
+            async for chunk in source:
+                mocked = mocked or is_mock_reply(chunk)
+                stats.on_chunk()
+                parts.append(chunk)
+                await coalescer.push(chunk)
+            await coalescer.close()
+        finally:
+            queue.put_nowait(None)
+    
+    producer = asyncio.create_task(produce())
+    completed = False
+    try:
+        yield sse_event("start", {"conversation_id": session_id, "role": "assistant"})
+        while (content := await queue.get()) is not None:
+            yield sse_event("chunk", {"content": content})
+        await producer
+        completed = True
+        
+        ai_content = "".join(parts)
+        metrics = stats.finish(ai_content)
+        metrics["frames"] = coalescer.frames
+        metrics["cached"] = cached is not None
+        print(
+            f"[Chat] 会话 {conversation_id} SSE回复{'（语义缓存）' if cached else ''}: TTFT {metrics['ttft_ms']:.0f} ms，"
+            f"{metrics['tokens']} tokens，{metrics['tokens_per_second'] or 0:.1f} tokens/s"
+        )
+        if on_complete and not mocked and STREAM_INTERRUPTED_NOTE not in ai_content:
+            on_complete(ai_content)
+        saved = await message_store.add(
+            conversation_id, "assistant", ai_content, message_metadata=cache_metadata(cached) if cached else None
+        )
+        yield sse_event("end", {"conversation_id": session_id, "metrics": metrics})
+        # 结束事件已发出，关闭响应前等待回复写入（随后响应的后台任务更新摘要）
+        await saved
+    except Exception as e:
+        completed = True
+        yield sse_event("error", {"message": str(e)})
+    finally:
+        coalescer.cancel()
+        producer.cancel()
+        with anyio.CancelScope(shield=True):
+            # 等待上游请求关闭
+            await asyncio.gather(producer, return_exceptions=True)
+            if not completed and parts:
+                # 客户端中途断开：保存已生成的部分回复
+                await message_store.add(
+                    conversation_id, "assistant", "".join(parts), message_metadata={"interrupted": True}
+                )
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """普通聊天接口"""
+    """
+    普通聊天接口
+    stream为true时返回 text/event-stream（SSE），增量生成后立即发送，适用于不方便使用WebSocket的代理环境
+    """
     try:
-        # 获取或创建会话
-        conversation_id = request.conversation_id or str(uuid.uuid4())
-        conversation = db.query(Conversation).filter(
-            Conversation.session_id == conversation_id
-        ).first()
+        conversation, conversation_id, formatted_messages = await start_turn(db, request, current_user)
+        cached, store_answer = await lookup_cached_answer(request, formatted_messages)
         
-        if not conversation:
-            conversation = Conversation(
-                session_id=conversation_id,
-                title=request.message[:50]  # 使用第一条消息作为标题
+        if request.stream:
+            return StreamingResponse(
+                sse_chat_events(conversation.id, conversation_id, formatted_messages, cached, store_answer),
+                media_type="text/event-stream",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no"  # 关闭nginx的响应缓冲
+                },
+                # 回复发送完成后把移出窗口的旧消息并入摘要（客户端中途断开时不执行）
+                background=BackgroundTask(chat_memory_service.compact, conversation.id)
             )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-        
-        # 保存用户消息
-        user_message = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.message
-        )
-        db.add(user_message)
-        
-        # 获取对话历史
-        history = db.query(Message).filter(
-            Message.conversation_id == conversation.id
-        ).order_by(Message.created_at).all()
-        
-        # 格式化消息
-        messages = []
-        for msg in history:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # 添加当前用户消息
-        messages.append({
-            "role": "user",
-            "content": request.message
-        })
         
-        # 调用AI服务
-        formatted_messages = ai_service.format_messages(messages)
-        response = await ai_service.chat_completion(formatted_messages)
-        
-        # 获取AI回复
-        if hasattr(response, 'choices') and len(response.choices) > 0:
-            ai_content = response.choices[0].message.content
+        if cached:
+            # 语义缓存命中：相似的问题已经回答过，不调用大模型
+            ai_content = cached["answer"]
         else:
-            ai_content = str(response)
+            # 调用AI服务
+            response = await ai_service.chat_completion(formatted_messages)
+            
+            # 获取AI回复
+            if hasattr(response, 'choices') and len(response.choices) > 0:
+                ai_content = response.choices[0].message.content
+            else:
+                ai_content = str(response)
+            # 大模型调用失败时返回的是模拟回复，不写入缓存
+            if store_answer and not is_mock_reply(response):
+                store_answer(ai_content)
         
         # 保存AI回复
         ai_message = Message(
             conversation_id=conversation.id,
             role="assistant",
-            content=ai_content
+            content=ai_content,
+            message_metadata=cache_metadata(cached) if cached else None
         )
         db.add(ai_message)
-        db.commit()
+        await db.commit()
+        
+        # 回复发送后把移出窗口的旧消息并入摘要
+        background_tasks.add_task(chat_memory_service.compact, conversation.id)
         
         return ChatResponse(
             conversation_id=conversation_id,
@@ -128,27 +312,51 @@ async def chat(
             timestamp=datetime.now().isoformat()
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+async def fold_summary(conversation_id: int, previous: Optional[str], older: List[dict]) -> Optional[str]:
+    """把移出窗口的消息并入摘要，等这些消息写入数据库后保存摘要进度"""
+    summary = await chat_memory_service.summarize(previous, older)
+    try:
+        message_id = await older[-1]["saved"]
+        await chat_memory_service.save_summary(conversation_id, summary, message_id)
+    except Exception as e:
+        print(f"⚠️  会话 {conversation_id} 摘要保存失败: {e}")
+    return summary
+
 @router.websocket("/chat/ws")
 async def websocket_chat(websocket: WebSocket):
-    """WebSocket聊天接口（WebSocket不支持Depends，需要手动验证token）"""
+    """
+    WebSocket聊天接口（WebSocket不支持Depends，需要手动验证token）
+    回复增量按时间/大小合并成帧发送；?frames=binary 时增量以UTF-8二进制帧发送，控制消息仍为JSON文本帧
+    消息由 message_store 在后台批量写入，连接期间不占用数据库会话；最近的对话窗口和摘要保存在内存中
+    """
     await manager.connect(websocket)
     conversation_id = str(uuid.uuid4())
-    from app.core.database import SessionLocal
-    db = SessionLocal()
+    frame_format = websocket.query_params.get("frames", settings.CHAT_STREAM_FRAME_FORMAT)
+    if frame_format == "binary":
+        send_chunk = lambda content: websocket.send_bytes(binary_chunk_frame(content))
+    else:
+        send_chunk = lambda content: websocket.send_text(json_chunk_frame(content))
+    coalescer = FrameCoalescer(send_chunk)
+    conversation: Optional[Conversation] = None
+    history: List[dict] = []  # 尚未并入摘要的消息，saved为写入完成后得到消息ID的Future
+    summary: Optional[str] = None
+    summary_task: Optional[asyncio.Task] = None
     
     try:
         # 创建新会话
-        conversation = Conversation(
-            session_id=conversation_id,
-            title="新对话"
-        )
-        db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
+        async with AsyncSessionLocal() as db:
+            conversation = Conversation(
+                session_id=conversation_id,
+                title="新对话"
+            )
+            db.add(conversation)
+            await db.commit()
         
         # 发送会话ID
         await websocket.send_text(json.dumps({
@@ -156,86 +364,113 @@ async def websocket_chat(websocket: WebSocket):
             "conversation_id": conversation_id
         }))
         
-        messages = []
-        
         while True:
             data = await websocket.receive_text()
-            message_data = json.loads(data)
-            user_message = message_data.get("message", "")
-            
-            if not user_message:
-                continue
-            
-            # 保存用户消息
-            user_msg = Message(
-                conversation_id=conversation.id,
-                role="user",
-                content=user_message
-            )
-            db.add(user_msg)
-            db.commit()
-            
-            # 添加用户消息到历史
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # 格式化消息
-            formatted_messages = ai_service.format_messages(messages)
-            
-            # 流式响应
-            await websocket.send_text(json.dumps({
-                "type": "start",
-                "role": "assistant"
-            }))
-            
-            ai_content = ""
-            async for chunk in ai_service.stream_chat_completion(formatted_messages):
-                ai_content += chunk
+            parts: List[str] = []
+            replied = False
+            try:
+                message_data = json.loads(data)
+                user_message = message_data.get("message", "")
+                
+                if not user_message:
+                    continue
+                
+                # 保存用户消息（加入写入队列，不等待数据库）
+                saved = await message_store.add(conversation.id, "user", user_message)
+                history.append({"role": "user", "content": user_message, "saved": saved})
+                
+                # 最近几轮原文 + 更早消息的摘要（等待上一轮的摘要生成完成）
+                if summary_task is not None:
+                    task, summary_task = summary_task, None
+                    summary = await task
+                formatted_messages = chat_memory_service.build_messages(
+                    summary, chat_memory_service.split_window(history)[1]
+                )
+                
+                # 流式响应
                 await websocket.send_text(json.dumps({
-                    "type": "chunk",
-                    "content": chunk
+                    "type": "start",
+                    "role": "assistant"
                 }))
+                
+                stats = StreamStats()
+                frames_before = coalescer.frames
+                async for chunk in ai_service.stream_chat_completion(formatted_messages):
+                    stats.on_chunk()
+                    parts.append(chunk)
+                    await coalescer.push(chunk)
+                await coalescer.close()
+                ai_content = "".join(parts)
+                
+                metrics = stats.finish(ai_content)
+                metrics["frames"] = coalescer.frames - frames_before
+                print(
+                    f"[Chat] 会话 {conversation.id} 流式回复: TTFT {metrics['ttft_ms']:.0f} ms，"
+                    f"{metrics['tokens']} tokens，{metrics['tokens_per_second'] or 0:.1f} tokens/s"
+                )
+                
+                # 保存AI回复
+                saved = await message_store.add(conversation.id, "assistant", ai_content)
+                history.append({"role": "assistant", "content": ai_content, "saved": saved})
+                replied = True
+                
+                await websocket.send_text(json.dumps({
+                    "type": "end",
+                    "metrics": metrics
+                }))
+                
+                # 在后台把移出窗口的旧消息并入摘要
+                older, history = chat_memory_service.split_window(history)
+                if older:
+                    summary_task = asyncio.create_task(fold_summary(conversation.id, summary, older))
             
-            # 保存AI回复
-            ai_msg = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=ai_content
-            )
-            db.add(ai_msg)
-            db.commit()
-            
-            # 添加AI消息到历史
-            messages.append({
-                "role": "assistant",
-                "content": ai_content
-            })
-            
-            await websocket.send_text(json.dumps({
-                "type": "end"
-            }))
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # 一轮回复失败只结束这一轮，连接继续接收下一条消息
+                coalescer.cancel()
+                if parts and not replied:
+                    # 保存已生成的部分回复
+                    ai_content = "".join(parts)
+                    saved = await message_store.add(
+                        conversation.id, "assistant", ai_content, message_metadata={"interrupted": True}
+                    )
+                    history.append({"role": "assistant", "content": ai_content, "saved": saved})
+                await websocket.send_text(json.dumps({
+                    "type": "error",
+                    "message": str(e)
+                }))
     
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
-        await websocket.send_text(json.dumps({
-            "type": "error",
-            "message": str(e)
-        }))
+        # 创建会话失败等连接级错误：通知客户端后关闭连接
+        try:
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "message": str(e)
+            }))
+        except Exception:
+            pass
     finally:
-        db.close()
+        manager.disconnect(websocket)
+        coalescer.cancel()
+        # 连接结束时保证本连接排队中的消息全部写入（连接任务被取消时也要完成）
+        with anyio.CancelScope(shield=True):
+            if conversation is not None:
+                await message_store.flush(conversation.id)
+            if summary_task is not None:
+                await summary_task
 
 @router.get("/conversations")
 async def get_conversations(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取所有对话"""
-    conversations = db.query(Conversation).order_by(
+    conversations = (await db.scalars(select(Conversation).order_by(
         Conversation.created_at.desc()
-    ).limit(50).all()
+    ).limit(50))).all()
     
     return [
         {
@@ -250,36 +485,32 @@ async def get_conversations(
 @router.get("/conversations/{conversation_id}/messages")
 async def get_messages(
     conversation_id: str,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取对话消息"""
+    """获取对话消息（按发送顺序分页）"""
     # 支持通过ID或session_id查询
     try:
         conv_id = int(conversation_id)
-        conversation = db.query(Conversation).filter(
-            Conversation.id == conv_id
-        ).first()
+        conversation = await db.get(Conversation, conv_id)
     except ValueError:
         # 如果不是数字，按session_id查询
-        conversation = db.query(Conversation).filter(
+        conversation = await db.scalar(select(Conversation).where(
             Conversation.session_id == conversation_id
-        ).first()
+        ))
     
     if not conversation:
         raise HTTPException(status_code=404, detail="对话不存在")
     
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation.id
-    ).order_by(Message.created_at).all()
-    
-    return [
-        {
+    return await apaginate(
+        db, select(Message).where(Message.conversation_id == conversation.id),
+        [(Message.id, False)], page,
+        lambda msg: {
             "id": msg.id,
             "role": msg.role,
             "content": msg.content,
             "created_at": msg.created_at.isoformat() if msg.created_at else None
         }
-        for msg in messages
-    ]
+    )
 
@@ -6,13 +6,31 @@ from pydantic import BaseModel
 from typing import List
 from app.core.security import get_current_active_user
 from app.models.user import User
-from app.services.clip_service import clip_service
+from app.core.worker_pool import run_model_task
+from app.core.batching import MicroBatcher
 import os
 import uuid
 from app.core.config import settings
 
 router = APIRouter()
 
+
+async def _match_batch(requests: List[tuple]) -> List[dict]:
+    """把一批图像文本匹配请求作为一个任务交给模型worker"""
+    return await run_model_task(
+        "app.services.clip_service:clip_service.match_image_text_batch",
+        requests
+    )
+
+
+# 合并并发的/match请求，一次前向计算处理整批
+match_batcher = MicroBatcher(
+    _match_batch,
+    max_batch_size=settings.CLIP_BATCH_MAX_SIZE,
+    max_wait_ms=settings.CLIP_BATCH_MAX_WAIT_MS,
+    name="clip_match"
+)
+
 class ImageTextMatchRequest(BaseModel):
     """图像文本匹配请求"""
     image_path: str
@@ -30,10 +48,7 @@ async def match_image_text(
     current_user: User = Depends(get_current_active_user)
 ):
     """匹配图像和文本"""
-    result = clip_service.match_image_text(
-        request.image_path,
-        request.text_options
-    )
+    result = await match_batcher.submit((request.image_path, request.text_options))
     
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -46,7 +61,8 @@ async def search_images(
     current_user: User = Depends(get_current_active_user)
 ):
     """根据文本搜索相似图像"""
-    result = clip_service.find_similar_images(
+    result = await run_model_task(
+        "app.services.clip_service:clip_service.find_similar_images",
         request.query_text,
         request.image_paths,
         request.top_k
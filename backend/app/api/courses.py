@@ -2,11 +2,12 @@
 课程管理API
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User, UserRole
 from app.models.course import Course, CourseEnrollment, Chapter, CourseResource, ChapterResource
@@ -51,7 +52,7 @@ class ChapterResponse(BaseModel):
 async def create_course(
     course_data: CourseCreate,
     current_user: User = Depends(require_role(UserRole.TEACHER, UserRole.ADMIN)),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建课程（仅教师和管理员）"""
     course = Course(
@@ -60,29 +61,28 @@ async def create_course(
         teacher_id=current_user.id
     )
     db.add(course)
-    db.commit()
-    db.refresh(course)
+    await db.commit()
+    await db.refresh(course)
     return course
 
 @router.get("/", response_model=List[CourseResponse])
 async def list_courses(
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取课程列表"""
     if current_user.role == UserRole.TEACHER:
         # 教师看到自己创建的课程
-        courses = db.query(Course).filter(Course.teacher_id == current_user.id).all()
+        courses = (await db.scalars(select(Course).where(Course.teacher_id == current_user.id))).all()
     elif current_user.role == UserRole.ADMIN:
         # 管理员看到所有课程
-        courses = db.query(Course).all()
+        courses = (await db.scalars(select(Course))).all()
     else:
-        # 学生看到已加入的课程
-        enrollments = db.query(CourseEnrollment).filter(
+        # 学生看到已加入的课程（子查询，一次往返）
+        enrolled_course_ids = select(CourseEnrollment.course_id).where(
             CourseEnrollment.student_id == current_user.id
-        ).all()
-        course_ids = [e.course_id for e in enrollments]
-        courses = db.query(Course).filter(Course.id.in_(course_ids)).all()
+        )
+        courses = (await db.scalars(select(Course).where(Course.id.in_(enrolled_course_ids)))).all()
     
     return courses
 
@@ -93,10 +93,10 @@ async def list_courses(
 async def get_course_students(
     course_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取课程的学生列表（仅教师和管理员）"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
@@ -108,23 +108,24 @@ async def get_course_students(
     if current_user.role == UserRole.TEACHER and course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权访问此课程的学生列表")
     
-    # 获取所有注册该课程的学生
-    enrollments = db.query(CourseEnrollment).filter(
-        CourseEnrollment.course_id == course_id
-    ).all()
+    # 获取所有注册该课程的学生（JOIN一次查询，避免逐个查询用户）
+    rows = (await db.execute(
+        select(User, CourseEnrollment.enrolled_at)
+        .join(CourseEnrollment, CourseEnrollment.student_id == User.id)
+        .where(CourseEnrollment.course_id == course_id)
+        .order_by(CourseEnrollment.id)
+    )).all()
     
     students = []
-    for enrollment in enrollments:
-        student = db.query(User).filter(User.id == enrollment.student_id).first()
-        if student:
-            students.append({
-                "id": student.id,
-                "username": student.username,
-                "full_name": student.full_name,
-                "email": student.email,
-                "avatar_url": student.avatar_url,
-                "enrolled_at": enrollment.enrolled_at.isoformat() if enrollment.enrolled_at else None
-            })
+    for student, enrolled_at in rows:
+        students.append({
+            "id": student.id,
+            "username": student.username,
+            "full_name": student.full_name,
+            "email": student.email,
+            "avatar_url": student.avatar_url,
+            "enrolled_at": enrolled_at.isoformat() if enrolled_at else None
+        })
     
     return students
 
@@ -132,10 +133,10 @@ async def get_course_students(
 async def get_course_student_projects(
     course_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取课程中所有学生的项目（仅教师和管理员）"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
@@ -147,28 +148,30 @@ async def get_course_student_projects(
     if current_user.role == UserRole.TEACHER and course.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权访问此课程的学生项目")
     
-    # 获取该课程的所有项目
+    # 获取该课程的所有项目及所有者信息（JOIN一次查询）
     from app.models.project import Project
-    projects = db.query(Project).filter(Project.course_id == course_id).all()
+    rows = (await db.execute(
+        select(Project, User)
+        .join(User, User.id == Project.owner_id)
+        .where(Project.course_id == course_id)
+        .order_by(Project.id)
+    )).all()
     
-    # 获取项目所有者信息
     result = []
-    for project in projects:
-        owner = db.query(User).filter(User.id == project.owner_id).first()
-        if owner:
-            result.append({
-                "id": project.id,
-                "name": project.name,
-                "description": project.description,
-                "status": project.status,
-                "created_at": project.created_at.isoformat() if project.created_at else None,
-                "owner": {
-                    "id": owner.id,
-                    "username": owner.username,
-                    "full_name": owner.full_name,
-                    "avatar_url": owner.avatar_url
-                }
-            })
+    for project, owner in rows:
+        result.append({
+            "id": project.id,
+            "name": project.name,
+            "description": project.description,
+            "status": project.status,
+            "created_at": project.created_at.isoformat() if project.created_at else None,
+            "owner": {
+                "id": owner.id,
+                "username": owner.username,
+                "full_name": owner.full_name,
+                "avatar_url": owner.avatar_url
+            }
+        })
     
     return result
 
@@ -176,19 +179,19 @@ async def get_course_student_projects(
 async def get_course(
     course_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取课程详情"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
     # 权限检查：教师只能看自己的课程，学生只能看已加入的课程
     if current_user.role == UserRole.STUDENT:
-        enrollment = db.query(CourseEnrollment).filter(
+        enrollment = await db.scalar(select(CourseEnrollment).where(
             CourseEnrollment.course_id == course_id,
             CourseEnrollment.student_id == current_user.id
-        ).first()
+        ))
         if not enrollment:
             raise HTTPException(status_code=403, detail="无权访问此课程")
     elif current_user.role == UserRole.TEACHER and course.teacher_id != current_user.id:
@@ -200,18 +203,18 @@ async def get_course(
 async def enroll_course(
     course_id: int,
     current_user: User = Depends(require_role(UserRole.STUDENT)),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """学生加入课程"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
     # 检查是否已加入
-    existing = db.query(CourseEnrollment).filter(
+    existing = await db.scalar(select(CourseEnrollment).where(
         CourseEnrollment.course_id == course_id,
         CourseEnrollment.student_id == current_user.id
-    ).first()
+    ))
     if existing:
         raise HTTPException(status_code=400, detail="已加入此课程")
     
@@ -220,7 +223,7 @@ async def enroll_course(
         student_id=current_user.id
     )
     db.add(enrollment)
-    db.commit()
+    await db.commit()
     
     return {"message": "成功加入课程"}
 
@@ -229,10 +232,10 @@ async def create_chapter(
     course_id: int,
     chapter_data: ChapterCreate,
     current_user: User = Depends(require_role(UserRole.TEACHER, UserRole.ADMIN)),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建章节（仅教师）"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
@@ -246,31 +249,33 @@ async def create_chapter(
         order=chapter_data.order
     )
     db.add(chapter)
-    db.commit()
-    db.refresh(chapter)
+    await db.commit()
+    await db.refresh(chapter)
     return chapter
 
 @router.get("/{course_id}/chapters", response_model=List[ChapterResponse])
 async def list_chapters(
     course_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取课程章节列表"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
     # 权限检查
     if current_user.role == UserRole.STUDENT:
-        enrollment = db.query(CourseEnrollment).filter(
+        enrollment = await db.scalar(select(CourseEnrollment).where(
             CourseEnrollment.course_id == course_id,
             CourseEnrollment.student_id == current_user.id
-        ).first()
+        ))
         if not enrollment:
             raise HTTPException(status_code=403, detail="无权访问此课程")
     
-    chapters = db.query(Chapter).filter(Chapter.course_id == course_id).order_by(Chapter.order).all()
+    chapters = (await db.scalars(
+        select(Chapter).where(Chapter.course_id == course_id).order_by(Chapter.order)
+    )).all()
     return chapters
 
 class CourseResourceResponse(BaseModel):
@@ -290,22 +295,22 @@ class CourseResourceResponse(BaseModel):
 async def list_course_resources(
     course_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取课程资源列表"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
     # 权限检查
     if current_user.role == UserRole.STUDENT:
-        enrollment = db.query(CourseEnrollment).filter(
+        enrollment = await db.scalar(select(CourseEnrollment).where(
             CourseEnrollment.course_id == course_id,
             CourseEnrollment.student_id == current_user.id
-        ).first()
+        ))
         if not enrollment:
             raise HTTPException(status_code=403, detail="无权访问此课程")
     
-    resources = db.query(CourseResource).filter(CourseResource.course_id == course_id).all()
+    resources = (await db.scalars(select(CourseResource).where(CourseResource.course_id == course_id))).all()
     return resources
 
@@ -7,6 +7,7 @@ from typing import List, Optional, Dict, Any
 from app.core.security import get_current_active_user
 from app.models.user import User
 from app.services.dramatron_service import dramatron_service
+from app.services.ollama_service import ollama_service
 
 router = APIRouter(prefix="/dramatron", tags=["dramatron"])
 
@@ -143,8 +144,9 @@ async def generate_dialog(
 @router.get("/available")
 async def check_available(current_user: User = Depends(get_current_active_user)):
     """检查Dramatron是否可用"""
+    available = await ollama_service.ensure_available()
     return {
-        "available": dramatron_service.available,
-        "model": dramatron_service.default_model if dramatron_service.available else None
+        "available": available,
+        "model": dramatron_service.default_model if available else None
     }
 
@@ -9,6 +9,7 @@ from app.core.database import get_db
 from app.core.security import get_current_active_user
 from app.models.user import User
 from app.services.editing_service import editing_service
+from app.core.worker_pool import run_model_task
 import os
 import aiofiles
 from app.core.config import settings
@@ -57,7 +58,10 @@ async def analyze_video_for_editing(
             await f.write(content)
         
         # 分析视频
-        result = editing_service.analyze_video(video_path)
+        result = await run_model_task(
+            "app.services.editing_service:editing_service.analyze_video",
+            video_path
+        )
         
         # 清理临时文件（可选）
         # os.remove(video_path)
@@ -71,6 +75,10 @@ async def analyze_video_for_editing(
             statistics=result.get("statistics", {})
         )
     
+    except HTTPException:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+        raise
     except Exception as e:
         # 确保清理临时文件
         if os.path.exists(video_path):
@@ -2,11 +2,12 @@
 评估系统API
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel, model_validator
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import get_current_active_user, require_role
 from app.models.user import User, UserRole
 from app.models.project import Project, Script, Storyboard
@@ -168,12 +169,12 @@ def evaluation_to_response(eval: Evaluation) -> EvaluationResponse:
 async def create_evaluation(
     evaluation_data: EvaluationCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建评估"""
     try:
         # 检查项目是否存在
-        project = db.query(Project).filter(Project.id == evaluation_data.project_id).first()
+        project = await db.get(Project, evaluation_data.project_id)
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
         
@@ -213,13 +214,13 @@ async def create_evaluation(
         )
         
         db.add(evaluation)
-        db.commit()
-        db.refresh(evaluation)
+        await db.commit()
+        await db.refresh(evaluation)
         return EvaluationResponse.from_orm(evaluation)
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"创建评估失败: {str(e)}")
@@ -228,11 +229,11 @@ async def create_evaluation(
 async def list_project_evaluations(
     project_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目的所有评估"""
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        project = await db.get(Project, project_id)
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
         
@@ -240,9 +241,9 @@ async def list_project_evaluations(
         if current_user.role == UserRole.STUDENT and project.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="无权访问此项目的评估")
         
-        evaluations = db.query(Evaluation).filter(
+        evaluations = (await db.scalars(select(Evaluation).where(
             Evaluation.project_id == project_id
-        ).order_by(Evaluation.created_at.desc()).all()
+        ).order_by(Evaluation.created_at.desc()))).all()
         
         # 转换评估对象为字典格式
         result = []
@@ -301,15 +302,15 @@ async def update_evaluation(
     evaluation_id: int,
     evaluation_data: EvaluationCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新评估"""
-    evaluation = db.query(Evaluation).filter(Evaluation.id == evaluation_id).first()
+    evaluation = await db.get(Evaluation, evaluation_id)
     if not evaluation:
         raise HTTPException(status_code=404, detail="评估不存在")
     
     # 检查项目是否存在
-    project = db.query(Project).filter(Project.id == evaluation_data.project_id).first()
+    project = await db.get(Project, evaluation_data.project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -341,18 +342,18 @@ async def update_evaluation(
     evaluation.suggestions = evaluation_data.suggestions
     evaluation.teacher_feedback_box = evaluation_data.teacher_feedback_box
     
-    db.commit()
-    db.refresh(evaluation)
+    await db.commit()
+    await db.refresh(evaluation)
     return EvaluationResponse.from_orm(evaluation)
 
 @router.post("/project/{project_id}/ai-evaluate")
 async def ai_evaluate_project(
     project_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI自动评估项目（调用智能对话API进行评估）"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -361,12 +362,17 @@ async def ai_evaluate_project(
         raise HTTPException(status_code=403, detail="无权评估此项目")
     
     # 获取项目的剧本和分镜内容
-    scripts = db.query(Script).filter(Script.project_id == project_id).all()
-    storyboards = db.query(Storyboard).filter(Storyboard.project_id == project_id).order_by(Storyboard.order).all()
+    scripts = (await db.scalars(select(Script).where(Script.project_id == project_id))).all()
+    storyboards = (await db.scalars(
+        select(Storyboard).where(Storyboard.project_id == project_id).order_by(Storyboard.order)
+    )).all()
     
     if not scripts and not storyboards:
         raise HTTPException(status_code=400, detail="项目没有剧本或分镜内容，无法进行评估")
     
+    # 结束只读事务，调用AI期间不占用数据库连接
+    await db.commit()
+    
     # 构建项目内容摘要
     project_content = f"项目名称：{project.name}\n项目描述：{project.description or '无'}\n\n"
     
@@ -491,8 +497,8 @@ async def ai_evaluate_project(
         )
         
         db.add(evaluation)
-        db.commit()
-        db.refresh(evaluation)
+        await db.commit()
+        await db.refresh(evaluation)
         
         return {
             "status": "completed",
@@ -503,7 +509,7 @@ async def ai_evaluate_project(
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500, detail=f"AI返回的评估结果格式错误: {str(e)}")
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"AI评估失败: {str(e)}")
 
 
@@ -2,7 +2,10 @@
 健康检查API
 """
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from datetime import datetime
+from app.core.model_manager import model_manager
+from app.core.worker_pool import model_worker_pool
 
 router = APIRouter()
 
@@ -15,3 +18,22 @@ async def health_check():
         "service": "影视制作教育智能体"
     }
 
+@router.get("/health/ready")
+async def readiness_check():
+    """就绪检查：需要预热的模型全部处理完毕（启用进程池时为所有worker预热完毕）后返回200，否则返回503"""
+    if model_worker_pool.enabled:
+        stats = model_worker_pool.stats()
+        ready = stats["ready"]
+        content = {"workers": stats["workers"]}
+    else:
+        status = model_manager.warmup_status()
+        ready = status["ready"]
+        content = {"models": status["models"]}
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "warming_up",
+            "timestamp": datetime.now().isoformat(),
+            **content
+        }
+    )
@@ -3,15 +3,29 @@
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from typing import List
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from app.services.knowledge_service import knowledge_service
 from app.models.knowledge import Document
 from app.core.database import get_db
 from app.core.security import get_current_active_user
+from app.core.cache import cache_service, cached
+from app.core.pagination import PageParams, paginate
 from app.models.user import User
 
 router = APIRouter()
 
+KNOWLEDGE_CACHE_TAG = "kb"
+
+@cached("knowledge_search", ttl=24 * 3600, tags=[KNOWLEDGE_CACHE_TAG])
+async def _search_documents(query: str, limit: int) -> List[dict]:
+    """知识库检索（结果缓存在L1/L2，文档变更时按标签失效）"""
+    return await knowledge_service.search_documents(query, n_results=limit)
+
+async def _invalidate_knowledge_cache():
+    """文档增删后清除知识库相关缓存（同时广播给其他worker）"""
+    await cache_service.ainvalidate_tag(KNOWLEDGE_CACHE_TAG)
+
 @router.post("/knowledge/upload")
 async def upload_document(
     file: UploadFile = File(...),
@@ -43,6 +57,7 @@ async def upload_document(
         db.add(document)
         db.commit()
         db.refresh(document)
+        await _invalidate_knowledge_cache()
         
         return {
             "id": document.id,
@@ -63,7 +78,7 @@ async def search_knowledge(
 ):
     """搜索知识库"""
     try:
-        results = await knowledge_service.search_documents(query, n_results=limit)
+        results = await _search_documents(query, limit)
         return {
             "query": query,
             "results": results,
@@ -74,16 +89,14 @@ async def search_knowledge(
 
 @router.get("/knowledge/documents")
 async def get_documents(
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """获取所有文档"""
-    documents = db.query(Document).order_by(
-        Document.created_at.desc()
-    ).all()
-    
-    return [
-        {
+    """获取文档列表（按上传时间倒序分页）"""
+    return paginate(
+        db, select(Document), [(Document.id, True)], page,
+        lambda doc: {
             "id": doc.id,
             "filename": doc.filename,
             "file_type": doc.file_type,
@@ -91,8 +104,7 @@ async def get_documents(
             "file_path": doc.file_path,  # 添加文件路径
             "created_at": doc.created_at.isoformat() if doc.created_at else None
         }
-        for doc in documents
-    ]
+    )
 
 @router.delete("/knowledge/documents/{document_id}")
 async def delete_document(
@@ -111,6 +123,7 @@ async def delete_document(
     # 从数据库删除
     db.delete(document)
     db.commit()
+    await _invalidate_knowledge_cache()
     
     return {"message": "文档已删除"}
 
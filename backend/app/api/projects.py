@@ -2,15 +2,19 @@
 项目管理API（创作空间）
 """
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 import os
 import uuid
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.security import get_current_active_user
 from app.core.config import settings
+from app.core.cache import cache_service
+from app.core.pagination import Page, PageParams, apaginate
 from app.models.user import User
 from app.models.project import Project, ProjectStatus, Script, Storyboard, MediaAsset
 from app.models.course import Course, CourseEnrollment
@@ -18,6 +22,17 @@ from app.services.dashscope_service import dashscope_service
 
 router = APIRouter()
 
+# 项目下的剧本/分镜列表缓存，写操作时按项目标签失效，因此可以使用较长TTL
+PROJECT_CACHE_TTL = 24 * 3600
+
+def project_cache_tag(project_id: int) -> str:
+    """项目相关缓存的标签"""
+    return f"project:{project_id}"
+
+async def invalidate_project_cache(project_id: int):
+    """清除项目相关的全部缓存"""
+    await cache_service.ainvalidate_tag(project_cache_tag(project_id))
+
 class ProjectCreate(BaseModel):
     """创建项目模型"""
     name: str
@@ -75,7 +90,7 @@ class StoryboardResponse(BaseModel):
     camera_angle: Optional[str]
     camera_movement: Optional[str]
     notes: Optional[str]
-    order: int
+    order: Optional[int]
     created_at: datetime
     
     class Config:
@@ -85,20 +100,20 @@ class StoryboardResponse(BaseModel):
 async def create_project(
     project_data: ProjectCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建项目"""
     # 检查课程是否存在且用户有权限
-    course = db.query(Course).filter(Course.id == project_data.course_id).first()
+    course = await db.get(Course, project_data.course_id)
     if not course:
         raise HTTPException(status_code=404, detail="课程不存在")
     
     # 学生只能在自己的课程中创建项目
     if current_user.role.value == "student":
-        enrollment = db.query(CourseEnrollment).filter(
+        enrollment = await db.scalar(select(CourseEnrollment).where(
             CourseEnrollment.course_id == project_data.course_id,
             CourseEnrollment.student_id == current_user.id
-        ).first()
+        ))
         if not enrollment:
             raise HTTPException(status_code=403, detail="无权在此课程中创建项目")
     
@@ -109,37 +124,37 @@ async def create_project(
         owner_id=current_user.id
     )
     db.add(project)
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
     return project
 
-@router.get("/", response_model=List[ProjectResponse])
+@router.get("/", response_model=Page[ProjectResponse])
 async def list_projects(
     course_id: Optional[int] = None,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取项目列表"""
-    query = db.query(Project)
+    """获取项目列表（按创建顺序分页）"""
+    query = select(Project)
     
     # 学生只能看到自己的项目
     if current_user.role.value == "student":
-        query = query.filter(Project.owner_id == current_user.id)
+        query = query.where(Project.owner_id == current_user.id)
     
     if course_id:
-        query = query.filter(Project.course_id == course_id)
+        query = query.where(Project.course_id == course_id)
     
-    projects = query.all()
-    return projects
+    return await apaginate(db, query, [(Project.id, False)], page)
 
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目详情"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -154,10 +169,10 @@ async def create_script(
     project_id: int,
     script_data: ScriptCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建剧本"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -171,18 +186,19 @@ async def create_script(
         content=script_data.content
     )
     db.add(script)
-    db.commit()
-    db.refresh(script)
+    await db.commit()
+    await db.refresh(script)
+    await invalidate_project_cache(project_id)
     return script
 
 @router.get("/{project_id}/scripts", response_model=List[ScriptResponse])
 async def list_scripts(
     project_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目剧本列表"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -190,8 +206,15 @@ async def list_scripts(
     if current_user.role.value == "student" and project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权访问此项目")
     
-    scripts = db.query(Script).filter(Script.project_id == project_id).all()
-    return scripts
+    cache_key = f"project:{project_id}:scripts"
+    cached_scripts = await cache_service.aget(cache_key)
+    if cached_scripts is not None:
+        return cached_scripts
+    
+    scripts = (await db.scalars(select(Script).where(Script.project_id == project_id))).all()
+    result = jsonable_encoder([ScriptResponse.model_validate(script) for script in scripts])
+    await cache_service.aset(cache_key, result, PROJECT_CACHE_TTL, tags=[project_cache_tag(project_id)])
+    return result
 
 @router.put("/{project_id}/scripts/{script_id}", response_model=ScriptResponse)
 async def update_script(
@@ -199,10 +222,10 @@ async def update_script(
     script_id: int,
     script_data: ScriptCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新剧本"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -210,17 +233,18 @@ async def update_script(
     if current_user.role.value == "student" and project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权操作此项目")
     
-    script = db.query(Script).filter(
+    script = await db.scalar(select(Script).where(
         Script.id == script_id,
         Script.project_id == project_id
-    ).first()
+    ))
     if not script:
         raise HTTPException(status_code=404, detail="剧本不存在")
     
     script.title = script_data.title
     script.content = script_data.content
-    db.commit()
-    db.refresh(script)
+    await db.commit()
+    await db.refresh(script)
+    await invalidate_project_cache(project_id)
     return script
 
 @router.delete("/{project_id}/scripts/{script_id}", status_code=status.HTTP_200_OK)
@@ -228,11 +252,11 @@ async def delete_script(
     project_id: int,
     script_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除剧本"""
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        project = await db.get(Project, project_id)
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
         
@@ -240,20 +264,21 @@ async def delete_script(
         if current_user.role.value == "student" and project.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="无权操作此项目")
         
-        script = db.query(Script).filter(
+        script = await db.scalar(select(Script).where(
             Script.id == script_id,
             Script.project_id == project_id
-        ).first()
+        ))
         if not script:
             raise HTTPException(status_code=404, detail="剧本不存在")
         
-        db.delete(script)
-        db.commit()
+        await db.delete(script)
+        await db.commit()
+        await invalidate_project_cache(project_id)
         return {"message": "剧本已删除", "status": "success"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"删除剧本时发生错误: {str(e)}")
 
 # 注意：更具体的路由（带storyboard_id的）要放在更通用的路由之前
@@ -263,10 +288,10 @@ async def update_storyboard(
     storyboard_id: int,
     storyboard_data: StoryboardCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新分镜"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -274,10 +299,10 @@ async def update_storyboard(
     if current_user.role.value == "student" and project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权操作此项目")
     
-    storyboard = db.query(Storyboard).filter(
+    storyboard = await db.scalar(select(Storyboard).where(
         Storyboard.id == storyboard_id,
         Storyboard.project_id == project_id
-    ).first()
+    ))
     if not storyboard:
         raise HTTPException(status_code=404, detail="分镜不存在")
     
@@ -288,8 +313,9 @@ async def update_storyboard(
     storyboard.camera_movement = storyboard_data.camera_movement
     storyboard.notes = storyboard_data.notes
     storyboard.order = storyboard_data.order
-    db.commit()
-    db.refresh(storyboard)
+    await db.commit()
+    await db.refresh(storyboard)
+    await invalidate_project_cache(project_id)
     return storyboard
 
 @router.delete("/{project_id}/storyboards/{storyboard_id}", status_code=status.HTTP_200_OK)
@@ -297,11 +323,11 @@ async def delete_storyboard(
     project_id: int,
     storyboard_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除分镜"""
     try:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        project = await db.get(Project, project_id)
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
         
@@ -309,20 +335,21 @@ async def delete_storyboard(
         if current_user.role.value == "student" and project.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="无权操作此项目")
         
-        storyboard = db.query(Storyboard).filter(
+        storyboard = await db.scalar(select(Storyboard).where(
             Storyboard.id == storyboard_id,
             Storyboard.project_id == project_id
-        ).first()
+        ))
         if not storyboard:
             raise HTTPException(status_code=404, detail="分镜不存在")
         
-        db.delete(storyboard)
-        db.commit()
+        await db.delete(storyboard)
+        await db.commit()
+        await invalidate_project_cache(project_id)
         return {"message": "分镜已删除", "status": "success"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"删除分镜时发生错误: {str(e)}")
 
 @router.post("/{project_id}/storyboards", response_model=StoryboardResponse, status_code=status.HTTP_201_CREATED)
@@ -330,10 +357,10 @@ async def create_storyboard(
     project_id: int,
     storyboard_data: StoryboardCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建分镜"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -352,18 +379,20 @@ async def create_storyboard(
         order=storyboard_data.order
     )
     db.add(storyboard)
-    db.commit()
-    db.refresh(storyboard)
+    await db.commit()
+    await db.refresh(storyboard)
+    await invalidate_project_cache(project_id)
     return storyboard
 
-@router.get("/{project_id}/storyboards", response_model=List[StoryboardResponse])
+@router.get("/{project_id}/storyboards", response_model=Page[StoryboardResponse])
 async def list_storyboards(
     project_id: int,
+    page: PageParams = Depends(),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取项目分镜列表"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    """获取项目分镜列表（按分镜顺序分页）"""
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -371,10 +400,18 @@ async def list_storyboards(
     if current_user.role.value == "student" and project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权访问此项目")
     
-    storyboards = db.query(Storyboard).filter(
-        Storyboard.project_id == project_id
-    ).order_by(Storyboard.order).all()
-    return storyboards
+    cache_key = f"project:{project_id}:storyboards:{page.cache_suffix()}"
+    cached_storyboards = await cache_service.aget(cache_key)
+    if cached_storyboards is not None:
+        return cached_storyboards
+    
+    result = jsonable_encoder(await apaginate(
+        db, select(Storyboard).where(Storyboard.project_id == project_id),
+        [(Storyboard.order, False, 0), (Storyboard.id, False)], page,
+        StoryboardResponse.model_validate
+    ))
+    await cache_service.aset(cache_key, result, PROJECT_CACHE_TTL, tags=[project_cache_tag(project_id)])
+    return result
 
 class GenerateImageRequest(BaseModel):
     """生成图片请求"""
@@ -386,10 +423,10 @@ async def generate_storyboard_image(
     storyboard_id: int,
     request: GenerateImageRequest,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """为分镜生成图片（文生图）"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -397,10 +434,10 @@ async def generate_storyboard_image(
     if current_user.role.value == "student" and project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="无权操作此项目")
     
-    storyboard = db.query(Storyboard).filter(
+    storyboard = await db.scalar(select(Storyboard).where(
         Storyboard.id == storyboard_id,
         Storyboard.project_id == project_id
-    ).first()
+    ))
     if not storyboard:
         raise HTTPException(status_code=404, detail="分镜不存在")
     
@@ -455,8 +492,9 @@ async def generate_storyboard_image(
             
             # 更新分镜的图片路径
             storyboard.image_path = image_url
-            db.commit()
-            db.refresh(storyboard)
+            await db.commit()
+            await db.refresh(storyboard)
+            await invalidate_project_cache(project_id)
             
             return {
                 "success": True,
@@ -471,7 +509,7 @@ async def generate_storyboard_image(
         # 重新抛出HTTP异常
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         import traceback
         error_detail = traceback.format_exc()
         print(f"[分镜文生图] 异常详情:\n{error_detail}")
@@ -482,10 +520,10 @@ async def upload_media(
     project_id: int,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """上传媒体文件"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     
@@ -529,8 +567,9 @@ async def upload_media(
         mime_type=content_type
     )
     db.add(media_asset)
-    db.commit()
-    db.refresh(media_asset)
+    await db.commit()
+    await db.refresh(media_asset)
+    await invalidate_project_cache(project_id)
     
     return {
         "id": media_asset.id,
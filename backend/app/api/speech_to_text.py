@@ -21,6 +21,7 @@ except Exception:
 import os
 import aiofiles
 from app.core.config import settings
+from app.core.worker_pool import run_model_task
 
 router = APIRouter()
 
@@ -76,7 +77,8 @@ async def transcribe_audio(
         use_whisperx = whisperx_service and whisperx_service.whisperx_available
         
         if use_whisperx and whisperx_service:
-            result = whisperx_service.transcribe(
+            result = await run_model_task(
+                "app.services.whisperx_service:whisperx_service.transcribe",
                 audio_path,
                 language=language,
                 align=True,
@@ -93,13 +95,19 @@ async def transcribe_audio(
                     detail="语音识别服务不可用，请检查服务配置"
                 )
             if generate_subtitle:
-                result = speech_service.transcribe_with_subtitle(
+                result = await run_model_task(
+                    "app.services.speech_service:speech_service.transcribe_with_subtitle",
                     audio_path,
                     output_dir=audio_dir,
                     language=language
                 )
             else:
-                result = speech_service.transcribe(audio_path, language=language, task=task)
+                result = await run_model_task(
+                    "app.services.speech_service:speech_service.transcribe",
+                    audio_path,
+                    language=language,
+                    task=task
+                )
         
         return TranscriptionResponse(
             success=True,
@@ -109,6 +117,10 @@ async def transcribe_audio(
             subtitle_file=result.get("subtitle_file")
         )
     
+    except HTTPException:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        raise
     except Exception as e:
         # 确保清理临时文件
         if os.path.exists(audio_path):
@@ -147,7 +159,11 @@ async def batch_transcribe(
                     status_code=503,
                     detail="语音识别服务不可用，请检查服务配置"
                 )
-            result = speech_service.transcribe(audio_path, language=language)
+            result = await run_model_task(
+                "app.services.speech_service:speech_service.transcribe",
+                audio_path,
+                language=language
+            )
             result["filename"] = audio_file.filename
             results.append(result)
         
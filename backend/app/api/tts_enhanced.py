@@ -8,7 +8,7 @@ from pydantic import BaseModel
 from typing import Optional
 from app.core.security import get_current_active_user
 from app.models.user import User
-from app.services.tts_service import tts_service
+from app.core.worker_pool import run_model_task
 import os
 import uuid
 from app.core.config import settings
@@ -34,7 +34,8 @@ async def synthesize_speech(
     )
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    result = tts_service.synthesize(
+    result = await run_model_task(
+        "app.services.tts_service:tts_service.synthesize",
         request.text,
         output_path,
         request.language,
@@ -2,41 +2,281 @@
 缓存服务 - 使用Redis或内存缓存
 """
 import json
+import sys
+import random
+import asyncio
+import uuid
 import hashlib
-from typing import Any, Optional, Callable
+import fnmatch
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Set, Union, Callable
 from functools import wraps
 import time
 
 try:
     import redis
+    import redis.asyncio as aioredis
     REDIS_AVAILABLE = True
 except ImportError:
     REDIS_AVAILABLE = False
     print("警告: Redis未安装，将使用内存缓存")
 
 from app.core.config import settings
+from app.core.cache_codec import CacheCodec
+
+
+class MemoryCache:
+    """进程内缓存引擎 - LRU淘汰，限制条目数与字节数，后台清理过期条目"""
+    
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 128 * 1024 * 1024,
+        sweep_interval: float = 60
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tag_index: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def _estimate_size(key: str, value: Any) -> int:
+        """估算条目占用字节数（按JSON序列化长度计算）"""
+        try:
+            size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        except (TypeError, ValueError):
+            size = sys.getsizeof(value)
+        return size + len(key.encode("utf-8"))
+    
+    def _remove(self, key: str) -> Optional[Dict[str, Any]]:
+        """删除条目并更新字节计数（调用方需持有锁）"""
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry['size']
+            for tag in entry['tags']:
+                keys = self._tag_index.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tag_index[tag]
+        return entry
+    
+    def _evict(self):
+        """按LRU顺序淘汰，直到满足条目数和字节数上限（调用方需持有锁）"""
+        while self._data and (
+            len(self._data) > self.max_entries or self.current_bytes > self.max_bytes
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+    
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存值，命中时移动到LRU队尾"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() >= entry['expires_at']:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry['value']
+    
+    def set(self, key: str, value: Any, ttl: int = 3600, tags: Optional[Iterable[str]] = None):
+        """设置缓存值，tags用于按标签批量失效"""
+        size = self._estimate_size(key, value)
+        tags = tuple(tags or ())
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                # 单个值超过总预算，不缓存
+                return
+            self._data[key] = {
+                'value': value,
+                'expires_at': time.time() + ttl,
+                'size': size,
+                'tags': tags
+            }
+            self.current_bytes += size
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            self._evict()
+        self._ensure_sweeper()
+    
+    def delete(self, key: str) -> bool:
+        """删除缓存"""
+        with self._lock:
+            return self._remove(key) is not None
+    
+    def clear(self, pattern: Optional[str] = None) -> int:
+        """清除缓存，pattern为glob风格（与Redis KEYS一致），为空时清除全部"""
+        with self._lock:
+            if not pattern:
+                count = len(self._data)
+                self._data.clear()
+                self._tag_index.clear()
+                self.current_bytes = 0
+                return count
+            keys = [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """删除带有指定标签的所有条目，返回删除数量"""
+        with self._lock:
+            keys = list(self._tag_index.get(tag, ()))
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+    
+    def cleanup_expired(self) -> int:
+        """清理所有过期条目，返回清理数量"""
+        now = time.time()
+        with self._lock:
+            expired_keys = [k for k, v in self._data.items() if now >= v['expires_at']]
+            for k in expired_keys:
+                self._remove(k)
+            self.expirations += len(expired_keys)
+            return len(expired_keys)
+    
+    def _ensure_sweeper(self):
+        """首次写入时启动后台清理线程"""
+        if self._sweeper is not None or self.sweep_interval <= 0:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop,
+                name="memory-cache-sweeper",
+                daemon=True
+            )
+            self._sweeper.start()
+    
+    def _sweep_loop(self):
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                print(f"内存缓存清理失败: {e}")
+    
+    def stop(self):
+        """停止后台清理线程"""
+        self._stop_event.set()
+        sweeper = self._sweeper
+        self._sweeper = None
+        if sweeper is not None and sweeper.is_alive():
+            sweeper.join(timeout=1)
+    
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and time.time() < entry['expires_at']
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self.current_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+    
+    def reset_stats(self):
+        """重置统计计数"""
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
 
 class CacheService:
-    """缓存服务"""
+    """缓存服务
     
-    def __init__(self):
-        self.redis_client = None
-        self.memory_cache: dict = {}
+    同步接口（get/set/...）供Celery任务等同步代码使用；
+    异步接口（aget/aset/...）基于redis.asyncio连接池，供async请求处理函数使用，不阻塞事件循环。
+    
+    启用Redis时为两级缓存：进程内L1（短TTL、容量小）+ Redis L2。
+    写入/删除会通过Redis pub/sub广播失效消息，其他worker收到后丢弃本地L1中的对应键。
+    """
+    
+    def __init__(self, redis_client=None, async_redis_client=None, l1_enabled: Optional[bool] = None):
+        self.redis_client = redis_client
+        self.memory_cache = MemoryCache(
+            max_entries=settings.CACHE_MEMORY_MAX_ENTRIES,
+            max_bytes=settings.CACHE_MEMORY_MAX_BYTES,
+            sweep_interval=settings.CACHE_SWEEP_INTERVAL
+        )
         self.use_redis = False
+        # Redis中的值使用带格式标记的二进制编码（兼容旧的JSON字符串）
+        self.codec = CacheCodec(
+            serializer=settings.CACHE_SERIALIZER,
+            compression=settings.CACHE_COMPRESSION,
+            compression_threshold=settings.CACHE_COMPRESSION_THRESHOLD
+        )
+        # 异步客户端与创建它的事件循环绑定，循环变化时重建连接池
+        self._async_client = async_redis_client
+        self._async_client_injected = async_redis_client is not None
+        self._async_loop = None
+        # L1缓存及跨worker失效
+        self.l1_cache: Optional[MemoryCache] = None
+        self.instance_id = uuid.uuid4().hex
+        self.invalidation_channel = settings.CACHE_INVALIDATION_CHANNEL
+        self._listener: Optional[threading.Thread] = None
+        self._listener_stop = threading.Event()
         
-        if REDIS_AVAILABLE:
+        if redis_client is not None:
+            self.use_redis = True
+        elif REDIS_AVAILABLE:
             try:
                 # 尝试连接Redis
-                self.redis_client = redis.from_url(
+                pool = redis.ConnectionPool.from_url(
                     settings.REDIS_URL,
-                    decode_responses=True
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    decode_responses=False
                 )
+                self.redis_client = redis.Redis(connection_pool=pool)
                 self.redis_client.ping()
                 self.use_redis = True
                 print("✅ Redis缓存已启用")
             except Exception as e:
                 print(f"⚠️  Redis连接失败，使用内存缓存: {e}")
                 self.use_redis = False
+        
+        if l1_enabled is None:
+            l1_enabled = settings.CACHE_L1_ENABLED
+        if self.use_redis and l1_enabled:
+            self.l1_cache = MemoryCache(
+                max_entries=settings.CACHE_L1_MAX_ENTRIES,
+                max_bytes=settings.CACHE_L1_MAX_BYTES,
+                sweep_interval=settings.CACHE_SWEEP_INTERVAL
+            )
+            self._start_invalidation_listener()
     
     def _make_key(self, prefix: str, *args, **kwargs) -> str:
         """生成缓存键"""
@@ -48,101 +288,535 @@ class CacheService:
         key_hash = hashlib.md5(key_str.encode()).hexdigest()
         return f"{prefix}:{key_hash}"
     
+    def _dumps(self, value: Any) -> bytes:
+        return self.codec.encode(value)
+    
+    def _loads(self, raw: Any) -> Any:
+        return self.codec.decode(raw)
+    
+    def _get_async_client(self):
+        """获取当前事件循环的异步Redis客户端（共享连接池）"""
+        if not self.use_redis:
+            return None
+        if self._async_client_injected:
+            return self._async_client
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            pool = aioredis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                decode_responses=False
+            )
+            self._async_client = aioredis.Redis(connection_pool=pool)
+            self._async_loop = loop
+        return self._async_client
+    
+    # ---------------- L1缓存与跨worker失效 ----------------
+    
+    def _l1_get(self, key: str) -> Optional[Any]:
+        if self.l1_cache is None:
+            return None
+        return self.l1_cache.get(key)
+    
+    def _l1_set(self, key: str, value: Any, ttl: int, tags: Optional[Iterable[str]] = None):
+        if self.l1_cache is not None:
+            self.l1_cache.set(key, value, min(ttl, settings.CACHE_L1_TTL), tags)
+    
+    def _invalidation_message(
+        self,
+        keys: Optional[List[Any]] = None,
+        pattern: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> str:
+        return json.dumps({
+            'origin': self.instance_id,
+            'keys': [k.decode() if isinstance(k, bytes) else k for k in keys or []],
+            'pattern': pattern,
+            'tags': tags or []
+        })
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        """标签在Redis中对应的集合键（保存带该标签的缓存键）"""
+        return f"{settings.CACHE_TAG_KEY_PREFIX}{tag}"
+    
+    @staticmethod
+    def _tag_ttl(ttl: int) -> int:
+        # 标签集合的过期时间不短于条目本身，集合中残留的已过期键在失效时会被忽略
+        return max(ttl, settings.CACHE_TAG_TTL)
+    
+    def _queue_set(self, pipe, key: str, value: Any, ttl: int, tags: Optional[Iterable[str]]):
+        """在pipeline中写入值并登记标签"""
+        pipe.set(key, self._dumps(value), ex=ttl)
+        for tag in tags or ():
+            tag_key = self._tag_key(tag)
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, self._tag_ttl(ttl))
+    
+    def _handle_invalidation(self, data: Any):
+        """处理其他worker广播的失效消息"""
+        if self.l1_cache is None:
+            return
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get('origin') == self.instance_id:
+            return
+        for key in message.get('keys') or []:
+            self.l1_cache.delete(key)
+        for tag in message.get('tags') or []:
+            self.l1_cache.invalidate_tag(tag)
+        if message.get('pattern'):
+            self.l1_cache.clear(message['pattern'])
+    
+    def _start_invalidation_listener(self):
+        """启动订阅失效消息的后台线程"""
+        self._listener_stop.clear()
+        self._listener = threading.Thread(
+            target=self._invalidation_loop,
+            name="cache-invalidation-listener",
+            daemon=True
+        )
+        self._listener.start()
+    
+    def _invalidation_loop(self):
+        pubsub = None
+        while not self._listener_stop.is_set():
+            try:
+                if pubsub is None:
+                    pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(self.invalidation_channel)
+                message = pubsub.get_message(timeout=1.0)
+                if message and message.get('type') == 'message':
+                    self._handle_invalidation(message['data'])
+            except Exception as e:
+                # 订阅中断期间可能错过失效消息，清空L1保证不读到旧数据
+                print(f"缓存失效订阅异常，已清空L1缓存: {e}")
+                self.l1_cache.clear()
+                try:
+                    if pubsub is not None:
+                        pubsub.close()
+                except Exception:
+                    pass
+                pubsub = None
+                self._listener_stop.wait(1.0)
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+    
+    def close(self):
+        """停止后台线程"""
+        self._listener_stop.set()
+        listener = self._listener
+        self._listener = None
+        if listener is not None and listener.is_alive():
+            listener.join(timeout=2)
+        self.memory_cache.stop()
+        if self.l1_cache is not None:
+            self.l1_cache.stop()
+    
+    # ---------------- 同步接口 ----------------
+    
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+        
         if self.use_redis and self.redis_client:
             try:
                 value = self.redis_client.get(key)
                 if value:
-                    return json.loads(value)
+                    value = self._loads(value)
+                    self._l1_set(key, value, settings.CACHE_L1_TTL)
+                    return value
             except Exception as e:
                 print(f"Redis获取缓存失败: {e}")
         
         # 内存缓存
-        if key in self.memory_cache:
-            entry = self.memory_cache[key]
-            if time.time() < entry['expires_at']:
-                return entry['value']
-            else:
-                del self.memory_cache[key]
-        
-        return None
+        return self.memory_cache.get(key)
     
-    def set(self, key: str, value: Any, ttl: int = 3600):
-        """设置缓存值"""
+    def set(self, key: str, value: Any, ttl: int = 3600, tags: Optional[Iterable[str]] = None):
+        """设置缓存值，tags（如 project:42、course:7、kb）用于invalidate_tag批量失效"""
         if self.use_redis and self.redis_client:
             try:
-                self.redis_client.setex(
-                    key,
-                    ttl,
-                    json.dumps(value)
-                )
+                pipe = self.redis_client.pipeline(transaction=False)
+                self._queue_set(pipe, key, value, ttl, tags)
+                if self.l1_cache is not None:
+                    pipe.publish(self.invalidation_channel, self._invalidation_message([key]))
+                pipe.execute()
+                self._l1_set(key, value, ttl, tags)
                 return
             except Exception as e:
                 print(f"Redis设置缓存失败: {e}")
         
         # 内存缓存
-        self.memory_cache[key] = {
-            'value': value,
-            'expires_at': time.time() + ttl
-        }
+        self.memory_cache.set(key, value, ttl, tags)
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """批量获取缓存值（Redis使用MGET一次往返），只返回命中的键"""
+        result: Dict[str, Any] = {}
+        for key in keys:
+            value = self._l1_get(key)
+            if value is not None:
+                result[key] = value
+        
+        missing = [key for key in keys if key not in result]
+        if self.use_redis and self.redis_client and missing:
+            try:
+                for key, value in zip(missing, self.redis_client.mget(missing)):
+                    if value:
+                        result[key] = self._loads(value)
+                        self._l1_set(key, result[key], settings.CACHE_L1_TTL)
+            except Exception as e:
+                print(f"Redis批量获取缓存失败: {e}")
+        
+        for key in keys:
+            if key not in result:
+                value = self.memory_cache.get(key)
+                if value is not None:
+                    result[key] = value
+        return result
+    
+    def set_many(self, mapping: Dict[str, Any], ttl: int = 3600, tags: Optional[Iterable[str]] = None):
+        """批量设置缓存值（Redis使用pipeline一次往返）"""
+        if not mapping:
+            return
+        tags = list(tags or ())
+        if self.use_redis and self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, value in mapping.items():
+                    self._queue_set(pipe, key, value, ttl, tags)
+                if self.l1_cache is not None:
+                    pipe.publish(self.invalidation_channel, self._invalidation_message(list(mapping)))
+                pipe.execute()
+                for key, value in mapping.items():
+                    self._l1_set(key, value, ttl, tags)
+                return
+            except Exception as e:
+                print(f"Redis批量设置缓存失败: {e}")
+        
+        for key, value in mapping.items():
+            self.memory_cache.set(key, value, ttl, tags)
     
     def delete(self, key: str):
         """删除缓存"""
+        if self.l1_cache is not None:
+            self.l1_cache.delete(key)
         if self.use_redis and self.redis_client:
             try:
-                self.redis_client.delete(key)
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.delete(key)
+                if self.l1_cache is not None:
+                    pipe.publish(self.invalidation_channel, self._invalidation_message([key]))
+                pipe.execute()
             except Exception as e:
                 print(f"Redis删除缓存失败: {e}")
         
-        self.memory_cache.pop(key, None)
+        self.memory_cache.delete(key)
     
     def clear(self, pattern: Optional[str] = None):
-        """清除缓存"""
+        """清除缓存（Redis使用SCAN + UNLINK分批删除，不阻塞Redis）"""
+        if self.l1_cache is not None:
+            self.l1_cache.clear(pattern)
         if self.use_redis and self.redis_client and pattern:
             try:
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    self.redis_client.delete(*keys)
+                batch_size = settings.CACHE_SCAN_BATCH_SIZE
+                batch = []
+                for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                    batch.append(key)
+                    if len(batch) >= batch_size:
+                        self.redis_client.unlink(*batch)
+                        batch = []
+                if batch:
+                    self.redis_client.unlink(*batch)
+                if self.l1_cache is not None:
+                    self.redis_client.publish(
+                        self.invalidation_channel,
+                        self._invalidation_message(pattern=pattern)
+                    )
             except Exception as e:
                 print(f"Redis清除缓存失败: {e}")
         
-        if not pattern:
-            self.memory_cache.clear()
+        self.memory_cache.clear(pattern)
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """删除带有指定标签的全部缓存（SSCAN + UNLINK分批删除），返回删除的键数"""
+        count = self.memory_cache.invalidate_tag(tag)
+        if self.l1_cache is not None:
+            self.l1_cache.invalidate_tag(tag)
+        if self.use_redis and self.redis_client:
+            try:
+                batch_size = settings.CACHE_SCAN_BATCH_SIZE
+                tag_key = self._tag_key(tag)
+                batch = []
+                for key in self.redis_client.sscan_iter(tag_key, count=batch_size):
+                    batch.append(key)
+                    if len(batch) >= batch_size:
+                        count += self._unlink_tagged(batch, tag)
+                        batch = []
+                count += self._unlink_tagged(batch, tag)
+                self.redis_client.unlink(tag_key)
+            except Exception as e:
+                print(f"Redis按标签失效缓存失败: {e}")
+        return count
+    
+    def _unlink_tagged(self, keys: List[Any], tag: str) -> int:
+        """删除一批带标签的键，并通知其他worker的L1"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        if self.l1_cache is not None:
+            pipe.publish(self.invalidation_channel, self._invalidation_message(keys, tags=[tag]))
+        results = pipe.execute()
+        return results[0] if keys else 0
+    
+    # ---------------- 异步接口 ----------------
+    
+    async def aget(self, key: str) -> Optional[Any]:
+        """异步获取缓存值"""
+        value = self._l1_get(key)
+        if value is not None:
+            return value
+        
+        client = self._get_async_client()
+        if client is not None:
+            try:
+                value = await client.get(key)
+                if value:
+                    value = self._loads(value)
+                    self._l1_set(key, value, settings.CACHE_L1_TTL)
+                    return value
+            except Exception as e:
+                print(f"Redis获取缓存失败: {e}")
+        
+        return self.memory_cache.get(key)
+    
+    async def aset(self, key: str, value: Any, ttl: int = 3600, tags: Optional[Iterable[str]] = None):
+        """异步设置缓存值"""
+        client = self._get_async_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                self._queue_set(pipe, key, value, ttl, tags)
+                if self.l1_cache is not None:
+                    pipe.publish(self.invalidation_channel, self._invalidation_message([key]))
+                await pipe.execute()
+                self._l1_set(key, value, ttl, tags)
+                return
+            except Exception as e:
+                print(f"Redis设置缓存失败: {e}")
+        
+        self.memory_cache.set(key, value, ttl, tags)
+    
+    async def aget_many(self, keys: List[str]) -> Dict[str, Any]:
+        """异步批量获取缓存值，只返回命中的键"""
+        result: Dict[str, Any] = {}
+        for key in keys:
+            value = self._l1_get(key)
+            if value is not None:
+                result[key] = value
+        
+        missing = [key for key in keys if key not in result]
+        client = self._get_async_client()
+        if client is not None and missing:
+            try:
+                for key, value in zip(missing, await client.mget(missing)):
+                    if value:
+                        result[key] = self._loads(value)
+                        self._l1_set(key, result[key], settings.CACHE_L1_TTL)
+            except Exception as e:
+                print(f"Redis批量获取缓存失败: {e}")
+        
+        for key in keys:
+            if key not in result:
+                value = self.memory_cache.get(key)
+                if value is not None:
+                    result[key] = value
+        return result
+    
+    async def aset_many(self, mapping: Dict[str, Any], ttl: int = 3600, tags: Optional[Iterable[str]] = None):
+        """异步批量设置缓存值（pipeline）"""
+        if not mapping:
+            return
+        tags = list(tags or ())
+        client = self._get_async_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, value in mapping.items():
+                    self._queue_set(pipe, key, value, ttl, tags)
+                if self.l1_cache is not None:
+                    pipe.publish(self.invalidation_channel, self._invalidation_message(list(mapping)))
+                await pipe.execute()
+                for key, value in mapping.items():
+                    self._l1_set(key, value, ttl, tags)
+                return
+            except Exception as e:
+                print(f"Redis批量设置缓存失败: {e}")
+        
+        for key, value in mapping.items():
+            self.memory_cache.set(key, value, ttl, tags)
+    
+    async def adelete(self, key: str):
+        """异步删除缓存"""
+        if self.l1_cache is not None:
+            self.l1_cache.delete(key)
+        client = self._get_async_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.delete(key)
+                if self.l1_cache is not None:
+                    pipe.publish(self.invalidation_channel, self._invalidation_message([key]))
+                await pipe.execute()
+            except Exception as e:
+                print(f"Redis删除缓存失败: {e}")
+        
+        self.memory_cache.delete(key)
+    
+    async def ainvalidate_tag(self, tag: str) -> int:
+        """异步删除带有指定标签的全部缓存，返回删除的键数"""
+        count = self.memory_cache.invalidate_tag(tag)
+        if self.l1_cache is not None:
+            self.l1_cache.invalidate_tag(tag)
+        client = self._get_async_client()
+        if client is not None:
+            try:
+                batch_size = settings.CACHE_SCAN_BATCH_SIZE
+                tag_key = self._tag_key(tag)
+                batch = []
+                async for key in client.sscan_iter(tag_key, count=batch_size):
+                    batch.append(key)
+                    if len(batch) >= batch_size:
+                        count += await self._aunlink_tagged(client, batch, tag)
+                        batch = []
+                count += await self._aunlink_tagged(client, batch, tag)
+                await client.unlink(tag_key)
+            except Exception as e:
+                print(f"Redis按标签失效缓存失败: {e}")
+        return count
+    
+    async def _aunlink_tagged(self, client, keys: List[Any], tag: str) -> int:
+        pipe = client.pipeline(transaction=False)
+        if keys:
+            pipe.unlink(*keys)
+        if self.l1_cache is not None:
+            pipe.publish(self.invalidation_channel, self._invalidation_message(keys, tags=[tag]))
+        results = await pipe.execute()
+        return results[0] if keys else 0
+    
+    async def aclose(self):
+        """关闭异步连接池（应用关闭时调用）"""
+        if self._async_client is not None and not self._async_client_injected:
+            try:
+                await self._async_client.aclose()
+            except Exception as e:
+                print(f"关闭Redis连接池失败: {e}")
+            self._async_client = None
+            self._async_loop = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        stats = {
+            'backend': 'redis' if self.use_redis else 'memory',
+            'memory': self.memory_cache.stats(),
+            'codec': self.codec.stats(),
+        }
+        if self.l1_cache is not None:
+            stats['l1'] = self.l1_cache.stats()
+        return stats
 
 # 全局缓存实例
 cache_service = CacheService()
 
-def cached(prefix: str, ttl: int = 3600):
-    """缓存装饰器"""
+# 正在进行中的计算任务（按缓存键合并并发请求）
+_inflight: Dict[str, "asyncio.Task"] = {}
+
+# 支持stale-while-revalidate的缓存包装标记
+_SWR_MARKER = "__swr__"
+
+
+def jittered_ttl(ttl: int, jitter: float) -> int:
+    """为TTL增加随机抖动（只缩短不延长），避免大量键同时过期"""
+    if jitter <= 0 or ttl <= 1:
+        return ttl
+    return max(1, int(ttl - random.uniform(0, ttl * jitter)))
+
+
+def _on_flight_done(key: str, task: "asyncio.Task"):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # 标记异常已被读取，避免无人等待时输出警告
+    if not task.cancelled():
+        task.exception()
+
+
+def single_flight(key: str, factory: Callable[[], Awaitable[Any]]) -> "asyncio.Task":
+    """同一事件循环内，同一键只运行一个计算任务，其余调用方共享该任务"""
+    loop = asyncio.get_running_loop()
+    task = _inflight.get(key)
+    if task is None or task.done() or task.get_loop() is not loop:
+        task = loop.create_task(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _on_flight_done(key, t))
+    return task
+
+
+def cached(
+    prefix: str,
+    ttl: int = 3600,
+    stale_ttl: int = 0,
+    jitter: Optional[float] = None,
+    tags: Optional[Union[Iterable[str], Callable[..., Iterable[str]]]] = None
+):
+    """缓存装饰器
+    
+    - 并发请求同一个已过期/不存在的键时，只有一个调用方执行被装饰函数，其余等待同一结果
+    - stale_ttl > 0 时启用stale-while-revalidate：过期后stale_ttl秒内直接返回旧值，
+      同时在后台刷新一次
+    - jitter为TTL随机缩短的比例（默认取配置CACHE_TTL_JITTER）
+    - tags为标签列表，或接收被装饰函数参数并返回标签列表的函数
+    """
+    ttl_jitter = settings.CACHE_TTL_JITTER if jitter is None else jitter
+    
     def decorator(func: Callable):
+        async def compute(cache_key: str, args, kwargs):
+            result = await func(*args, **kwargs)
+            fresh_ttl = jittered_ttl(ttl, ttl_jitter)
+            entry_tags = tags(*args, **kwargs) if callable(tags) else tags
+            if stale_ttl > 0:
+                await cache_service.aset(cache_key, {
+                    _SWR_MARKER: True,
+                    'value': result,
+                    'fresh_until': time.time() + fresh_ttl
+                }, fresh_ttl + stale_ttl, entry_tags)
+            else:
+                await cache_service.aset(cache_key, result, fresh_ttl, entry_tags)
+            return result
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成缓存键
             cache_key = cache_service._make_key(prefix, *args, **kwargs)
             
-            # 尝试从缓存获取
-            cached_value = cache_service.get(cache_key)
+            # 尝试从缓存获取（异步Redis，不阻塞事件循环）
+            cached_value = await cache_service.aget(cache_key)
             if cached_value is not None:
+                if stale_ttl > 0 and isinstance(cached_value, dict) and cached_value.get(_SWR_MARKER):
+                    if time.time() >= cached_value['fresh_until']:
+                        # 已过期但仍在stale窗口内：返回旧值并后台刷新
+                        single_flight(cache_key, lambda: compute(cache_key, args, kwargs))
+                    return cached_value['value']
                 return cached_value
             
-            # 执行函数
-            result = await func(*args, **kwargs)
-            
-            # 存入缓存
-            cache_service.set(cache_key, result, ttl)
-            
-            return result
+            # 执行函数（合并并发请求），shield保证调用方取消时计算仍会完成并写入缓存
+            task = single_flight(cache_key, lambda: compute(cache_key, args, kwargs))
+            return await asyncio.shield(task)
         return wrapper
     return decorator
-
-
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,194 @@
+"""
+缓存值编解码 - 可插拔的序列化与压缩
+
+存储格式：MAGIC(1字节) + 序列化器标记(1字节) + 压缩标记(1字节) + 数据
+旧版本直接写入的JSON字符串没有MAGIC前缀，解码时按JSON读取，保证兼容。
+"""
+import json
+import time
+import zlib
+import threading
+from typing import Any, Callable, Dict, Tuple, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import lz4.frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    LZ4_AVAILABLE = False
+
+MAGIC = b"\x00"
+
+# 序列化器：名称 -> (标记, dumps, loads)
+SERIALIZERS: Dict[str, Tuple[bytes, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (
+        b"j",
+        lambda v: json.dumps(v, ensure_ascii=False).encode("utf-8"),
+        lambda b: json.loads(b.decode("utf-8")),
+    ),
+}
+if ORJSON_AVAILABLE:
+    SERIALIZERS["orjson"] = (
+        b"o",
+        lambda v: orjson.dumps(v, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads,
+    )
+if MSGPACK_AVAILABLE:
+    SERIALIZERS["msgpack"] = (
+        b"m",
+        lambda v: msgpack.packb(v, use_bin_type=True),
+        lambda b: msgpack.unpackb(b, raw=False, strict_map_key=False),
+    )
+
+# 压缩算法：名称 -> (标记, compress, decompress)
+COMPRESSORS: Dict[str, Tuple[bytes, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (b"-", lambda b: b, lambda b: b),
+    "zlib": (b"z", lambda b: zlib.compress(b, 6), zlib.decompress),
+}
+if ZSTD_AVAILABLE:
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    COMPRESSORS["zstd"] = (
+        b"Z",
+        lambda b: _zstd_compressor.compress(b),
+        lambda b: _zstd_decompressor.decompress(b),
+    )
+if LZ4_AVAILABLE:
+    COMPRESSORS["lz4"] = (b"l", lz4.frame.compress, lz4.frame.decompress)
+
+_SERIALIZER_BY_TAG = {tag: loads for tag, _, loads in SERIALIZERS.values()}
+_DECOMPRESSOR_BY_TAG = {tag: decompress for tag, _, decompress in COMPRESSORS.values()}
+
+
+def resolve_serializer(name: str) -> str:
+    """解析序列化器名称，auto按 orjson > msgpack > json 选择已安装的实现"""
+    if name == "auto":
+        for candidate in ("orjson", "msgpack", "json"):
+            if candidate in SERIALIZERS:
+                return candidate
+    if name not in SERIALIZERS:
+        print(f"⚠️  缓存序列化器 {name} 不可用，使用json")
+        return "json"
+    return name
+
+
+def resolve_compressor(name: str) -> str:
+    """解析压缩算法名称，auto按 zstd > lz4 > zlib 选择已安装的实现"""
+    if name == "auto":
+        for candidate in ("zstd", "lz4", "zlib"):
+            if candidate in COMPRESSORS:
+                return candidate
+    if name not in COMPRESSORS:
+        print(f"⚠️  缓存压缩算法 {name} 不可用，使用zlib")
+        return "zlib"
+    return name
+
+
+class CacheCodec:
+    """缓存编解码器：序列化后超过阈值再压缩，并统计节省字节数与编解码耗时"""
+
+    def __init__(
+        self,
+        serializer: str = "auto",
+        compression: str = "auto",
+        compression_threshold: int = 1024
+    ):
+        self.serializer = resolve_serializer(serializer)
+        self.compression = resolve_compressor(compression)
+        self.compression_threshold = compression_threshold
+        self._ser_tag, self._dumps, _ = SERIALIZERS[self.serializer]
+        self._comp_tag, self._compress, _ = COMPRESSORS[self.compression]
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def encode(self, value: Any) -> bytes:
+        """编码缓存值"""
+        start = time.perf_counter()
+        payload = self._dumps(value)
+        serialized_size = len(payload)
+        comp_tag = b"-"
+        if self.compression != "none" and serialized_size >= self.compression_threshold:
+            compressed = self._compress(payload)
+            # 压缩后没有变小则保留原始数据
+            if len(compressed) < serialized_size:
+                payload = compressed
+                comp_tag = self._comp_tag
+        data = MAGIC + self._ser_tag + comp_tag + payload
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.encode_count += 1
+            self.encode_seconds += elapsed
+            self.serialized_bytes += serialized_size
+            self.stored_bytes += len(data)
+            if comp_tag != b"-":
+                self.compressed_count += 1
+        return data
+
+    def decode(self, raw: Union[bytes, str]) -> Any:
+        """解码缓存值（兼容无格式标记的旧JSON数据）"""
+        start = time.perf_counter()
+        if isinstance(raw, str):
+            value = json.loads(raw)
+        elif not raw.startswith(MAGIC) or len(raw) < 3:
+            value = json.loads(raw)
+        else:
+            ser_tag, comp_tag = raw[1:2], raw[2:3]
+            loads = _SERIALIZER_BY_TAG.get(ser_tag)
+            decompress = _DECOMPRESSOR_BY_TAG.get(comp_tag)
+            if loads is None or decompress is None:
+                raise ValueError(f"不支持的缓存格式: {raw[:3]!r}")
+            value = loads(decompress(raw[3:]))
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.decode_count += 1
+            self.decode_seconds += elapsed
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """编解码统计"""
+        with self._lock:
+            return {
+                'serializer': self.serializer,
+                'compression': self.compression,
+                'compression_threshold': self.compression_threshold,
+                'encode_count': self.encode_count,
+                'decode_count': self.decode_count,
+                'compressed_count': self.compressed_count,
+                'serialized_bytes': self.serialized_bytes,
+                'stored_bytes': self.stored_bytes,
+                'bytes_saved': self.serialized_bytes - self.stored_bytes,
+                'encode_ms_avg': round(self.encode_seconds * 1000 / self.encode_count, 4) if self.encode_count else 0.0,
+                'decode_ms_avg': round(self.decode_seconds * 1000 / self.decode_count, 4) if self.decode_count else 0.0,
+                'encode_seconds': round(self.encode_seconds, 6),
+                'decode_seconds': round(self.decode_seconds, 6),
+            }
+
+    def reset_stats(self):
+        """重置统计计数"""
+        with self._lock:
+            self.encode_count = 0
+            self.decode_count = 0
+            self.compressed_count = 0
+            self.serialized_bytes = 0
+            self.stored_bytes = 0
+            self.encode_seconds = 0.0
+            self.decode_seconds = 0.0
@@ -19,11 +19,29 @@ class Settings(BaseSettings):
     
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./film_education.db"
-    
+    # SQLite连接参数（每个新连接建立时通过PRAGMA设置）
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL模式下读写互不阻塞
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL模式下NORMAL可保证一致性，仅在断电时可能丢失最近的事务
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 数据库被锁时的等待时间（毫秒）
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取大小（字节），0表示关闭
+    SQLITE_CACHE_SIZE: int = -64000  # 页缓存大小，负数表示KiB（-64000约64MB）
+    # 连接池配置（PostgreSQL/MySQL）
+    DB_POOL_SIZE: int = 10  # 常驻连接数（同步/异步引擎各一个池）
+    DB_MAX_OVERFLOW: int = 20  # 高峰时允许额外创建的连接数
+    DB_POOL_TIMEOUT: int = 30  # 获取连接的最长等待时间（秒）
+    DB_POOL_RECYCLE: int = 1800  # 连接最长复用时间（秒），避免被服务端或代理断开
+    DB_POOL_PRE_PING: bool = True  # 取出连接前检测是否可用
+    # 列表接口分页配置（键集/游标分页）
+    PAGINATION_DEFAULT_LIMIT: int = 50  # 未指定limit时每页返回的条数
+    PAGINATION_MAX_LIMIT: int = 200  # 单页允许的最大条数
+
     # 安全配置
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PASSWORD_HASH_WORKERS: int = 2  # 密码哈希线程数（登录/注册时的pbkdf2/bcrypt计算）
+    PASSWORD_HASH_MAX_PENDING: int = 64  # 正在计算和排队的密码哈希上限，超出返回503
+    PRINCIPAL_CACHE_TTL: int = 60  # 已认证用户信息的缓存时间（秒），用户被修改/删除时立即失效，0表示不缓存
     
     # CORS配置
     CORS_ORIGINS: str = (
@@ -48,6 +66,31 @@ class Settings(BaseSettings):
     
     # Redis配置（用于Celery和缓存）
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50  # Redis连接池大小（同步/异步各一个池）
+    REDIS_SOCKET_TIMEOUT: float = 5.0  # Redis读写超时（秒）
+    
+    # 内存缓存配置（Redis不可用时的进程内缓存）
+    CACHE_MEMORY_MAX_ENTRIES: int = 10000  # 最大条目数
+    CACHE_MEMORY_MAX_BYTES: int = 128 * 1024 * 1024  # 最大字节数（128MB）
+    CACHE_SWEEP_INTERVAL: int = 60  # 后台清理过期条目的间隔（秒），0表示禁用
+    CACHE_TTL_JITTER: float = 0.1  # @cached TTL随机缩短比例，避免集中过期
+    
+    # 两级缓存配置（启用Redis时，进程内L1 + Redis L2）
+    CACHE_L1_ENABLED: bool = True
+    CACHE_L1_MAX_ENTRIES: int = 1000
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    CACHE_L1_TTL: int = 60  # L1最长保留时间（秒），兜底丢失失效消息的情况
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"  # 跨worker失效消息频道
+    
+    # 缓存标签与批量清除配置
+    CACHE_TAG_KEY_PREFIX: str = "cache:tag:"  # 标签集合键前缀
+    CACHE_TAG_TTL: int = 7 * 24 * 3600  # 标签集合最短保留时间（秒）
+    CACHE_SCAN_BATCH_SIZE: int = 500  # SCAN/UNLINK每批处理的键数
+    
+    # 缓存值编码配置（Redis中的存储格式）
+    CACHE_SERIALIZER: str = "auto"  # auto / orjson / msgpack / json
+    CACHE_COMPRESSION: str = "auto"  # auto / zstd / lz4 / zlib / none
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # 序列化后超过该字节数才压缩
     
     # Celery配置
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
@@ -64,6 +107,42 @@ class Settings(BaseSettings):
     STABLE_DIFFUSION_API_URL: str = ""  # Stable Diffusion API地址
     STABLE_DIFFUSION_API_KEY: str = ""
     WHISPER_MODEL: str = "base"  # whisper模型大小
+    MODEL_MEMORY_BUDGET_MB: int = 0  # 本地模型常驻内存预算（MB），0表示按物理内存的60%计算
+    MODEL_WARMUP_DEFAULT: str = "lazy"  # 未单独指定的模型的预热策略：eager / background / lazy
+    MODEL_WARMUP_POLICIES: str = ""  # 按模型覆盖预热策略，如 "clip=eager,whisper=background,whisperx=lazy"
+    MODEL_WORKER_PROCESSES: int = 2  # 模型推理worker进程数，0表示在API进程的线程池中执行
+    MODEL_WORKER_MAX_QUEUE: int = 32  # 等待执行的推理任务上限，超出返回503
+    MODEL_WORKER_TASK_TIMEOUT: float = 600  # 单个推理任务超时（秒），超时的worker会被终止并重建
+    MODEL_WORKER_MAX_TASKS: int = 200  # worker执行多少个任务后回收重建，0表示不回收
+    MODEL_WORKER_START_METHOD: str = "spawn"  # 子进程启动方式（spawn避免继承父进程的线程与CUDA状态）
+    MODEL_WORKER_PRELOAD: str = (
+        "app.services.clip_service,app.services.speech_service,app.services.whisperx_service,"
+        "app.services.tts_service,app.services.audio_service,app.services.editing_service"
+    )  # worker启动时预先导入的服务模块（导入时注册模型，随后按预热策略加载）
+    CLIP_BATCH_MAX_SIZE: int = 16  # CLIP微批处理每批最多合并的请求数（1表示关闭批处理）
+    CLIP_BATCH_MAX_WAIT_MS: float = 10  # CLIP微批处理收集请求的最长等待时间（毫秒）
+    
+    # 对话记忆配置（最近K轮原文 + 更早消息的滚动摘要）
+    CHAT_MEMORY_MAX_TURNS: int = 6  # 原样发送给大模型的最近对话轮数（一问一答为一轮）
+    CHAT_MEMORY_TOKEN_BUDGET: int = 3000  # 最近对话原文的token预算（估算值），超出时更早的消息并入摘要
+    CHAT_MEMORY_SUMMARY_MAX_TOKENS: int = 600  # 摘要长度上限（估算token数）
+    CHAT_MEMORY_LLM_SUMMARY: bool = True  # 使用大模型生成摘要，False或未配置大模型时使用摘录方式
+    # 流式回复帧合并配置（满足任一条件即合并发送一帧，两者都为0时每个增量单独发送）
+    CHAT_STREAM_FLUSH_INTERVAL_MS: float = 50  # 增量在缓冲区中的最长停留时间（毫秒）
+    CHAT_STREAM_FLUSH_BYTES: int = 1024  # 缓冲区达到该字节数时立即发送
+    CHAT_STREAM_FRAME_FORMAT: str = "json"  # 默认增量帧格式：json（文本帧）/ binary（UTF-8二进制帧），客户端可用 ?frames= 指定
+    # 聊天消息延迟批量写入配置（WebSocket对话）
+    MESSAGE_FLUSH_INTERVAL_MS: float = 200  # 消息在队列中的最长等待时间（毫秒）
+    MESSAGE_FLUSH_BATCH_SIZE: int = 100  # 队列达到该条数时立即写入一批
+    MESSAGE_STORE_MAX_PENDING: int = 5000  # 队列上限，超出时写入方等待写入完成（背压）
+    # 语义缓存配置（相似的问题直接返回缓存的回答，只用于会话的第一个问题）
+    SEMANTIC_CACHE_ENABLED: bool = False  # 是否启用（需显式开启）
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # 余弦相似度达到该值视为同一个问题
+    SEMANTIC_CACHE_TTL: int = 7 * 24 * 3600  # 缓存的回答保留时间（秒）
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2000  # 每个课程（作用域）最多缓存的问答数，超出时淘汰最早的
+    SEMANTIC_CACHE_EMBEDDING: str = "auto"  # 问题向量来源：auto / dashscope / openai / local（本地字符n-gram，只匹配措辞接近的问题）
+    SEMANTIC_CACHE_EMBEDDING_MODEL: str = ""  # 向量模型，空表示默认（dashscope: text-embedding-v3，openai: text-embedding-3-small）
+    SEMANTIC_CACHE_LOCAL_DIM: int = 512  # 本地向量维度
     
     # 阿里云百炼（DashScope）配置 - 通义万相文生视频/图生视频
     DASHSCOPE_API_KEY: str = ""  # 阿里云百炼API Key（从环境变量读取，获取地址：https://dashscope.console.aliyun.com/apiKey）
@@ -1,18 +1,113 @@
 """
 数据库配置
+
+同步引擎（SessionLocal/get_db）供脚本、认证依赖和尚未迁移的接口使用；
+异步引擎（AsyncSessionLocal/get_async_db）供高频async接口使用，查询不再阻塞事件循环。
+两者指向同一个数据库：SQLite使用aiosqlite驱动，PostgreSQL使用asyncpg驱动。
+
+SQLite连接建立时设置WAL等PRAGMA，使聊天、视频任务和评估的写入不再阻塞读取；
+PostgreSQL/MySQL使用显式的连接池大小并在取出连接前检测可用性。
 """
-from sqlalchemy import create_engine
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
+# 同步驱动 -> 异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+}
+
+
+def to_async_url(url: str) -> str:
+    """把同步数据库URL转换为对应的异步驱动URL（已是异步驱动时原样返回）"""
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return is_sqlite(url) and (":memory:" in url or url.rstrip("/").endswith("sqlite:"))
+
+
+def sqlite_pragmas(url: str) -> Dict[str, Any]:
+    """新连接需要执行的PRAGMA（内存数据库不支持WAL和mmap）"""
+    pragmas: Dict[str, Any] = {
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+    }
+    if not _is_memory_sqlite(url):
+        pragmas["journal_mode"] = settings.SQLITE_JOURNAL_MODE
+        pragmas["synchronous"] = settings.SQLITE_SYNCHRONOUS
+        pragmas["mmap_size"] = settings.SQLITE_MMAP_SIZE
+    return pragmas
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """create_engine参数：SQLite保持默认连接池，其他数据库使用显式池大小与pre-ping"""
+    if is_sqlite(url):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def install_sqlite_pragmas(sync_engine: Engine, url: str):
+    """在每个新建的SQLite连接上执行PRAGMA（异步引擎传入其sync_engine）"""
+    if not is_sqlite(url):
+        return
+    pragmas = sqlite_pragmas(url)
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
 engine = create_engine(
     settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
+    **engine_options(settings.DATABASE_URL)
 )
+install_sqlite_pragmas(engine, settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(
+    to_async_url(settings.DATABASE_URL),
+    **engine_options(settings.DATABASE_URL)
+)
+install_sqlite_pragmas(async_engine.sync_engine, settings.DATABASE_URL)
+
+# expire_on_commit=False：提交后仍可直接读取对象属性，避免在异步会话中触发隐式加载
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -23,3 +118,32 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def database_settings() -> Dict[str, Any]:
+    """实际生效的数据库设置：SQLite读取连接上的PRAGMA，其他数据库返回连接池参数"""
+    info: Dict[str, Any] = {
+        "url": engine.url.render_as_string(hide_password=True),
+        "async_driver": async_engine.url.drivername,
+        "pool": type(engine.pool).__name__,
+    }
+    if is_sqlite(settings.DATABASE_URL):
+        with engine.connect() as conn:
+            for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size"):
+                info[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+    else:
+        info.update(engine_options(settings.DATABASE_URL))
+    return info
+
+def log_database_settings():
+    """启动时打印实际生效的数据库设置"""
+    try:
+        info = database_settings()
+    except Exception as e:
+        print(f"⚠️  读取数据库设置失败: {e}")
+        return
+    details = ", ".join(f"{key}={value}" for key, value in info.items())
+    print(f"🗄️  数据库设置: {details}")
@@ -2,67 +2,110 @@
 AI模型管理器 - 统一管理模型加载、缓存和生命周期
 """
 import os
+import gc
 import time
 from typing import Dict, Any, Optional, Callable
-from functools import lru_cache
+from contextlib import contextmanager
 import threading
-from datetime import datetime, timedelta
+from datetime import datetime
+from app.core.config import settings
+
+def _current_rss() -> int:
+    """当前进程常驻内存（字节），无法获取时返回0"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def _total_memory() -> int:
+    """物理内存总量（字节），无法获取时返回0"""
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except Exception:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except Exception:
+        return 0
+
+
+def _measure_tensor_bytes(model: Any) -> int:
+    """统计模型（含tuple/list/dict中的子模型）参数与缓冲区占用的字节数"""
+    if isinstance(model, (list, tuple)):
+        return sum(_measure_tensor_bytes(m) for m in model)
+    if isinstance(model, dict):
+        return sum(_measure_tensor_bytes(m) for m in model.values())
+    total = 0
+    for attr in ("parameters", "buffers"):
+        iterator = getattr(model, attr, None)
+        if callable(iterator):
+            try:
+                total += sum(t.numel() * t.element_size() for t in iterator())
+            except Exception:
+                pass
+    # 部分封装对象（如whisper/TTS）把torch模型放在model属性上
+    inner = getattr(model, "model", None)
+    if total == 0 and inner is not None and inner is not model:
+        total = _measure_tensor_bytes(inner)
+    return total
+
+
+WARMUP_POLICIES = ("eager", "background", "lazy")
+
+
+def _parse_warmup_overrides(value: str) -> Dict[str, str]:
+    """解析 "clip=eager,whisper=lazy" 形式的预热策略配置"""
+    overrides = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, policy = (part.strip() for part in item.split("=", 1))
+        if policy in WARMUP_POLICIES:
+            overrides[name] = policy
+        else:
+            print(f"⚠️  忽略无效的模型预热策略: {item}")
+    return overrides
 
-class ModelCache:
-    """模型缓存管理"""
-    def __init__(self, ttl: int = 3600):  # 默认1小时过期
-        self.cache: Dict[str, Dict[str, Any]] = {}
-        self.ttl = ttl
-        self.lock = threading.Lock()
-    
-    def get(self, key: str) -> Optional[Any]:
-        """获取缓存"""
-        with self.lock:
-            if key in self.cache:
-                entry = self.cache[key]
-                if datetime.now() < entry['expires_at']:
-                    return entry['value']
-                else:
-                    del self.cache[key]
-            return None
-    
-    def set(self, key: str, value: Any):
-        """设置缓存"""
-        with self.lock:
-            self.cache[key] = {
-                'value': value,
-                'expires_at': datetime.now() + timedelta(seconds=self.ttl),
-                'created_at': datetime.now()
-            }
-    
-    def clear(self, key: Optional[str] = None):
-        """清除缓存"""
-        with self.lock:
-            if key:
-                self.cache.pop(key, None)
-            else:
-                self.cache.clear()
-    
-    def cleanup_expired(self):
-        """清理过期缓存"""
-        with self.lock:
-            now = datetime.now()
-            expired_keys = [
-                k for k, v in self.cache.items()
-                if now >= v['expires_at']
-            ]
-            for k in expired_keys:
-                del self.cache[k]
 
 class ModelManager:
-    """AI模型管理器 - 延迟加载和缓存策略"""
+    """AI模型管理器 - 延迟加载、内存预算与LRU驻留策略
+    
+    - 每个模型加载后测量其内存占用（优先统计张量字节数，其次使用加载前后RSS差值，
+      都不可用时使用注册时的size_mb估计）
+    - 常驻模型总占用超过预算时，按最近最少使用顺序卸载空闲模型（未被固定、当前未被使用）
+    - 固定（pin）的模型不会被自动卸载
+    - 启动预热策略：eager（启动时同步加载）、background（启动后在后台线程加载）、lazy（首次使用时加载）
+    """
     
-    def __init__(self):
+    def __init__(self, memory_budget_bytes: Optional[int] = None):
         self.models: Dict[str, Any] = {}
         self.model_loaders: Dict[str, Callable] = {}
-        self.model_cache = ModelCache()
         self.loading_locks: Dict[str, threading.Lock] = {}
         self.model_metadata: Dict[str, Dict[str, Any]] = {}
+        self.residency: Dict[str, Dict[str, Any]] = {}
+        self._state_lock = threading.RLock()
+        if memory_budget_bytes is None:
+            memory_budget_bytes = self._default_budget()
+        self.memory_budget_bytes = memory_budget_bytes
+        self.evictions = 0
+        # 预热状态：pending / loading / ready / failed
+        self.warmup_state: Dict[str, str] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+    
+    @staticmethod
+    def _default_budget() -> int:
+        """默认内存预算：配置值，未配置时取物理内存的60%（无法获取时不限制）"""
+        if settings.MODEL_MEMORY_BUDGET_MB > 0:
+            return settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+        return int(_total_memory() * 0.6)
     
     def register_model(
         self,
@@ -70,22 +113,79 @@ class ModelManager:
         loader_func: Callable,
         metadata: Optional[Dict[str, Any]] = None
     ):
-        """注册模型加载器"""
+        """注册模型加载器
+        
+        metadata可包含：
+        - size_mb: 预估内存占用（MB），用于加载前腾出空间
+        - pinned: 是否固定驻留
+        - warmup: 默认预热策略（eager / background / lazy），可被MODEL_WARMUP_POLICIES覆盖
+        """
+        metadata = metadata or {}
         self.model_loaders[model_name] = loader_func
         self.loading_locks[model_name] = threading.Lock()
-        self.model_metadata[model_name] = metadata or {}
+        self.model_metadata[model_name] = metadata
+        with self._state_lock:
+            state = self.residency.setdefault(model_name, {
+                'size_bytes': 0,
+                'load_time': None,
+                'loaded_at': None,
+                'last_used': None,
+                'use_count': 0,
+                'load_count': 0,
+                'in_use': 0,
+                'pinned': False,
+            })
+            state['pinned'] = bool(metadata.get('pinned', state['pinned']))
+    
+    def _touch(self, model_name: str):
+        with self._state_lock:
+            state = self.residency[model_name]
+            state['last_used'] = time.time()
+            state['use_count'] += 1
+    
+    def _expected_size(self, model_name: str) -> int:
+        """加载前预估的内存占用：上次测量值或注册时的size_mb"""
+        state = self.residency.get(model_name, {})
+        if state.get('size_bytes'):
+            return state['size_bytes']
+        return int(self.model_metadata.get(model_name, {}).get('size_mb', 0) * 1024 * 1024)
+    
+    def resident_bytes(self) -> int:
+        """当前常驻模型的总内存占用"""
+        with self._state_lock:
+            return sum(self.residency[name]['size_bytes'] for name in self.models)
+    
+    def _make_room(self, needed_bytes: int, exclude: Optional[str] = None):
+        """按LRU顺序卸载空闲模型，直到可容纳needed_bytes"""
+        if self.memory_budget_bytes <= 0:
+            return
+        while True:
+            with self._state_lock:
+                if self.resident_bytes() + needed_bytes <= self.memory_budget_bytes:
+                    return
+                candidates = [
+                    name for name in self.models
+                    if name != exclude
+                    and not self.residency[name]['pinned']
+                    and self.residency[name]['in_use'] == 0
+                ]
+                if not candidates:
+                    print(
+                        f"⚠️  模型内存超出预算: 常驻 {self.resident_bytes() / 1024 ** 2:.0f}MB + "
+                        f"需要 {needed_bytes / 1024 ** 2:.0f}MB > 预算 {self.memory_budget_bytes / 1024 ** 2:.0f}MB，"
+                        f"没有可卸载的空闲模型"
+                    )
+                    return
+                victim = min(candidates, key=lambda n: self.residency[n]['last_used'] or 0)
+                self.evictions += 1
+            print(f"♻️  内存预算不足，卸载最久未使用的模型: {victim}")
+            self.unload_model(victim)
     
     def get_model(self, model_name: str, force_reload: bool = False) -> Optional[Any]:
         """获取模型实例（延迟加载）"""
-        # 检查缓存
-        cache_key = f"model_{model_name}"
-        if not force_reload:
-            cached = self.model_cache.get(cache_key)
-            if cached is not None:
-                return cached
-        
         # 如果已加载，直接返回
         if model_name in self.models and not force_reload:
+            self._touch(model_name)
             return self.models[model_name]
         
         # 延迟加载
@@ -98,18 +198,41 @@ class ModelManager:
             with lock:
                 # 双重检查
                 if model_name in self.models and not force_reload:
+                    self._touch(model_name)
                     return self.models[model_name]
                 
+                if force_reload and model_name in self.models:
+                    self.unload_model(model_name)
+                
                 try:
+                    self._make_room(self._expected_size(model_name), exclude=model_name)
+                    
                     print(f"🔄 正在加载模型: {model_name}")
+                    rss_before = _current_rss()
                     start_time = time.time()
                     model = self.model_loaders[model_name]()
                     load_time = time.time() - start_time
                     
-                    self.models[model_name] = model
-                    self.model_cache.set(cache_key, model)
+                    size_bytes = (
+                        _measure_tensor_bytes(model)
+                        or max(0, _current_rss() - rss_before)
+                        or self._expected_size(model_name)
+                    )
+                    with self._state_lock:
+                        self.models[model_name] = model
+                        state = self.residency[model_name]
+                        state['size_bytes'] = size_bytes
+                        state['load_time'] = load_time
+                        state['loaded_at'] = time.time()
+                        state['load_count'] += 1
+                    self._touch(model_name)
                     
-                    print(f"✅ 模型 {model_name} 加载完成，耗时 {load_time:.2f}秒")
+                    print(
+                        f"✅ 模型 {model_name} 加载完成，耗时 {load_time:.2f}秒，"
+                        f"占用约 {size_bytes / 1024 ** 2:.0f}MB"
+                    )
+                    # 实际占用可能大于预估，加载后再检查一次预算
+                    self._make_room(0, exclude=model_name)
                     return model
                 except Exception as e:
                     print(f"❌ 模型 {model_name} 加载失败: {e}")
@@ -117,18 +240,144 @@ class ModelManager:
         
         return None
     
+    @contextmanager
+    def use_model(self, model_name: str):
+        """在使用期间标记模型为忙碌，避免推理过程中被LRU卸载
+        
+        用法:
+            with model_manager.use_model("clip") as model:
+                ...
+        """
+        model = self.get_model(model_name)
+        if model is None:
+            yield None
+            return
+        with self._state_lock:
+            self.residency[model_name]['in_use'] += 1
+        try:
+            yield model
+        finally:
+            with self._state_lock:
+                self.residency[model_name]['in_use'] -= 1
+                self.residency[model_name]['last_used'] = time.time()
+    
+    def pin_model(self, model_name: str):
+        """固定模型，使其不会被自动卸载"""
+        if model_name not in self.model_loaders:
+            raise ValueError(f"模型 {model_name} 未注册")
+        with self._state_lock:
+            self.residency[model_name]['pinned'] = True
+    
+    def unpin_model(self, model_name: str):
+        """取消固定"""
+        if model_name not in self.model_loaders:
+            raise ValueError(f"模型 {model_name} 未注册")
+        with self._state_lock:
+            self.residency[model_name]['pinned'] = False
+        self._make_room(0)
+    
     def unload_model(self, model_name: str):
         """卸载模型（释放内存）"""
-        if model_name in self.models:
-            del self.models[model_name]
-            self.model_cache.clear(f"model_{model_name}")
-            print(f"🗑️  模型 {model_name} 已卸载")
+        with self._state_lock:
+            model = self.models.pop(model_name, None)
+            if model is not None:
+                self.residency[model_name]['loaded_at'] = None
+        if model is None:
+            return
+        del model
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+        print(f"🗑️  模型 {model_name} 已卸载")
+
+    def apply_action(self, action: str, model_name: str) -> Dict[str, Any]:
+        """执行管理操作（pin / unpin / unload）并返回模型信息；模型未注册时抛出ValueError
+
+        管理接口在API进程中直接调用，启用推理进程池时通过进程池在每个worker中调用
+        """
+        if model_name not in self.model_loaders:
+            raise ValueError(f"模型 {model_name} 未注册")
+        if action == "pin":
+            self.pin_model(model_name)
+        elif action == "unpin":
+            self.unpin_model(model_name)
+        elif action == "unload":
+            self.unload_model(model_name)
+        else:
+            raise ValueError(f"未知的模型操作: {action}")
+        return self.get_model_info(model_name)
+
+    def warmup_policy(self, model_name: str) -> str:
+        """模型的预热策略：配置覆盖 > 注册时的metadata > 默认策略"""
+        overrides = _parse_warmup_overrides(settings.MODEL_WARMUP_POLICIES)
+        policy = overrides.get(model_name) or self.model_metadata.get(model_name, {}).get("warmup")
+        if policy not in WARMUP_POLICIES:
+            policy = settings.MODEL_WARMUP_DEFAULT
+        return policy if policy in WARMUP_POLICIES else "lazy"
+    
+    def _warm(self, model_name: str):
+        self.warmup_state[model_name] = "loading"
+        model = self.get_model(model_name)
+        self.warmup_state[model_name] = "ready" if model is not None else "failed"
+    
+    def start_warmup(self):
+        """按预热策略加载模型：eager模型同步加载，background模型在后台线程依次加载"""
+        eager = [n for n in self.model_loaders if self.warmup_policy(n) == "eager"]
+        background = [n for n in self.model_loaders if self.warmup_policy(n) == "background"]
+        for name in eager + background:
+            self.warmup_state[name] = "pending"
+        
+        for name in eager:
+            self._warm(name)
+        
+        if background:
+            def _run():
+                for name in background:
+                    self._warm(name)
+                print("✅ 后台模型预热完成")
+            
+            self._warmup_thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+            self._warmup_thread.start()
+    
+    def is_ready(self) -> bool:
+        """所有需要预热的模型是否已处理完毕（加载失败也视为完成，避免就绪检查永远阻塞）"""
+        return all(state in ("ready", "failed") for state in self.warmup_state.values())
+    
+    def warmup_status(self) -> Dict[str, Any]:
+        """预热进度"""
+        return {
+            "ready": self.is_ready(),
+            "models": {
+                name: self.warmup_state.get(name, "lazy" if self.warmup_policy(name) == "lazy" else "pending")
+                for name in self.model_loaders
+            }
+        }
     
     def get_model_info(self, model_name: str) -> Dict[str, Any]:
-        """获取模型信息"""
+        """获取模型信息（驻留状态、内存占用、加载耗时、最近使用时间）"""
+        with self._state_lock:
+            state = dict(self.residency.get(model_name, {}))
+        
+        def _iso(ts):
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+        
         info = {
             'name': model_name,
             'loaded': model_name in self.models,
+            'pinned': state.get('pinned', False),
+            'in_use': state.get('in_use', 0),
+            'size_mb': round(state.get('size_bytes', 0) / 1024 ** 2, 1),
+            'load_time': round(state['load_time'], 3) if state.get('load_time') is not None else None,
+            'loaded_at': _iso(state.get('loaded_at')),
+            'last_used': _iso(state.get('last_used')),
+            'use_count': state.get('use_count', 0),
+            'load_count': state.get('load_count', 0),
+            'warmup': self.warmup_policy(model_name),
+            'warmup_state': self.warmup_state.get(model_name),
             'metadata': self.model_metadata.get(model_name, {}),
         }
         return info
@@ -139,17 +388,17 @@ class ModelManager:
             name: self.get_model_info(name)
             for name in self.model_loaders.keys()
         }
+    
+    def memory_status(self) -> Dict[str, Any]:
+        """内存预算与驻留概况"""
+        resident = self.resident_bytes()
+        return {
+            'budget_mb': round(self.memory_budget_bytes / 1024 ** 2, 1),
+            'resident_mb': round(resident / 1024 ** 2, 1),
+            'process_rss_mb': round(_current_rss() / 1024 ** 2, 1),
+            'loaded_models': list(self.models.keys()),
+            'evictions': self.evictions,
+        }
 
 # 全局模型管理器实例
 model_manager = ModelManager()
-
-
-
-
-
-
-
-
-
-
-
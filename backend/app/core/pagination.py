@@ -0,0 +1,153 @@
+"""
+键集（游标）分页
+
+列表接口按固定的排序键（如 (order, id)）取下一页：WHERE (排序键) 在上一页最后一行之后，
+LIMIT limit+1 判断是否还有下一页。与OFFSET分页相比，翻到后面的页时数据库不需要扫描并丢弃前面的行，
+并发插入也不会导致重复或遗漏。
+
+游标是上一页最后一行排序键取值的JSON（base64url编码），对客户端不透明。
+总数（total）需要额外的COUNT查询，只在 include_total=true 时计算。
+"""
+import base64
+import json
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# 排序键：(列, 是否降序) 或 (列, 是否降序, NULL时的排序值)。最后一个键必须唯一（通常是主键），保证顺序确定；
+# 排序键取值需可JSON序列化（时间列在SQLite中以字符串比较，按创建顺序排序时使用自增主键）。
+# 可为空的列必须提供第三项：按 coalesce(列, 值) 排序和比较，否则 列 > :游标 对NULL不成立，这些行会被跳过
+SortKey = Tuple[Any, ...]
+
+
+class Page(BaseModel, Generic[T]):
+    """分页响应"""
+    items: List[T]
+    next_cursor: Optional[str] = None  # 为空表示没有下一页
+    total: Optional[int] = None  # 仅在 include_total=true 时返回
+
+
+class PageParams:
+    """分页查询参数（作为FastAPI依赖使用）"""
+
+    def __init__(
+        self,
+        limit: int = Query(
+            settings.PAGINATION_DEFAULT_LIMIT, ge=1, le=settings.PAGINATION_MAX_LIMIT,
+            description="每页条数"
+        ),
+        cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+        include_total: bool = Query(False, description="是否返回总数（额外执行一次COUNT）")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.include_total = include_total
+
+    def cache_suffix(self) -> str:
+        """用于缓存键的分页参数部分"""
+        return f"limit={self.limit}:cursor={self.cursor or ''}:total={int(self.include_total)}"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把排序键取值编码为游标"""
+    raw = json.dumps(list(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """解析游标，格式不正确时返回400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("cursor size mismatch")
+        return values
+    except (ValueError, TypeError, UnicodeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def _sort_expression(key: SortKey):
+    """排序键对应的SQL表达式：提供了NULL排序值时为 coalesce(列, 值)"""
+    return func.coalesce(key[0], key[2]) if len(key) > 2 else key[0]
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]):
+    """构造“排在游标之后”的条件：(k1, k2, ...) > (v1, v2, ...)，按各键方向逐位比较"""
+    columns = [_sort_expression(key) for key in keys]
+    clauses = []
+    for i, key in enumerate(keys):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        beyond = columns[i] < values[i] if key[1] else columns[i] > values[i]
+        clauses.append(and_(*equal_prefix, beyond))
+    return or_(*clauses)
+
+
+def _key_values(row: Any, keys: Sequence[SortKey]) -> List[Any]:
+    values = []
+    for key in keys:
+        value = getattr(row, key[0].key)
+        values.append(key[2] if value is None and len(key) > 2 else value)
+    return values
+
+
+def keyset_statement(stmt: Select, keys: Sequence[SortKey], params: PageParams) -> Select:
+    """在查询上追加游标条件、排序和 LIMIT limit+1"""
+    if params.cursor:
+        stmt = stmt.where(_after(keys, decode_cursor(params.cursor, len(keys))))
+    order_by = [
+        _sort_expression(key).desc() if key[1] else _sort_expression(key).asc() for key in keys
+    ]
+    return stmt.order_by(*order_by).limit(params.limit + 1)
+
+
+def count_statement(stmt: Select) -> Select:
+    """基础查询（不含游标条件）的总数"""
+    return select(func.count()).select_from(stmt.order_by(None).subquery())
+
+
+def build_page(
+    rows: Sequence[Any],
+    keys: Sequence[SortKey],
+    params: PageParams,
+    serialize: Optional[Callable[[Any], Any]] = None,
+    total: Optional[int] = None
+) -> Dict[str, Any]:
+    """把 limit+1 行结果转换为分页响应"""
+    has_more = len(rows) > params.limit
+    rows = rows[:params.limit]
+    next_cursor = encode_cursor(_key_values(rows[-1], keys)) if has_more and rows else None
+    items = [serialize(row) for row in rows] if serialize else list(rows)
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+
+def paginate(
+    db: Session,
+    stmt: Select,
+    keys: Sequence[SortKey],
+    params: PageParams,
+    serialize: Optional[Callable[[Any], Any]] = None
+) -> Dict[str, Any]:
+    """同步会话上的键集分页"""
+    rows = db.scalars(keyset_statement(stmt, keys, params)).all()
+    total = db.scalar(count_statement(stmt)) if params.include_total else None
+    return build_page(rows, keys, params, serialize, total)
+
+
+async def apaginate(
+    db: AsyncSession,
+    stmt: Select,
+    keys: Sequence[SortKey],
+    params: PageParams,
+    serialize: Optional[Callable[[Any], Any]] = None
+) -> Dict[str, Any]:
+    """异步会话上的键集分页"""
+    rows = (await db.scalars(keyset_statement(stmt, keys, params))).all()
+    total = await db.scalar(count_statement(stmt)) if params.include_total else None
+    return build_page(rows, keys, params, serialize, total)
@@ -1,16 +1,33 @@
 """
 安全认证模块
+
+get_current_user 在每个需要认证的请求上执行。解析JWT后先查找已认证用户（principal）缓存，
+缓存键为 token 的 sub 与 jti（旧token没有jti时使用exp），命中时不访问数据库；
+未命中时用异步会话查询一次并缓存 PRINCIPAL_CACHE_TTL 秒。
+用户被修改或删除时调用 invalidate_principal 按用户标签立即失效（跨worker广播）。
+
+返回的 User 是由缓存字段构造的未绑定会话的对象，只用于读取 id、role 等字段；
+需要修改当前用户的接口应通过 db.get(User, current_user.id) 重新加载。
+
+登录/注册通过 password_hasher 在有界线程池中计算密码哈希，不阻塞事件循环；
+旧格式哈希在登录成功后自动升级为当前默认方案。
 """
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from app.core.config import settings
-from app.core.database import get_db
-from app.models.user import User
+from app.core.cache import cache_service
+from app.core.database import AsyncSessionLocal
+from app.models.user import User, UserRole
 
 # 密码加密上下文
 # 支持多种哈希格式以兼容旧数据：
@@ -27,30 +44,106 @@ except Exception:
 # OAuth2 token获取
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码（支持多种哈希格式）"""
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """验证密码，并在哈希需要升级时返回新哈希
+    
+    旧的bcrypt哈希或迭代次数低于当前默认值的pbkdf2哈希（needs_update）验证成功后，
+    返回用当前默认方案重新计算的哈希，由调用方写回数据库；否则新哈希为None。
+    """
     try:
-        result = pwd_context.verify(plain_password, hashed_password)
-        if result:
-            # 如果密码验证成功，但使用的是旧格式（bcrypt），可以考虑迁移到新格式
-            # 这里暂时不自动迁移，避免影响性能
-            return True
-        return False
-    except Exception as e:
-        # 如果验证失败，尝试手动处理 bcrypt 格式（向后兼容）
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    except Exception:
+        # passlib与新版bcrypt不兼容时手动验证 bcrypt 格式（向后兼容）
         if hashed_password.startswith("$2b$") or hashed_password.startswith("$2a$"):
             try:
                 import bcrypt
                 if bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8')):
-                    return True
+                    return True, pwd_context.hash(plain_password)
             except (ImportError, Exception):
                 pass
-        return False
+        return False, None
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """验证密码（支持多种哈希格式）"""
+    return verify_and_update_password(plain_password, hashed_password)[0]
 
 def get_password_hash(password: str) -> str:
     """生成密码哈希"""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """在独立线程池中计算密码哈希，避免登录/注册阻塞事件循环
+    
+    pbkdf2/bcrypt 的计算在 hashlib/bcrypt 的C实现中释放GIL，线程池即可并行且不占用事件循环。
+    线程数和排队数都有上限：上课集中登录时超出排队上限的请求直接返回503，而不是无限堆积。
+    """
+    
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.workers = workers or settings.PASSWORD_HASH_WORKERS
+        self.max_pending = max_pending or settings.PASSWORD_HASH_MAX_PENDING
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="password-hash"
+                    )
+        return self._executor
+    
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="登录请求过多，请稍后重试",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+    
+    async def hash(self, password: str) -> str:
+        """异步生成密码哈希"""
+        return await self._run(get_password_hash, password)
+    
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """异步验证密码，返回 (是否正确, 需要写回的新哈希或None)"""
+        valid, new_hash = await self._run(verify_and_update_password, plain_password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+            }
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -58,7 +151,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -70,11 +163,34 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
+# 缓存的用户字段（不包含密码哈希）
+PRINCIPAL_FIELDS = ("id", "username", "email", "full_name", "avatar_url", "is_active", "institution")
+
+def principal_cache_key(payload: dict) -> str:
+    """principal缓存键：sub + jti（旧token没有jti时使用exp）"""
+    return f"principal:{payload.get('sub')}:{payload.get('jti') or payload.get('exp')}"
+
+def principal_cache_tag(user_id: int) -> str:
+    """同一用户所有token的principal缓存标签"""
+    return f"user:{user_id}"
+
+def principal_to_dict(user: User) -> Dict[str, Any]:
+    data = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+    data["role"] = user.role.value if isinstance(user.role, UserRole) else user.role
+    return data
+
+def principal_from_dict(data: Dict[str, Any]) -> User:
+    """由缓存字段构造未绑定会话的User对象"""
+    return User(**{**data, "role": UserRole(data["role"])})
+
+async def invalidate_principal(user_id: int):
+    """用户信息变更或删除后清除其principal缓存"""
+    await cache_service.ainvalidate_tag(principal_cache_tag(user_id))
+
 async def get_current_user(
-    token: Optional[str] = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    token: Optional[str] = Depends(oauth2_scheme)
 ) -> User:
-    """获取当前用户"""
+    """获取当前用户（优先读取principal缓存）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -92,14 +208,26 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise credentials_exception
+    cache_key = principal_cache_key(payload)
+    data = await cache_service.aget(cache_key) if settings.PRINCIPAL_CACHE_TTL > 0 else None
+    if data is None:
+        async with AsyncSessionLocal() as db:
+            user = await db.scalar(select(User).where(User.username == username))
+        if user is None:
+            raise credentials_exception
+        data = principal_to_dict(user)
+        if settings.PRINCIPAL_CACHE_TTL > 0:
+            # 不超过token剩余有效期
+            ttl = settings.PRINCIPAL_CACHE_TTL
+            if payload.get("exp"):
+                ttl = min(ttl, int(payload["exp"] - time.time()))
+            if ttl > 0:
+                await cache_service.aset(cache_key, data, ttl, tags=[principal_cache_tag(user.id)])
     
-    if not user.is_active:
+    if not data["is_active"]:
         raise HTTPException(status_code=400, detail="用户已被禁用")
     
-    return user
+    return principal_from_dict(data)
 
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
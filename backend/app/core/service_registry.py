@@ -0,0 +1,120 @@
+"""
+服务注册表（延迟构建）
+
+服务模块过去在导入时直接创建全局单例（CLIP注册模型、Ollama同步探测HTTP、Chroma打开持久化目录、
+各服务导入重量级依赖），导入所有路由即完成全部初始化，冷启动和每次 --reload 都要等待数秒。
+
+现在服务模块通过 lazy_service() 注册工厂函数，模块级名称（如 clip_service）是一个代理对象：
+第一次访问其属性时才构建真实实例，之后所有访问都转发给同一个实例。
+原有的 `from app.services.x import x_service` 写法保持不变。
+"""
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class ServiceRegistry:
+    """按名称管理服务工厂和已构建的单例（线程安全，每个服务只构建一次）"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._modules: Dict[str, str] = {}
+        self._instances: Dict[str, Any] = {}
+        self._build_seconds: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any], module: Optional[str] = None) -> "LazyService":
+        """注册服务工厂并返回代理对象（重复注册时覆盖工厂，已构建的实例被丢弃）"""
+        with self._lock:
+            self._factories[name] = factory
+            self._modules[name] = module or getattr(factory, "__module__", "")
+            self._instances.pop(name, None)
+        return LazyService(self, name)
+
+    def get(self, name: str) -> Any:
+        """获取服务实例，首次调用时构建"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                if name not in self._factories:
+                    raise KeyError(f"服务未注册: {name}")
+                started = time.perf_counter()
+                instance = self._factories[name]()
+                self._build_seconds[name] = time.perf_counter() - started
+                self._instances[name] = instance
+            return instance
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def build(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """预先构建指定服务（默认全部），返回构建失败的服务名"""
+        failed = []
+        for name in list(names if names is not None else self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"⚠️  服务 {name} 构建失败: {e}")
+                failed.append(name)
+        return failed
+
+    def build_modules(self, module_names: Iterable[str]) -> List[str]:
+        """导入模块并构建其中注册的全部服务（推理进程预加载、关闭进程池时的模型预热使用）"""
+        failed = []
+        for module_name in module_names:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                print(f"⚠️  预加载 {module_name} 失败: {e}")
+                failed.append(module_name)
+                continue
+            failed += self.build([n for n, m in self._modules.items() if m == module_name])
+        return failed
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """各服务的构建状态和构建耗时"""
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "module": self._modules.get(name),
+                    "built": name in self._instances,
+                    "build_ms": round(self._build_seconds[name] * 1000, 1) if name in self._build_seconds else None,
+                }
+                for name in self._factories
+            ]
+
+
+class LazyService:
+    """服务代理：属性读写转发给注册表中的真实实例，首次访问时构建"""
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ServiceRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._registry.get(self._name), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._registry.get(self._name), attr, value)
+
+    def __delattr__(self, attr: str):
+        delattr(self._registry.get(self._name), attr)
+
+    def __repr__(self) -> str:
+        state = "built" if self._registry.is_built(self._name) else "lazy"
+        return f"<LazyService {self._name} ({state})>"
+
+
+service_registry = ServiceRegistry()
+
+
+def lazy_service(name: str, factory: Callable[[], Any]) -> LazyService:
+    """在服务模块末尾替代 `x_service = XService()`：`x_service = lazy_service("x_service", XService)`"""
+    return service_registry.register(name, factory)
@@ -0,0 +1,99 @@
+"""
+流式回复的帧合并
+
+大模型按token（有时按字符）返回增量，过去每个增量都单独 json.dumps + send_text 一次，
+一条千字回复就是上千个WebSocket帧，并发学生多时序列化和发送开销占满CPU。
+FrameCoalescer 把增量先放入缓冲区，满足以下任一条件时合并为一帧发送：
+- 缓冲区达到 max_bytes 字节
+- 距离缓冲区中第一个增量已过去 interval_ms 毫秒（由定时器保证，模型停顿时也不会积压）
+- 回复结束（close）
+interval_ms 和 max_bytes 都为0时每个增量立即发送（与原来的行为一致）。
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, List, Optional
+from app.core.config import settings
+
+
+def json_chunk_frame(content: str) -> str:
+    """JSON文本帧：{"type": "chunk", "content": ...}（默认格式，与原有客户端兼容）"""
+    return json.dumps({"type": "chunk", "content": content})
+
+
+def binary_chunk_frame(content: str) -> bytes:
+    """二进制帧：直接发送UTF-8编码的增量（控制消息仍使用JSON文本帧）"""
+    return content.encode("utf-8")
+
+
+class FrameCoalescer:
+    """按时间/大小把流式增量合并为帧"""
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        interval_ms: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.send = send
+        self.interval = (settings.CHAT_STREAM_FLUSH_INTERVAL_MS if interval_ms is None else interval_ms) / 1000
+        self.max_bytes = settings.CHAT_STREAM_FLUSH_BYTES if max_bytes is None else max_bytes
+        self.frames = 0
+        self.deltas = 0
+        self._buffer: List[str] = []
+        self._size = 0
+        self._first_at = 0.0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_task: Optional[asyncio.Task] = None
+
+    async def push(self, delta: str):
+        """加入一个增量，达到合并条件时发送"""
+        if not delta:
+            return
+        self.deltas += 1
+        if not self._buffer:
+            self._first_at = time.monotonic()
+        self._buffer.append(delta)
+        self._size += len(delta.encode("utf-8"))
+        if self._size >= self.max_bytes or time.monotonic() - self._first_at >= self.interval:
+            await self.flush()
+        elif self._timer is None:
+            remaining = self.interval - (time.monotonic() - self._first_at)
+            self._timer = asyncio.get_running_loop().call_later(remaining, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._timer_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """立即发送缓冲区中的内容"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return
+            content = "".join(self._buffer)
+            self._buffer.clear()
+            self._size = 0
+            self.frames += 1
+            await self.send(content)
+
+    def cancel(self):
+        """连接异常断开时丢弃未发送的内容，取消定时器"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        self._buffer.clear()
+        self._size = 0
+
+    async def close(self):
+        """回复结束：发送剩余内容并等待定时器触发的发送完成"""
+        await self.flush()
+        if self._timer_task is not None:
+            await self._timer_task
+            self._timer_task = None
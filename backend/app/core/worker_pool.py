@@ -0,0 +1,594 @@
+"""
+模型推理进程池 - 在常驻子进程中运行CPU密集的本地模型推理
+
+CLIP、Whisper、TTS、音频/视频分析都是同步调用，直接在async接口中执行会阻塞整个事件循环
+（包括WebSocket）。进程池中的每个worker是一个长期运行的子进程，按需加载并常驻模型；
+API进程通过队列把任务交给空闲worker，自身保持响应，同时利用多核。
+
+- 任务目标以字符串指定（"模块路径:属性路径"），worker内部导入，避免序列化服务对象
+- 等待队列有深度上限，超出时抛出WorkerPoolBusy（接口返回503）
+- 任务超时后，未开始的任务直接丢弃，执行中的任务所在worker被终止并重建
+- worker完成指定数量的任务后优雅退出并替换，防止内存碎片和泄漏累积
+- 进程数为0时退化为线程池执行（asyncio.to_thread），不再启动子进程
+- 模型驻留在worker中：worker在就绪和每个任务后上报模型驻留情况，模型管理操作（固定/卸载）
+  通过run_on_all在每个worker中执行，固定的模型在新建的worker中重新固定
+"""
+import os
+import time
+import pickle
+import signal
+import asyncio
+import importlib
+import itertools
+import threading
+import traceback
+import multiprocessing
+import queue as queue_module
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from fastapi import HTTPException
+from app.core.config import settings
+
+
+class WorkerPoolError(Exception):
+    """进程池错误基类"""
+
+
+class WorkerPoolBusy(WorkerPoolError):
+    """等待队列已满"""
+
+
+class WorkerTimeoutError(WorkerPoolError):
+    """任务执行超时"""
+
+
+class WorkerCrashedError(WorkerPoolError):
+    """worker进程在执行任务时异常退出"""
+
+
+class WorkerTaskError(WorkerPoolError):
+    """任务在worker中抛出异常"""
+
+    def __init__(self, exc_type: str, message: str, remote_traceback: str = ""):
+        super().__init__(f"{exc_type}: {message}")
+        self.exc_type = exc_type
+        self.message = message
+        self.remote_traceback = remote_traceback
+
+
+def resolve_target(target: str) -> Callable:
+    """解析 "app.services.clip_service:clip_service.match_image_text" 形式的任务目标"""
+    module_name, _, attr_path = target.partition(":")
+    if not attr_path:
+        raise ValueError(f"任务目标格式应为 '模块:属性'，实际为 {target!r}")
+    obj: Any = importlib.import_module(module_name)
+    for attr in attr_path.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _residency_report() -> Dict[str, Any]:
+    """当前进程的模型驻留情况（worker上报给父进程）"""
+    from app.core.model_manager import model_manager
+    return {"memory": model_manager.memory_status(), "models": model_manager.list_models()}
+
+
+def _worker_main(
+    worker_id: int,
+    task_queue,
+    result_queue,
+    preload: Sequence[str],
+    warmup: bool,
+    memory_budget_bytes: Optional[int],
+    pinned: Sequence[str] = ()
+):
+    """worker进程入口：预加载服务模块并预热模型，然后循环执行任务直到收到None"""
+    # Ctrl+C由父进程统一处理，worker通过None哨兵退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    parent_pid = os.getppid()
+
+    from app.core.model_manager import model_manager
+    if memory_budget_bytes is not None:
+        model_manager.memory_budget_bytes = memory_budget_bytes
+
+    # 服务单例延迟构建，预加载时显式构建，使其在预热前注册模型
+    from app.core.service_registry import service_registry
+    service_registry.build_modules(preload)
+    for model_name in pinned:
+        # 管理员固定的模型在新建（回收、崩溃重建）的worker中保持固定
+        if model_name in model_manager.model_loaders:
+            model_manager.pin_model(model_name)
+    if warmup:
+        model_manager.start_warmup()
+        if model_manager._warmup_thread is not None:
+            model_manager._warmup_thread.join()
+    result_queue.put((worker_id, None, "ready", os.getpid()))
+    result_queue.put((worker_id, None, "residency", _residency_report()))
+
+    targets: Dict[str, Callable] = {}
+    while True:
+        try:
+            task = task_queue.get(timeout=1.0)
+        except queue_module.Empty:
+            # 父进程已退出时自行结束，避免残留孤儿进程
+            if os.getppid() != parent_pid:
+                break
+            continue
+        if task is None:
+            break
+
+        task_id, target, args, kwargs = task
+        try:
+            fn = targets.get(target)
+            if fn is None:
+                fn = targets[target] = resolve_target(target)
+            # 在worker内完成序列化，不可pickle的结果也能以错误形式返回
+            payload = ("ok", pickle.dumps(fn(*args, **kwargs), protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            payload = ("error", (type(e).__name__, str(e), traceback.format_exc()))
+        result_queue.put((worker_id, task_id, payload[0], payload[1]))
+        try:
+            result_queue.put((worker_id, None, "residency", _residency_report()))
+        except Exception:
+            pass
+
+
+class _Worker:
+    """父进程中记录的worker状态"""
+
+    def __init__(self, worker_id: int, process, task_queue):
+        self.worker_id = worker_id
+        self.process = process
+        self.task_queue = task_queue
+        self.ready = False
+        self.current_task: Optional[int] = None
+        self.task_started_at: Optional[float] = None
+        self.completed = 0
+        self.started_at = time.time()
+        self.residency: Optional[Dict[str, Any]] = None  # 最近一次上报的模型驻留情况
+
+
+class ModelWorkerPool:
+    """常驻模型推理进程池"""
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        max_tasks_per_worker: Optional[int] = None,
+        start_method: Optional[str] = None,
+        preload: Optional[Sequence[str]] = None,
+        warmup: bool = True
+    ):
+        self.processes = settings.MODEL_WORKER_PROCESSES if processes is None else processes
+        self.max_queue = settings.MODEL_WORKER_MAX_QUEUE if max_queue is None else max_queue
+        self.task_timeout = settings.MODEL_WORKER_TASK_TIMEOUT if task_timeout is None else task_timeout
+        self.max_tasks_per_worker = (
+            settings.MODEL_WORKER_MAX_TASKS if max_tasks_per_worker is None else max_tasks_per_worker
+        )
+        self.start_method = start_method or settings.MODEL_WORKER_START_METHOD
+        if preload is None:
+            preload = [m.strip() for m in settings.MODEL_WORKER_PRELOAD.split(",") if m.strip()]
+        self.preload = list(preload)
+        self.warmup = warmup
+        self.pinned_models: set = set()  # 管理员固定的模型，新建的worker启动时重新固定
+
+        self._lock = threading.RLock()
+        self._ctx = None
+        self._result_queue = None
+        self._reader_thread: Optional[threading.Thread] = None
+        self._started = False
+        self._stopping = False
+        self._workers: Dict[int, _Worker] = {}
+        self._retired: List[Any] = []
+        self._worker_ids = itertools.count()
+        self._task_ids = itertools.count()
+        self._pending: deque = deque()
+        self._futures: Dict[int, Future] = {}
+        self._control: Dict[int, int] = {}  # run_on_all发给指定worker的任务 -> worker_id
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+
+    @property
+    def enabled(self) -> bool:
+        """是否使用子进程（进程数为0时使用线程执行）"""
+        return self.processes > 0
+
+    def _worker_budget(self) -> Optional[int]:
+        """每个worker的模型内存预算：API进程预算按worker数平分"""
+        from app.core.model_manager import model_manager
+        if model_manager.memory_budget_bytes <= 0:
+            return None
+        return model_manager.memory_budget_bytes // max(self.processes, 1)
+
+    def start(self):
+        """启动worker进程（重复调用无副作用）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._ctx = multiprocessing.get_context(self.start_method)
+            self._result_queue = self._ctx.Queue()
+            self._stopping = False
+            for _ in range(self.processes):
+                self._spawn_worker()
+            self._reader_thread = threading.Thread(
+                target=self._reader_loop, name="model-worker-reader", daemon=True
+            )
+            self._reader_thread.start()
+            self._started = True
+        print(f"✅ 模型推理进程池已启动: {self.processes} 个worker ({self.start_method})")
+
+    def _spawn_worker(self) -> _Worker:
+        worker_id = next(self._worker_ids)
+        task_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker_id, task_queue, self._result_queue, self.preload, self.warmup,
+                self._worker_budget(), sorted(self.pinned_models)
+            ),
+            name=f"model-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        worker = _Worker(worker_id, process, task_queue)
+        self._workers[worker_id] = worker
+        return worker
+
+    def _retire_worker(self, worker: _Worker, kill: bool = False):
+        """移除worker：kill=True时立即终止，否则发送哨兵等待其自行退出"""
+        self._workers.pop(worker.worker_id, None)
+        if kill:
+            worker.process.kill()
+            self._fail_control_tasks(worker.worker_id, WorkerCrashedError("worker进程已被终止"))
+        else:
+            try:
+                worker.task_queue.put(None)
+            except Exception:
+                worker.process.kill()
+        self._retired.append(worker.process)
+
+    def _reap_retired(self):
+        for process in list(self._retired):
+            if not process.is_alive():
+                process.join(timeout=0)
+                self._retired.remove(process)
+
+    def _dispatch(self):
+        """把等待中的任务分配给空闲worker（调用方持有锁）"""
+        for worker in self._workers.values():
+            if not self._pending:
+                return
+            if worker.current_task is not None:
+                continue
+            task_id, target, args, kwargs = self._pending.popleft()
+            worker.current_task = task_id
+            worker.task_started_at = time.time()
+            worker.task_queue.put((task_id, target, args, kwargs))
+
+    def _resolve(self, task_id: int, result: Any = None, error: Optional[BaseException] = None):
+        future = self._futures.pop(task_id, None)
+        if future is None:
+            return
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # 等待方已取消
+            pass
+
+    def _fail_control_tasks(self, worker_id: int, error: BaseException):
+        """worker退出时，发给它的run_on_all任务以错误结束"""
+        for task_id in [t for t, w in self._control.items() if w == worker_id]:
+            del self._control[task_id]
+            self._resolve(task_id, error=error)
+
+    def _handle_message(self, worker_id: int, task_id: Optional[int], kind: str, data: Any):
+        worker = self._workers.get(worker_id)
+        if kind == "ready":
+            if worker is not None:
+                worker.ready = True
+            return
+        if kind == "residency":
+            if worker is not None:
+                worker.residency = data
+            return
+        if self._control.pop(task_id, None) is not None:
+            # run_on_all的任务不占用worker的任务槽，也不计入任务统计
+            if kind == "ok":
+                try:
+                    self._resolve(task_id, result=pickle.loads(data))
+                except Exception as e:
+                    self._resolve(task_id, error=WorkerTaskError(type(e).__name__, str(e)))
+            else:
+                self._resolve(task_id, error=WorkerTaskError(*data))
+            return
+        if worker is not None and worker.current_task == task_id:
+            worker.current_task = None
+            worker.task_started_at = None
+            worker.completed += 1
+            if self.max_tasks_per_worker and worker.completed >= self.max_tasks_per_worker:
+                self._retire_worker(worker)
+                self._spawn_worker()
+                self.recycled += 1
+        if kind == "ok":
+            try:
+                self.completed += 1
+                self._resolve(task_id, result=pickle.loads(data))
+            except Exception as e:
+                self.failed += 1
+                self._resolve(task_id, error=WorkerTaskError(type(e).__name__, str(e)))
+        else:
+            self.failed += 1
+            self._resolve(task_id, error=WorkerTaskError(*data))
+
+    def _check_workers(self):
+        """检测异常退出的worker：执行中的任务以WorkerCrashedError结束，并补充新worker"""
+        for worker in list(self._workers.values()):
+            if worker.process.is_alive():
+                continue
+            exitcode = worker.process.exitcode
+            print(f"⚠️  模型worker-{worker.worker_id} 异常退出 (exitcode={exitcode})，正在重建")
+            self._workers.pop(worker.worker_id, None)
+            worker.process.join(timeout=0)
+            self.crashes += 1
+            if worker.current_task is not None:
+                self.failed += 1
+                self._resolve(
+                    worker.current_task,
+                    error=WorkerCrashedError(f"worker进程异常退出 (exitcode={exitcode})")
+                )
+            self._fail_control_tasks(
+                worker.worker_id, WorkerCrashedError(f"worker进程异常退出 (exitcode={exitcode})")
+            )
+            self._spawn_worker()
+
+    def _reader_loop(self):
+        """结果读取线程：分发结果、监控worker存活并派发等待中的任务"""
+        while not self._stopping:
+            try:
+                message = self._result_queue.get(timeout=0.5)
+            except queue_module.Empty:
+                message = None
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                if self._stopping:
+                    break
+                if message is not None:
+                    self._handle_message(*message)
+                self._check_workers()
+                self._reap_retired()
+                self._dispatch()
+
+    def submit(self, target: str, *args, **kwargs) -> Future:
+        """提交任务，返回带task_id属性的concurrent.futures.Future；等待队列已满时抛出WorkerPoolBusy"""
+        self.start()
+        with self._lock:
+            if self._stopping:
+                raise WorkerPoolError("模型推理进程池已关闭")
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise WorkerPoolBusy(f"模型推理队列已满（{self.max_queue}）")
+            task_id = next(self._task_ids)
+            future: Future = Future()
+            future.task_id = task_id
+            self._futures[task_id] = future
+            self._pending.append((task_id, target, args, kwargs))
+            self.submitted += 1
+            self._dispatch()
+        return future
+
+    def cancel(self, task_id: int, kill_running: bool = True) -> bool:
+        """取消任务：等待中的直接丢弃；执行中的在kill_running时终止所在worker并重建"""
+        with self._lock:
+            for item in self._pending:
+                if item[0] == task_id:
+                    self._pending.remove(item)
+                    self._futures.pop(task_id, None)
+                    return True
+            if not kill_running:
+                self._futures.pop(task_id, None)
+                return False
+            for worker in list(self._workers.values()):
+                if worker.current_task == task_id:
+                    self._futures.pop(task_id, None)
+                    self._retire_worker(worker, kill=True)
+                    self._spawn_worker()
+                    self._dispatch()
+                    return True
+        return False
+
+    async def run(self, target: str, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """在worker中执行 target(*args, **kwargs) 并等待结果"""
+        timeout = self.task_timeout if timeout is None else timeout
+        if not self.enabled:
+            fn = resolve_target(target)
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), timeout or None)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise WorkerTimeoutError(f"任务 {target} 超时（{timeout}s）")
+
+        future = self.submit(target, *args, **kwargs)
+        task_id = future.task_id
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout or None)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.cancel(task_id, kill_running=True)
+            raise WorkerTimeoutError(f"任务 {target} 超时（{timeout}s）")
+        except asyncio.CancelledError:
+            # 客户端断开：丢弃未开始的任务，执行中的任务让其自然完成
+            self.cancel(task_id, kill_running=False)
+            raise
+
+    async def run_on_all(self, target: str, *args, timeout: Optional[float] = None, **kwargs) -> List[Dict[str, Any]]:
+        """
+        在每个worker中各执行一次 target(*args, **kwargs)（模型固定、卸载等管理操作），不经过等待队列
+        返回每个worker的 {worker_id, pid, result} 或 {worker_id, pid, error, exc_type}；
+        worker正在执行推理任务时，操作在该任务完成后执行，超时的worker记为超时错误
+        进程数为0时在当前进程执行一次
+        """
+        timeout = self.task_timeout if timeout is None else timeout
+        if not self.enabled:
+            fn = resolve_target(target)
+            return [{"worker_id": None, "pid": os.getpid(), "result": fn(*args, **kwargs)}]
+
+        self.start()
+        futures: Dict[int, Future] = {}
+        with self._lock:
+            if self._stopping:
+                raise WorkerPoolError("模型推理进程池已关闭")
+            for worker in self._workers.values():
+                task_id = next(self._task_ids)
+                future: Future = Future()
+                future.task_id = task_id
+                future.worker_id = worker.worker_id
+                future.pid = worker.process.pid
+                self._futures[task_id] = future
+                self._control[task_id] = worker.worker_id
+                worker.task_queue.put((task_id, target, args, kwargs))
+                futures[task_id] = future
+
+        waiters = [asyncio.wrap_future(f) for f in futures.values()]
+        if waiters:
+            await asyncio.wait(waiters, timeout=timeout or None)
+        results = []
+        for future in futures.values():
+            entry: Dict[str, Any] = {"worker_id": future.worker_id, "pid": future.pid}
+            if not future.done():
+                with self._lock:
+                    self._control.pop(future.task_id, None)
+                    self._futures.pop(future.task_id, None)
+                self.timeouts += 1
+                entry.update(error=f"任务 {target} 超时（{timeout}s）", exc_type=WorkerTimeoutError.__name__)
+            elif future.exception() is not None:
+                error = future.exception()
+                entry.update(error=str(error), exc_type=getattr(error, "exc_type", type(error).__name__))
+            else:
+                entry["result"] = future.result()
+            results.append(entry)
+        return results
+
+    async def apply_model_action(self, action: str, model_name: str) -> List[Dict[str, Any]]:
+        """在每个worker中执行模型管理操作（pin / unpin / unload），记录固定的模型供新建的worker使用"""
+        results = await self.run_on_all("app.core.model_manager:model_manager.apply_action", action, model_name)
+        if any("result" in r for r in results):
+            if action == "pin":
+                self.pinned_models.add(model_name)
+            elif action == "unpin":
+                self.pinned_models.discard(model_name)
+        return results
+
+    def residency(self) -> List[Dict[str, Any]]:
+        """各worker最近一次上报的模型驻留情况（内存预算、已加载模型、固定状态）"""
+        with self._lock:
+            return [
+                {'worker_id': w.worker_id, 'pid': w.process.pid, 'ready': w.ready, **(w.residency or {})}
+                for w in self._workers.values()
+            ]
+
+    def is_ready(self) -> bool:
+        """所有worker是否已完成预加载和预热"""
+        with self._lock:
+            return self._started and all(w.ready for w in self._workers.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """进程池状态"""
+        with self._lock:
+            now = time.time()
+            return {
+                'enabled': self.enabled,
+                'started': self._started,
+                'processes': self.processes,
+                'start_method': self.start_method,
+                'ready': self.is_ready() if self.enabled else True,
+                'queue_depth': len(self._pending),
+                'max_queue': self.max_queue,
+                'task_timeout': self.task_timeout,
+                'max_tasks_per_worker': self.max_tasks_per_worker,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'crashes': self.crashes,
+                'recycled': self.recycled,
+                'pinned_models': sorted(self.pinned_models),
+                'workers': [
+                    {
+                        'worker_id': w.worker_id,
+                        'pid': w.process.pid,
+                        'alive': w.process.is_alive(),
+                        'ready': w.ready,
+                        'busy': w.current_task is not None,
+                        'running_seconds': round(now - w.task_started_at, 2) if w.task_started_at else 0.0,
+                        'completed': w.completed,
+                        'uptime_seconds': round(now - w.started_at, 1),
+                        'resident_mb': (w.residency or {}).get('memory', {}).get('resident_mb'),
+                        'loaded_models': (w.residency or {}).get('memory', {}).get('loaded_models', []),
+                    }
+                    for w in self._workers.values()
+                ],
+            }
+
+    def shutdown(self, timeout: float = 5.0):
+        """关闭进程池：等待中的任务以错误结束，worker收到哨兵后退出，超时则强制终止"""
+        with self._lock:
+            if not self._started:
+                return
+            self._stopping = True
+            while self._pending:
+                task_id = self._pending.popleft()[0]
+                self._resolve(task_id, error=WorkerPoolError("模型推理进程池已关闭"))
+            workers = list(self._workers.values())
+            for worker in workers:
+                self._retire_worker(worker)
+            self._started = False
+
+        deadline = time.time() + timeout
+        for process in list(self._retired):
+            process.join(timeout=max(deadline - time.time(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join(timeout=1)
+        self._retired.clear()
+        with self._lock:
+            self._control.clear()
+            for task_id in list(self._futures):
+                self._resolve(task_id, error=WorkerPoolError("模型推理进程池已关闭"))
+        if self._reader_thread is not None:
+            self._reader_thread.join(timeout=2)
+            self._reader_thread = None
+        if self._result_queue is not None:
+            self._result_queue.close()
+            self._result_queue = None
+        print("🛑 模型推理进程池已关闭")
+
+
+model_worker_pool = ModelWorkerPool()
+
+
+async def run_model_task(target: str, *args, **kwargs) -> Any:
+    """接口层调用入口：把进程池错误转换为HTTP错误（队列满503，超时504）"""
+    try:
+        return await model_worker_pool.run(target, *args, **kwargs)
+    except WorkerPoolBusy as e:
+        raise HTTPException(status_code=503, detail=f"模型推理繁忙，请稍后重试: {e}")
+    except WorkerTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
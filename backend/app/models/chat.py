@@ -1,7 +1,7 @@
 """
 聊天相关数据模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -12,12 +12,15 @@ class Conversation(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, unique=True, index=True)
     title = Column(String, nullable=True)
+    summary = Column(Text, nullable=True)  # 滑动窗口之外的更早消息的滚动摘要
+    summary_message_id = Column(Integer, nullable=True)  # 已并入摘要的最后一条消息ID
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 class Message(Base):
     """消息模型"""
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),)
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, index=True)
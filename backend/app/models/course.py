@@ -1,7 +1,7 @@
 """
 课程模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -27,6 +27,10 @@ class Course(Base):
 class CourseEnrollment(Base):
     """课程注册表（学生加入课程）"""
     __tablename__ = "course_enrollments"
+    __table_args__ = (
+        Index("ix_course_enrollments_course_id_student_id", "course_id", "student_id"),
+        Index("ix_course_enrollments_student_id", "student_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
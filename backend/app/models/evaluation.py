@@ -1,7 +1,7 @@
 """
 评估模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -17,6 +17,7 @@ class EvaluationType(str, enum.Enum):
 class Evaluation(Base):
     """评估表"""
     __tablename__ = "evaluations"
+    __table_args__ = (Index("ix_evaluations_project_id_created_at", "project_id", "created_at"),)
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
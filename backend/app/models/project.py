@@ -1,7 +1,7 @@
 """
 项目模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, JSON, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -53,6 +53,7 @@ class ProjectVersion(Base):
 class Script(Base):
     """剧本表"""
     __tablename__ = "scripts"
+    __table_args__ = (Index("ix_scripts_project_id", "project_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -69,6 +70,7 @@ class Script(Base):
 class Storyboard(Base):
     """分镜表"""
     __tablename__ = "storyboards"
+    __table_args__ = (Index("ix_storyboards_project_id_order", "project_id", "order"),)
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
@@ -88,6 +90,7 @@ class Storyboard(Base):
 class MediaAsset(Base):
     """媒体素材表"""
     __tablename__ = "media_assets"
+    __table_args__ = (Index("ix_media_assets_project_id", "project_id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
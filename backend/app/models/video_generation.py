@@ -1,7 +1,7 @@
 """
 视频生成任务模型
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, JSON, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -20,6 +20,7 @@ class VideoGenerationStatus(str, enum.Enum):
 class VideoGenerationJob(Base):
     """视频生成任务表"""
     __tablename__ = "video_generation_jobs"
+    __table_args__ = (Index("ix_video_generation_jobs_user_id_status", "user_id", "status"),)
     
     id = Column(Integer, primary_key=True, index=True)
     job_id = Column(String(100), unique=True, nullable=False, index=True)  # 唯一任务ID
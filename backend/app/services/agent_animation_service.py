@@ -5,6 +5,7 @@
 import os
 from typing import Dict, List, Optional, Any
 from pathlib import Path
+from app.core.service_registry import lazy_service
 
 class AgentAnimationService:
     """智能体动画服务"""
@@ -268,5 +269,5 @@ class AgentAnimationService:
         }
 
 # 单例模式
-agent_animation_service = AgentAnimationService()
+agent_animation_service = lazy_service("agent_animation_service", AgentAnimationService)
 
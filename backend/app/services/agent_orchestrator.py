@@ -9,6 +9,7 @@ from app.services.ai_models import (
     stable_diffusion_service,
     pika_service
 )
+from app.core.service_registry import lazy_service
 
 class SceneType(str, Enum):
     """场景类型枚举"""
@@ -254,6 +255,6 @@ class AgentOrchestrator:
         }
 
 # 全局调度器实例
-orchestrator = AgentOrchestrator()
+orchestrator = lazy_service("orchestrator", AgentOrchestrator)
 
 
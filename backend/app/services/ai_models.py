@@ -9,8 +9,15 @@ import shutil
 from uuid import uuid4
 from typing import Optional, Dict, Any
 from app.core.config import settings
-import openai
-from openai import OpenAI
+from app.core.service_registry import lazy_service
+
+def _openai_client():
+    """按需导入openai并创建客户端（openai导入较慢，未配置API Key时不导入）"""
+    if not settings.OPENAI_API_KEY:
+        return None
+    from openai import OpenAI
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
 # gradio_client 已不再使用（Wan-2.1服务已废弃）
 # from gradio_client import Client, handle_file
 
@@ -184,7 +191,7 @@ class GPT4Service:
     """GPT-4大语言模型服务"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+        self.client = _openai_client()
     
     async def analyze_script(
         self,
@@ -230,7 +237,7 @@ class WhisperService:
     """Whisper语音识别服务"""
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+        self.client = _openai_client()
     
     async def transcribe_audio(
         self,
@@ -254,10 +261,10 @@ class WhisperService:
         }
 
 # 全局服务实例
-stable_diffusion_service = StableDiffusionService()
-kling_video_service = KlingVideoService()  # 使用fal.ai的Kling Video
-gpt4_service = GPT4Service()
-whisper_service = WhisperService()
+stable_diffusion_service = lazy_service("stable_diffusion_service", StableDiffusionService)
+kling_video_service = lazy_service("kling_video_service", KlingVideoService)  # 使用fal.ai的Kling Video
+gpt4_service = lazy_service("gpt4_service", GPT4Service)
+whisper_service = lazy_service("whisper_service", WhisperService)
 
 # 为了向后兼容，保留pika_service别名
 pika_service = kling_video_service
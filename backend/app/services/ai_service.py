@@ -2,12 +2,22 @@
 AI服务 - 集成OpenAI和其他AI模型
 优先使用阿里云百炼DashScope通义千问，支持OpenAI和Ollama作为备选
 """
-from openai import OpenAI
 from app.core.config import settings
 from app.core.prompts import FILM_EDUCATION_SYSTEM_PROMPT
 from typing import List, Dict, Optional
 import json
 import asyncio
+from app.core.service_registry import lazy_service
+
+# 流式回复中途失败时追加到回复末尾的提示（这样的回复不完整，不写入语义缓存）
+STREAM_INTERRUPTED_NOTE = "\n\n（回复中断"
+
+class MockReply(str):
+    """模拟回复文本（没有大模型成功回答时的固定回复），调用方据此区分真实回答，例如不写入语义缓存"""
+
+def is_mock_reply(value) -> bool:
+    """chat_completion的返回值或stream_chat_completion的增量是否来自模拟回复"""
+    return isinstance(value, MockReply)
 
 class AIService:
     """AI服务类"""
@@ -15,6 +25,7 @@ class AIService:
     def __init__(self):
         self.client = None
         if settings.OPENAI_API_KEY:
+            from openai import OpenAI
             self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.OPENAI_MODEL
         
@@ -36,6 +47,19 @@ class AIService:
             self.ollama_service = None
             self.use_ollama_fallback = False
     
+    def is_llm_available(self) -> bool:
+        """
+        是否配置了可用的大模型（否则chat_completion返回模拟回复）
+        只检查配置，请求时调用失败仍会返回模拟回复，需要用is_mock_reply判断；
+        Ollama使用已缓存的探测结果（启动时在后台探测，尚未完成时视为不可用）；
+        首次访问会构建AIService并导入SDK，在事件循环中需用asyncio.to_thread调用
+        """
+        if self.use_dashscope and self.dashscope_service:
+            return True
+        if self.client:
+            return True
+        return bool(self.use_ollama_fallback and self.ollama_service and self.ollama_service.available)
+    
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
@@ -73,7 +97,7 @@ class AIService:
                 print(f"OpenAI调用失败: {e}，尝试使用Ollama")
         
         # 如果OpenAI不可用，尝试使用Ollama
-        if self.use_ollama_fallback and self.ollama_service and self.ollama_service.available:
+        if self.use_ollama_fallback and self.ollama_service and await self.ollama_service.ensure_available():
             try:
                 result = await self.ollama_service.chat(
                     messages=messages,
@@ -110,15 +134,22 @@ class AIService:
         """流式聊天完成"""
         # 优先使用DashScope通义千问
         if self.use_dashscope and self.dashscope_service:
+            received = False
             try:
                 async for chunk in self.dashscope_service.stream_chat_completion(
                     messages=messages,
                     model="qwen-turbo",
                     temperature=temperature
                 ):
+                    received = True
                     yield chunk
                 return
             except Exception as e:
+                # 已经返回部分内容时不能再切换模型，否则回复会重复
+                if received:
+                    print(f"DashScope流式调用中断: {e}")
+                    yield f"{STREAM_INTERRUPTED_NOTE}: {e}）"
+                    return
                 print(f"DashScope流式调用失败: {e}，尝试使用OpenAI")
         
         # 如果DashScope不可用，尝试使用OpenAI
@@ -140,10 +171,10 @@ class AIService:
         # 如果都不可用，模拟流式响应
         mock_text = self._mock_response(messages[-1]["content"])
         for char in mock_text:
-            yield char
+            yield MockReply(char)
             await asyncio.sleep(0.01)
     
-    def _mock_response(self, user_message: str) -> str:
+    def _mock_response(self, user_message: str) -> MockReply:
         """模拟响应（用于测试）"""
         responses = {
             "你好": "你好！我是影视制作教育智能体，可以帮助你学习影视制作相关知识。",
@@ -152,9 +183,9 @@ class AIService:
         
         for key, value in responses.items():
             if key in user_message:
-                return value
+                return MockReply(value)
         
-        return f"关于'{user_message}'，这是一个很好的问题。作为影视制作教育智能体，我可以为你提供相关的知识和建议。请告诉我你想了解的具体方面。"
+        return MockReply(f"关于'{user_message}'，这是一个很好的问题。作为影视制作教育智能体，我可以为你提供相关的知识和建议。请告诉我你想了解的具体方面。")
     
     def format_messages(
         self,
@@ -186,5 +217,5 @@ class AIService:
         
         return messages
 
-ai_service = AIService()
+ai_service = lazy_service("ai_service", AIService)
 
@@ -4,7 +4,7 @@
 """
 import json
 from typing import Dict, List, Optional, Any
-import numpy as np
+from app.core.service_registry import lazy_service
 
 class AudioAnalysisService:
     """音频分析服务"""
@@ -139,6 +139,7 @@ class AudioAnalysisService:
         
         try:
             import librosa
+            import numpy as np
             
             # 延迟加载TensorFlow和YAMNet模型
             if self.tf is None or self.hub is None:
@@ -346,5 +347,5 @@ class AudioAnalysisService:
         }
 
 # 单例模式
-audio_service = AudioAnalysisService()
+audio_service = lazy_service("audio_service", AudioAnalysisService)
 
@@ -5,6 +5,7 @@ Auto-Editor自动视频剪辑服务
 import subprocess
 import os
 from typing import Dict, Optional, Any, List
+from app.core.service_registry import lazy_service
 
 class AutoEditorService:
     """Auto-Editor自动剪辑服务"""
@@ -79,5 +80,5 @@ class AutoEditorService:
             return {"error": str(e)}
 
 # 全局实例
-auto_editor_service = AutoEditorService()
+auto_editor_service = lazy_service("auto_editor_service", AutoEditorService)
 
@@ -0,0 +1,192 @@
+"""
+对话记忆服务：滑动窗口 + 滚动摘要
+
+过去每轮对话都把会话的全部消息发给大模型，长时间的辅导会话越聊越慢、越贵，最终超出上下文长度。
+现在提示词由三部分组成：系统提示词、更早对话的摘要（保存在 Conversation.summary）、
+最近K轮原文（受token预算限制）。落在窗口之外的旧消息在回复发送后由后台任务并入摘要，
+Conversation.summary_message_id 记录已并入摘要的最后一条消息，因此每轮只读取窗口内的消息，
+提示词长度与历史长度无关。
+"""
+import asyncio
+import re
+import weakref
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.prompts import FILM_EDUCATION_SYSTEM_PROMPT
+from app.core.service_registry import lazy_service
+from app.models.chat import Conversation, Message
+
+# 中日韩字符大约每个字一个token，其他文本大约每4个字符一个token
+_CJK_PATTERN = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+MESSAGE_OVERHEAD_TOKENS = 4  # 每条消息的角色/分隔符开销
+
+SUMMARY_SYSTEM_PROMPT = """你负责维护一段影视制作教学对话的摘要。
+请把【已有摘要】和【新增对话】合并成一份新的摘要：保留学生的学习目标、已经讲解过的概念和结论、
+学生的作品/项目信息以及尚未解决的问题，省略寒暄和重复内容。
+直接输出摘要正文，不超过{max_chars}字。"""
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数（不依赖分词器）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def message_tokens(message: Dict) -> int:
+    """估算单条消息占用的token数"""
+    return estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+class ChatMemoryService:
+    """对话记忆服务"""
+
+    def __init__(self):
+        self.max_turns = max(1, settings.CHAT_MEMORY_MAX_TURNS)
+        self.token_budget = settings.CHAT_MEMORY_TOKEN_BUDGET
+        self.summary_max_tokens = settings.CHAT_MEMORY_SUMMARY_MAX_TOKENS
+        self.use_llm = settings.CHAT_MEMORY_LLM_SUMMARY
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def split_window(self, messages: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        把按时间排序的消息分成（需要并入摘要的旧消息, 原样保留的最近消息）
+        最近消息最多K轮（以用户消息作为一轮的开始），且总token数不超过预算；最后一条消息始终保留
+        """
+        start = len(messages)
+        used = 0
+        user_turns = 0
+        for i in range(len(messages) - 1, -1, -1):
+            message = messages[i]
+            cost = message_tokens(message)
+            if start < len(messages) and used + cost > self.token_budget:
+                break
+            if message.get("role") == "user":
+                if user_turns >= self.max_turns:
+                    break
+                user_turns += 1
+            used += cost
+            start = i
+        # 窗口不以助手回复开头（其对应的问题已经在摘要中）
+        while start < len(messages) - 1 and messages[start].get("role") == "assistant":
+            start += 1
+        return messages[:start], messages[start:]
+
+    def build_messages(self, summary: Optional[str], recent: List[Dict]) -> List[Dict[str, str]]:
+        """组装发给大模型的消息：系统提示词（附带摘要）+ 最近消息原文"""
+        from app.services.ai_service import ai_service
+
+        system_prompt = FILM_EDUCATION_SYSTEM_PROMPT
+        if summary:
+            system_prompt += f"\n\n**之前对话的摘要**（更早的消息已省略）：\n{summary}"
+        return ai_service.format_messages(recent, system_prompt=system_prompt)
+
+    async def load_context(self, db: AsyncSession, conversation_id: int) -> List[Dict[str, str]]:
+        """读取会话摘要和摘要之后的最近消息，返回可直接发给大模型的消息列表"""
+        row = (await db.execute(
+            select(Conversation.summary, Conversation.summary_message_id).where(Conversation.id == conversation_id)
+        )).first()
+        summary, summarized_until = (row[0], row[1] or 0) if row else (None, 0)
+        # 窗口最多包含K轮（每轮一问一答），多读一条用于判断窗口边界
+        rows = (await db.execute(
+            select(Message.id, Message.role, Message.content)
+            .where(Message.conversation_id == conversation_id, Message.id > summarized_until)
+            .order_by(Message.id.desc())
+            .limit(self.max_turns * 2 + 1)
+        )).all()
+        messages = [{"id": r.id, "role": r.role, "content": r.content} for r in reversed(rows)]
+        return self.build_messages(summary, self.split_window(messages)[1])
+
+    async def summarize(self, summary: Optional[str], messages: List[Dict]) -> str:
+        """把新移出窗口的消息并入已有摘要（未配置大模型或调用失败时使用摘录方式）"""
+        from app.services.ai_service import ai_service
+
+        # 首次检查可能同步探测Ollama服务，在线程中执行，不阻塞事件循环
+        if self.use_llm and await asyncio.to_thread(ai_service.is_llm_available):
+            conversation = "\n".join(
+                f"{'学生' if m.get('role') == 'user' else '助教'}：{m.get('content') or ''}" for m in messages
+            )
+            try:
+                response = await ai_service.chat_completion(
+                    [
+                        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(max_chars=self.summary_max_tokens)},
+                        {"role": "user", "content": f"【已有摘要】\n{summary or '（无）'}\n\n【新增对话】\n{conversation}"},
+                    ],
+                    temperature=0.3,
+                    max_tokens=self.summary_max_tokens,
+                )
+                content = response.choices[0].message.content if hasattr(response, "choices") else str(response)
+                if content and content.strip():
+                    return self._clip(content.strip())
+            except Exception as e:
+                print(f"⚠️  对话摘要生成失败，使用摘录方式: {e}")
+        return self._extractive_summary(summary, messages)
+
+    def _extractive_summary(self, summary: Optional[str], messages: List[Dict]) -> str:
+        """摘录方式：每条消息保留开头一段，超出摘要预算时丢弃最早的内容"""
+        lines = summary.splitlines() if summary else []
+        for message in messages:
+            text = " ".join((message.get("content") or "").split())
+            if len(text) > 80:
+                text = text[:80] + "…"
+            lines.append(f"{'学生' if message.get('role') == 'user' else '助教'}：{text}")
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_max_tokens:
+            lines.pop(0)
+        return self._clip("\n".join(lines))
+
+    def _clip(self, text: str) -> str:
+        """把摘要截断到预算以内"""
+        while text and estimate_tokens(text) > self.summary_max_tokens:
+            text = text[:int(len(text) * 0.9)]
+        return text
+
+    async def compact(self, conversation_id: int) -> bool:
+        """把窗口之外的旧消息并入摘要，返回是否更新了摘要"""
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            async with AsyncSessionLocal() as db:
+                conversation = await db.get(Conversation, conversation_id)
+                if not conversation:
+                    return False
+                summarized_until = conversation.summary_message_id or 0
+                previous_summary = conversation.summary
+                rows = (await db.execute(
+                    select(Message.id, Message.role, Message.content)
+                    .where(Message.conversation_id == conversation_id, Message.id > summarized_until)
+                    .order_by(Message.id)
+                )).all()
+                older, _ = self.split_window([{"id": r.id, "role": r.role, "content": r.content} for r in rows])
+                # 结束只读事务，生成摘要期间不占用数据库连接
+                await db.commit()
+                if not older:
+                    return False
+
+                summary = await self.summarize(previous_summary, older)
+                # 只在摘要进度未被其他进程推进时写入
+                result = await db.execute(
+                    update(Conversation)
+                    .where(
+                        Conversation.id == conversation_id,
+                        func.coalesce(Conversation.summary_message_id, 0) == summarized_until,
+                    )
+                    .values(summary=summary, summary_message_id=older[-1]["id"])
+                )
+                await db.commit()
+                return result.rowcount > 0
+
+    async def save_summary(self, conversation_id: int, summary: str, message_id: int):
+        """保存摘要及其覆盖到的最后一条消息（WebSocket连接在内存中维护窗口，自行生成摘要后调用）"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(summary=summary, summary_message_id=message_id)
+            )
+            await db.commit()
+
+
+chat_memory_service = lazy_service("chat_memory_service", ChatMemoryService)
@@ -4,6 +4,7 @@ Chroma向量数据库服务
 """
 import os
 from typing import List, Dict, Optional, Any
+from app.core.service_registry import lazy_service
 
 class ChromaService:
     """Chroma向量数据库服务"""
@@ -167,5 +168,5 @@ class ChromaService:
             return {"error": str(e)}
 
 # 全局实例
-chroma_service = ChromaService()
+chroma_service = lazy_service("chroma_service", ChromaService)
 
@@ -2,39 +2,52 @@
 CLIP图像理解服务
 用于图像-文本匹配、场景识别等
 """
-import torch
-from typing import List, Dict, Optional, Any
-from PIL import Image
-import numpy as np
+import importlib.util
+from typing import List, Dict, Optional, Any, Tuple
+from app.core.model_manager import model_manager
+from app.core.config import settings
+from app.core.service_registry import lazy_service
+
+CLIP_MODEL_NAME = "ViT-B/32"
+
+
+def _load_clip() -> Dict[str, Any]:
+    """加载CLIP模型（由model_manager按预热策略调用）"""
+    import torch
+    import clip
+    
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model, preprocess = clip.load(CLIP_MODEL_NAME, device=device)
+    model.eval()
+    print(f"✅ CLIP已加载，设备: {device}")
+    return {"model": model, "preprocess": preprocess, "device": device}
+
 
 class CLIPService:
-    """CLIP图像理解服务"""
+    """CLIP图像理解服务
+    
+    模型由model_manager管理：导入时只注册加载器，按预热策略（默认后台预热）加载。
+    """
     
     def __init__(self):
         self.clip_available = False
-        self.model = None
-        self.preprocess = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self._init_clip()
     
     def _init_clip(self):
-        """初始化CLIP模型"""
+        """注册CLIP模型加载器"""
         # CLIP应该通过pip安装: pip install git+https://github.com/openai/CLIP.git
-        try:
-            import clip
-            
-            # 加载模型
-            self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
-            self.model.eval()
-            self.clip_available = True
-            print(f"✅ CLIP已加载，设备: {self.device}")
-        except ImportError:
+        if importlib.util.find_spec("clip") is None:
             print("警告: CLIP未安装，图像理解功能受限")
             print("安装方法: pip install git+https://github.com/openai/CLIP.git 或运行 python install_local_models.py")
             self.clip_available = False
-        except Exception as e:
-            print(f"警告: CLIP初始化失败: {e}")
-            self.clip_available = False
+            return
+        
+        model_manager.register_model("clip", _load_clip, {
+            "description": f"CLIP {CLIP_MODEL_NAME}",
+            "size_mb": 600,
+            "warmup": "background",
+        })
+        self.clip_available = True
     
     def match_image_text(
         self,
@@ -42,47 +55,81 @@ class CLIPService:
         text_options: List[str]
     ) -> Dict[str, Any]:
         """匹配图像和文本"""
+        return self.match_image_text_batch([(image_path, text_options)])[0]
+    
+    def match_image_text_batch(
+        self,
+        requests: List[Tuple[str, List[str]]]
+    ) -> List[Dict[str, Any]]:
+        """批量匹配图像和文本：所有图像堆叠后一次encode_image，所有去重文本一次encode_text
+        
+        返回与requests等长的结果列表，单张图像读取失败或候选文本过长（超过CLIP的77个token）只影响对应的结果。
+        """
         if not self.clip_available:
-            return {"error": "CLIP未安装"}
+            return [{"error": "CLIP未安装"} for _ in requests]
         
         try:
+            import torch
             import clip  # 确保导入clip模块
+            from PIL import Image
             
-            # 加载和预处理图像
-            image = Image.open(image_path)
-            image_input = self.preprocess(image).unsqueeze(0).to(self.device)
-            
-            # 编码文本
-            text_inputs = clip.tokenize(text_options).to(self.device)
-            
-            # 计算相似度
-            with torch.no_grad():
-                image_features = self.model.encode_image(image_input)
-                text_features = self.model.encode_text(text_inputs)
+            with model_manager.use_model("clip") as loaded:
+                if loaded is None:
+                    return [{"error": "CLIP模型加载失败"} for _ in requests]
+                model, preprocess, device = loaded["model"], loaded["preprocess"], loaded["device"]
                 
-                # 归一化
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                # 逐个请求分词、加载和预处理图像，失败的请求单独记录错误，不影响同批的其他请求
+                results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+                image_tensors, valid = [], []
+                text_tokens: Dict[str, Any] = {}  # 合并所有请求的文本，去重后一次编码
+                for i, (image_path, text_options) in enumerate(requests):
+                    if not text_options:
+                        results[i] = {"error": "text_options不能为空"}
+                        continue
+                    try:
+                        tokens = clip.tokenize(text_options)
+                        image_tensors.append(preprocess(Image.open(image_path)))
+                        valid.append(i)
+                    except Exception as e:
+                        results[i] = {"error": str(e)}
+                        continue
+                    for text, row in zip(text_options, tokens):
+                        text_tokens.setdefault(text, row)
                 
-                # 计算相似度
-                similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
-                values, indices = similarity[0].topk(len(text_options))
-            
-            # 格式化结果
-            results = []
-            for value, idx in zip(values, indices):
-                results.append({
-                    "text": text_options[idx],
-                    "score": float(value),
-                    "rank": int(idx)
-                })
+                if valid:
+                    text_index = {t: j for j, t in enumerate(text_tokens)}
+                    
+                    with torch.no_grad():
+                        image_features = model.encode_image(torch.stack(image_tensors).to(device))
+                        text_features = model.encode_text(torch.stack(list(text_tokens.values())).to(device))
+                        
+                        # 归一化
+                        image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+                        text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                        
+                        # 一次计算所有图像与所有文本的相似度
+                        logits = (100.0 * image_features @ text_features.T).float().cpu()
+                    
+                    for row, i in enumerate(valid):
+                        text_options = requests[i][1]
+                        # 每个请求只在自己的候选文本上做softmax
+                        columns = torch.tensor([text_index[t] for t in text_options])
+                        similarity = logits[row, columns].softmax(dim=-1)
+                        values, indices = similarity.topk(len(text_options))
+                        
+                        # 格式化结果
+                        matches = [
+                            {"text": text_options[idx], "score": float(value), "rank": int(idx)}
+                            for value, idx in zip(values, indices)
+                        ]
+                        results[i] = {
+                            "success": True,
+                            "matches": sorted(matches, key=lambda x: x["score"], reverse=True)
+                        }
             
-            return {
-                "success": True,
-                "matches": sorted(results, key=lambda x: x["score"], reverse=True)
-            }
+            return results
         except Exception as e:
-            return {"error": str(e)}
+            return [{"error": str(e)} for _ in requests]
     
     def find_similar_images(
         self,
@@ -90,35 +137,50 @@ class CLIPService:
         image_paths: List[str],
         top_k: int = 5
     ) -> Dict[str, Any]:
-        """根据文本查找相似图像"""
+        """根据文本查找相似图像（图像按CLIP_BATCH_MAX_SIZE分批编码）"""
         if not self.clip_available:
             return {"error": "CLIP未安装"}
         
         try:
             # 编码查询文本
+            import torch
             import clip
-            text_input = clip.tokenize([query_text]).to(self.device)
-            with torch.no_grad():
-                text_features = self.model.encode_text(text_input)
-                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+            from PIL import Image
             
-            # 编码所有图像
-            similarities = []
-            for img_path in image_paths:
-                try:
-                    image = Image.open(img_path)
-                    image_input = self.preprocess(image).unsqueeze(0).to(self.device)
+            with model_manager.use_model("clip") as loaded:
+                if loaded is None:
+                    return {"error": "CLIP模型加载失败"}
+                model, preprocess, device = loaded["model"], loaded["preprocess"], loaded["device"]
+                
+                text_input = clip.tokenize([query_text]).to(device)
+                with torch.no_grad():
+                    text_features = model.encode_text(text_input)
+                    text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                
+                # 预处理图像，跳过无法读取的文件
+                loaded_paths, image_tensors = [], []
+                for img_path in image_paths:
+                    try:
+                        image_tensors.append(preprocess(Image.open(img_path)))
+                        loaded_paths.append(img_path)
+                    except Exception as e:
+                        print(f"处理图像 {img_path} 失败: {e}")
+                        continue
+                
+                # 分批编码图像
+                similarities = []
+                batch_size = max(1, settings.CLIP_BATCH_MAX_SIZE)
+                for start in range(0, len(image_tensors), batch_size):
+                    batch = torch.stack(image_tensors[start:start + batch_size]).to(device)
                     with torch.no_grad():
-                        image_features = self.model.encode_image(image_input)
+                        image_features = model.encode_image(batch)
                         image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-                        similarity = float((image_features @ text_features.T)[0][0])
+                        scores = (image_features @ text_features.T)[:, 0].float().cpu().tolist()
+                    for img_path, similarity in zip(loaded_paths[start:start + batch_size], scores):
                         similarities.append({
                             "image_path": img_path,
                             "similarity": similarity
                         })
-                except Exception as e:
-                    print(f"处理图像 {img_path} 失败: {e}")
-                    continue
             
             # 排序并返回top_k
             similarities.sort(key=lambda x: x["similarity"], reverse=True)
@@ -131,5 +193,5 @@ class CLIPService:
             return {"error": str(e)}
 
 # 全局实例
-clip_service = CLIPService()
+clip_service = lazy_service("clip_service", CLIPService)
 
@@ -9,17 +9,14 @@ import asyncio
 import httpx
 import base64
 import json
+import importlib.util
 from typing import Dict, Any, Optional, List
 from pathlib import Path
 from app.core.config import settings
+from app.core.service_registry import lazy_service
 
-# 尝试导入dashscope SDK（如果已安装）
-try:
-    import dashscope
-    DASHSCOPE_SDK_AVAILABLE = True
-except ImportError:
-    DASHSCOPE_SDK_AVAILABLE = False
-    dashscope = None
+# dashscope SDK是否已安装（SDK导入较慢，只检查不导入，使用时再导入）
+DASHSCOPE_SDK_AVAILABLE = importlib.util.find_spec("dashscope") is not None
 
 class DashScopeService:
     """阿里云百炼DashScope通义万相服务"""
@@ -41,6 +38,7 @@ class DashScopeService:
         
         # 如果SDK可用，设置API key
         if DASHSCOPE_SDK_AVAILABLE and self.api_key:
+            import dashscope
             dashscope.api_key = self.api_key
             # 设置API基础URL（如果需要）
             if hasattr(dashscope, 'base_http_api_url'):
@@ -1673,37 +1671,88 @@ class DashScopeService:
         self,
         messages: List[Dict[str, str]],
         model: str = "qwen-turbo",
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None
     ):
         """
-        流式聊天完成（使用SSE或轮询方式）
-        注意：DashScope的流式API可能需要使用SSE，这里先使用轮询方式模拟流式
+        流式聊天完成（SSE + incremental_output）
+        每收到一个增量就立即返回，首字延迟只取决于模型生成第一个token的时间。
+        在返回任何内容之前失败时抛出异常，调用方可以切换到其他模型。
         """
         if not self.api_key:
             raise ValueError("DASHSCOPE_API_KEY未配置")
         
-        # 先获取完整响应，然后逐字符返回（模拟流式）
-        # 实际生产环境可以使用SSE或WebSocket
-        try:
-            response = await self.chat_completion(
-                messages=messages,
-                model=model,
-                temperature=temperature,
-                stream=False
-            )
-            
-            content = response.choices[0].message.content
-            
-            # 逐字符或逐词返回（模拟流式效果）
-            words = content.split()
-            for i, word in enumerate(words):
-                if i > 0:
-                    yield " "
-                for char in word:
-                    yield char
-                    await asyncio.sleep(0.01)  # 控制流式速度
-        except Exception as e:
-            yield f"错误: {str(e)}"
+        url = f"{self.base_url}/services/aigc/text-generation/generation"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+            "X-DashScope-SSE": "enable"
+        }
+        request_body = {
+            "model": model,
+            "input": {
+                "messages": messages
+            },
+            "parameters": {
+                "temperature": temperature,
+                "max_tokens": max_tokens or 2000,
+                "result_format": "message",
+                "incremental_output": True  # 每个事件只包含新增内容
+            }
+        }
+        
+        # 连接/首字节超时较短，流式读取期间两个事件之间最长等待120秒；不使用环境变量中的代理
+        timeout = httpx.Timeout(120.0, connect=10.0)
+        async with httpx.AsyncClient(timeout=timeout, trust_env=False) as client:
+            async with client.stream("POST", url, json=request_body, headers=headers) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    try:
+                        error_msg = json.loads(body).get("message", body)
+                    except ValueError:
+                        error_msg = body
+                    print(f"[DashScope] 流式调用失败: status_code={response.status_code}, message={error_msg}")
+                    raise Exception(f"API调用失败: {response.status_code}, {error_msg}")
+                
+                event = None
+                async for line in response.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                        continue
+                    if not line.startswith("data:"):
+                        continue
+                    data = json.loads(line[len("data:"):])
+                    if event == "error" or data.get("code"):
+                        raise Exception(f"流式生成失败: {data.get('code')}, {data.get('message')}")
+                    choices = data.get("output", {}).get("choices", [])
+                    if choices:
+                        delta = choices[0].get("message", {}).get("content", "")
+                        if delta:
+                            yield delta
+
+    async def embed_texts(self, texts: List[str], model: str = "text-embedding-v3") -> List[List[float]]:
+        """文本向量（通用文本向量模型），按输入顺序返回"""
+        if not self.api_key:
+            raise ValueError("DASHSCOPE_API_KEY未配置")
+        
+        url = f"{self.base_url}/services/embeddings/text-embedding/text-embedding"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        request_body = {
+            "model": model,
+            "input": {
+                "texts": texts
+            }
+        }
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0), trust_env=False) as client:
+            response = await client.post(url, json=request_body, headers=headers)
+            if response.status_code != 200:
+                raise Exception(f"API调用失败: {response.status_code}, {response.text}")
+            embeddings = response.json().get("output", {}).get("embeddings", [])
+            return [item["embedding"] for item in sorted(embeddings, key=lambda item: item.get("text_index", 0))]
 
-dashscope_service = DashScopeService()
+dashscope_service = lazy_service("dashscope_service", DashScopeService)
 
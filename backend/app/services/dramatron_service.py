@@ -6,6 +6,7 @@ import json
 import re
 from typing import Dict, List, Optional, Any, NamedTuple
 from app.services.ollama_service import ollama_service
+from app.core.service_registry import lazy_service
 
 # Dramatron的数据结构
 class Title(NamedTuple):
@@ -66,12 +67,16 @@ class DramatronService:
     """Dramatron剧本生成服务"""
     
     def __init__(self):
-        self.available = ollama_service.available
         self.default_model = "qwen2:1.5b"
     
+    @property
+    def available(self) -> bool:
+        """Ollama服务是否可用（探测结果由ollama_service缓存）"""
+        return ollama_service.available
+    
     async def generate_title(self, storyline: str, model: Optional[str] = None) -> Dict[str, Any]:
         """生成标题"""
-        if not self.available:
+        if not await ollama_service.ensure_available():
             return {"error": "Ollama服务不可用"}
         
         prompt = f"""根据以下故事梗概，生成一个吸引人的剧本标题：
@@ -108,7 +113,7 @@ class DramatronService:
         model: Optional[str] = None
     ) -> Dict[str, Any]:
         """生成角色"""
-        if not self.available:
+        if not await ollama_service.ensure_available():
             return {"error": "Ollama服务不可用"}
         
         prompt = f"""根据以下故事梗概和标题，生成{num_characters}个主要角色的描述：
@@ -156,7 +161,7 @@ class DramatronService:
         model: Optional[str] = None
     ) -> Dict[str, Any]:
         """生成场景"""
-        if not self.available:
+        if not await ollama_service.ensure_available():
             return {"error": "Ollama服务不可用"}
         
         char_descriptions = "\n".join([
@@ -220,7 +225,7 @@ class DramatronService:
         model: Optional[str] = None
     ) -> Dict[str, Any]:
         """生成地点描述"""
-        if not self.available:
+        if not await ollama_service.ensure_available():
             return {"error": "Ollama服务不可用"}
         
         places = list(set([s["place"] for s in scenes]))
@@ -268,7 +273,7 @@ class DramatronService:
         model: Optional[str] = None
     ) -> Dict[str, Any]:
         """生成对话"""
-        if not self.available:
+        if not await ollama_service.ensure_available():
             return {"error": "Ollama服务不可用"}
         
         char_descriptions = "\n".join([
@@ -322,7 +327,7 @@ class DramatronService:
         model: Optional[str] = None
     ) -> Dict[str, Any]:
         """生成完整剧本"""
-        if not self.available:
+        if not await ollama_service.ensure_available():
             return {"error": "Ollama服务不可用"}
         
         try:
@@ -538,7 +543,7 @@ class DramatronService:
         return "\n".join(script_lines)
 
 # 全局实例
-dramatron_service = DramatronService()
+dramatron_service = lazy_service("dramatron_service", DramatronService)
 
 
 
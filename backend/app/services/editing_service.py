@@ -6,6 +6,7 @@ import subprocess
 import json
 from typing import Dict, List, Optional, Any
 from pathlib import Path
+from app.core.service_registry import lazy_service
 
 class EditingService:
     """剪辑建议服务"""
@@ -245,5 +246,5 @@ class EditingService:
         }
 
 # 单例模式
-editing_service = EditingService()
+editing_service = lazy_service("editing_service", EditingService)
 
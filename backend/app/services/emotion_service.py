@@ -4,7 +4,7 @@
 """
 import json
 from typing import Dict, List, Optional, Any
-import numpy as np
+from app.core.service_registry import lazy_service
 
 class EmotionAnalysisService:
     """情绪分析服务"""
@@ -252,5 +252,5 @@ class EmotionAnalysisService:
         return results
 
 # 单例模式
-emotion_service = EmotionAnalysisService()
+emotion_service = lazy_service("emotion_service", EmotionAnalysisService)
 
@@ -5,6 +5,7 @@
 import random
 from typing import Dict, List, Optional, Any
 import json
+from app.core.service_registry import lazy_service
 
 class GamificationService:
     """游戏化服务"""
@@ -199,5 +200,5 @@ class GamificationService:
         return examples_map.get(shot_type, [])
 
 # 单例模式
-gamification_service = GamificationService()
+gamification_service = lazy_service("gamification_service", GamificationService)
 
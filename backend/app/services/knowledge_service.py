@@ -7,6 +7,7 @@ import aiofiles
 from pathlib import Path
 from typing import List, Optional
 from app.core.config import settings
+from app.core.service_registry import lazy_service
 
 # 尝试导入Chroma服务
 try:
@@ -209,5 +210,5 @@ class KnowledgeService:
             print(f"删除文档错误: {e}")
             return False
 
-knowledge_service = KnowledgeService()
+knowledge_service = lazy_service("knowledge_service", KnowledgeService)
 
@@ -0,0 +1,149 @@
+"""
+聊天消息的延迟批量写入（write-behind）
+
+WebSocket对话过去每轮都要等两次提交（用户消息、AI回复）完成才能继续，数据库会话在整个连接期间保持打开；
+磁盘慢或SQLite写锁竞争时，所有在线学生的流式回复都会被卡住。
+
+现在消息先放入内存队列，由后台任务按批写入：队列达到 MESSAGE_FLUSH_BATCH_SIZE 条，
+或最早的消息等待超过 MESSAGE_FLUSH_INTERVAL_MS 时，一次事务写入一批。
+add() 返回一个Future，写入完成后得到消息ID（需要ID的调用方，如对话摘要，可以等待它）。
+读取历史和连接断开时调用 flush(conversation_id)，只写入该会话排队中的消息（不替其他会话写库）；
+应用关闭时调用 close() 写入全部剩余消息。
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.service_registry import lazy_service
+from app.models.chat import Message
+
+WRITE_ATTEMPTS = 3  # 每批最多尝试写入的次数
+
+
+class MessageStore:
+    """消息写入队列"""
+
+    def __init__(self):
+        self.interval = settings.MESSAGE_FLUSH_INTERVAL_MS / 1000
+        self.batch_size = max(1, settings.MESSAGE_FLUSH_BATCH_SIZE)
+        self.max_pending = settings.MESSAGE_STORE_MAX_PENDING
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+
+    def _bind_loop(self):
+        """队列的锁、事件和后台任务属于当前事件循环（测试客户端每个连接可能使用新的事件循环）"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._batch_full = asyncio.Event()
+            self._task = None
+
+    async def add(
+        self,
+        conversation_id: int,
+        role: str,
+        content: str,
+        message_metadata: Optional[Dict[str, Any]] = None
+    ) -> asyncio.Future:
+        """加入一条消息，立即返回写入完成时得到消息ID的Future（队列过长时先等待写入）"""
+        self._bind_loop()
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        future = self._loop.create_future()
+        self._pending.append(({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "message_metadata": message_metadata,
+        }, future))
+        if len(self._pending) >= self.batch_size:
+            self._batch_full.set()
+        if self._task is None:
+            self._task = self._loop.create_task(self._run())
+        return future
+
+    async def _run(self):
+        """后台写入：队列非空时按批次/间隔写入，队列清空后退出"""
+        try:
+            while self._pending:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+        finally:
+            self._task = None
+
+    async def flush(self, conversation_id: Optional[int] = None):
+        """
+        立即写入队列中的消息（返回时调用前加入的消息都已写入或确认失败）
+        指定conversation_id时只写入该会话的消息，其他会话的消息仍由后台按批写入
+        """
+        self._bind_loop()
+        async with self._lock:
+            if conversation_id is None:
+                while self._pending:
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:self.batch_size]
+                    await self._write(batch)
+            else:
+                pending = [item for item in self._pending if item[0]["conversation_id"] == conversation_id]
+                self._pending = [item for item in self._pending if item[0]["conversation_id"] != conversation_id]
+                for start in range(0, len(pending), self.batch_size):
+                    await self._write(pending[start:start + self.batch_size])
+            if len(self._pending) < self.batch_size:
+                self._batch_full.clear()
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """在一个事务中写入一批消息，失败时重试"""
+        started = time.perf_counter()
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                async with AsyncSessionLocal() as db:
+                    messages = [Message(**row) for row, _ in batch]
+                    db.add_all(messages)
+                    await db.commit()
+                break
+            except Exception as e:
+                if attempt == WRITE_ATTEMPTS:
+                    self.failed += len(batch)
+                    print(f"❌ {len(batch)} 条聊天消息写入失败: {e}")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    return
+                print(f"⚠️  聊天消息写入失败（第{attempt}次），稍后重试: {e}")
+                await asyncio.sleep(0.2 * attempt)
+
+        self.written += len(batch)
+        self.batches += 1
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+        for message, (_, future) in zip(messages, batch):
+            if not future.done():
+                future.set_result(message.id)
+
+    async def close(self):
+        """应用关闭时写入剩余消息"""
+        if self._pending:
+            await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+        }
+
+
+message_store = lazy_service("message_store", MessageStore)
@@ -2,10 +2,11 @@
 Ollama本地LLM服务
 通过HTTP API调用本地运行的Ollama服务
 """
+import asyncio
 import httpx
-import requests
 from typing import List, Dict, Optional, AsyncGenerator
 from app.core.config import settings
+from app.core.service_registry import lazy_service
 
 class OllamaService:
     """Ollama本地LLM服务"""
@@ -14,42 +15,46 @@ class OllamaService:
         self.base_url = base_url
         self.default_model = "qwen:7b"  # 默认模型，可以根据需要修改
         self.available = False
-        self._check_availability()
+        self.checked = False  # 是否已完成可用性探测
+        self._probe: Optional[asyncio.Task] = None
     
-    def _check_availability(self):
+    async def ensure_available(self) -> bool:
+        """首次使用时异步探测Ollama服务并缓存结果（不阻塞事件循环，并发调用共享同一次探测）"""
+        if not self.checked:
+            if self._probe is None or self._probe.get_loop() is not asyncio.get_running_loop():
+                self._probe = asyncio.ensure_future(self._check_availability())
+            await asyncio.shield(self._probe)
+        return self.available
+    
+    async def _check_availability(self):
         """检查Ollama服务是否可用"""
         try:
-            import httpx
-            import requests
-            
-            # 使用同步请求检查（更简单可靠）
-            try:
-                response = requests.get(f"{self.base_url}/api/tags", timeout=2.0)
-                self.available = response.status_code == 200
-                if self.available:
-                    print("✅ Ollama服务已连接")
-                else:
-                    print(f"警告: Ollama服务响应异常，状态码: {response.status_code}")
-            except requests.exceptions.RequestException:
-                self.available = False
-                print("警告: Ollama服务未运行，请先安装并启动Ollama")
-                print("安装方法: 下载 https://ollama.com/download/OllamaSetup.exe")
-                print("启动方法: ollama serve 或直接运行Ollama应用")
-        except ImportError:
-            print("警告: httpx或requests未安装，Ollama服务不可用")
+            async with httpx.AsyncClient(timeout=2.0) as client:
+                response = await client.get(f"{self.base_url}/api/tags")
+            self.available = response.status_code == 200
+            if self.available:
+                print("✅ Ollama服务已连接")
+            else:
+                print(f"警告: Ollama服务响应异常，状态码: {response.status_code}")
+        except httpx.HTTPError:
             self.available = False
+            print("警告: Ollama服务未运行，请先安装并启动Ollama")
+            print("安装方法: 下载 https://ollama.com/download/OllamaSetup.exe")
+            print("启动方法: ollama serve 或直接运行Ollama应用")
         except Exception as e:
             print(f"警告: Ollama服务检查失败: {e}")
             self.available = False
+        finally:
+            self.checked = True
     
     async def list_models(self) -> List[str]:
         """列出可用的模型"""
-        if not self.available:
+        if not await self.ensure_available():
             return []
         
         try:
-            # 使用同步requests（更可靠）
-            response = requests.get(f"{self.base_url}/api/tags", timeout=10.0)
+            async with httpx.AsyncClient(timeout=10.0) as client:
+                response = await client.get(f"{self.base_url}/api/tags")
             if response.status_code == 200:
                 data = response.json()
                 models = [model["name"] for model in data.get("models", [])]
@@ -69,7 +74,7 @@ class OllamaService:
         temperature: float = 0.7
     ) -> Dict:
         """聊天完成"""
-        if not self.available:
+        if not await self.ensure_available():
             return {
                 "error": "Ollama服务不可用",
                 "message": "请确保Ollama服务正在运行（ollama serve）"
@@ -111,6 +116,7 @@ class OllamaService:
                             }
             else:
                 # 非流式响应 - 使用同步requests（更可靠）
+                import requests
                 response = requests.post(
                     f"{self.base_url}/api/chat",
                     json={
@@ -150,7 +156,7 @@ class OllamaService:
         temperature: float = 0.7
     ) -> AsyncGenerator[str, None]:
         """流式聊天"""
-        if not self.available:
+        if not await self.ensure_available():
             yield "错误: Ollama服务不可用"
             return
         
@@ -200,5 +206,5 @@ class OllamaService:
         return "\n\n".join(prompt_parts)
 
 # 全局实例
-ollama_service = OllamaService()
+ollama_service = lazy_service("ollama_service", OllamaService)
 
@@ -7,6 +7,7 @@ import uuid
 from typing import Dict, Any, Optional
 from pathlib import Path
 from app.core.config import settings
+from app.core.service_registry import lazy_service
 
 try:
     import oss2
@@ -316,5 +317,5 @@ class ImageUploadService:
 
 
 # 全局实例
-image_upload_service = ImageUploadService()
+image_upload_service = lazy_service("image_upload_service", ImageUploadService)
 
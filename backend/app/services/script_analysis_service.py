@@ -6,6 +6,7 @@ import json
 import re
 from typing import Dict, List, Optional, Any
 from pathlib import Path
+from app.core.service_registry import lazy_service
 
 class ScriptAnalysisService:
     """剧本分析服务"""
@@ -479,5 +480,5 @@ class ScriptAnalysisService:
     
 
 # 单例模式
-script_analysis_service = ScriptAnalysisService()
+script_analysis_service = lazy_service("script_analysis_service", ScriptAnalysisService)
 
@@ -0,0 +1,231 @@
+"""
+语义缓存：相似的辅导问题直接返回缓存的回答
+
+同一门课的学生经常问几乎相同的问题（"什么是三分法构图"、"what is the 180-degree rule"），
+每次都以完整的大模型延迟和费用生成回答。启用后（SEMANTIC_CACHE_ENABLED），会话的第一个问题
+（没有上下文，回答不依赖之前的对话）先计算问题向量，在本课程的向量索引中查找最相近的问题，
+相似度达到阈值时直接返回缓存的回答；未命中时由大模型生成，完整生成后写入缓存。
+
+- 作用域：按课程隔离（未指定课程的问题使用全局作用域），不同课程的回答互不命中
+- 过期：每条缓存保留 SEMANTIC_CACHE_TTL 秒，每个作用域最多 SEMANTIC_CACHE_MAX_ENTRIES 条
+- 索引：每个进程在内存中维护向量矩阵，按余弦相似度暴力检索（每个作用域几千条以内足够快）
+- 清除：管理员清除时在共享缓存中记录清除时间，其他worker在下次查找时丢弃该时间之前的条目
+"""
+import asyncio
+import re
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.service_registry import lazy_service
+
+GLOBAL_SCOPE = "global"
+PURGE_KEY_PREFIX = "semantic_cache:purged:"
+ALL_SCOPES = "*"
+
+_TRAILING_PUNCTUATION = "？?。.!！~～ "
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(text: str) -> str:
+    """统一大小写、空白和结尾标点，措辞相同的问题得到相同的文本"""
+    return " ".join(text.lower().split()).strip(_TRAILING_PUNCTUATION)
+
+
+class _ScopeIndex:
+    """一个作用域（课程）的向量索引"""
+
+    def __init__(self):
+        self.vectors = None  # (n, dim) float32，行向量已归一化
+        self.entries: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, vector, entry: Dict[str, Any], max_entries: int):
+        import numpy as np
+
+        if self.vectors is None or self.vectors.shape[1] != vector.shape[0]:
+            # 第一条，或向量来源变化导致维度不同：重建索引
+            self.vectors = np.zeros((0, vector.shape[0]), dtype=np.float32)
+            self.entries = []
+        if len(self.entries) >= max_entries:
+            drop = len(self.entries) - max_entries + 1
+            self.vectors = self.vectors[drop:]
+            self.entries = self.entries[drop:]
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.entries.append(entry)
+
+    def prune(self, now: float, purged_at: float) -> int:
+        """移除过期和在清除时间之前写入的条目，返回移除数量"""
+        keep = [i for i, e in enumerate(self.entries) if e["expires_at"] > now and e["created_at"] > purged_at]
+        removed = len(self.entries) - len(keep)
+        if removed:
+            self.vectors = self.vectors[keep]
+            self.entries = [self.entries[i] for i in keep]
+        return removed
+
+    def search(self, vector) -> Tuple[Optional[Dict[str, Any]], float]:
+        """返回最相近的条目和余弦相似度"""
+        if not self.entries or self.vectors.shape[1] != vector.shape[0]:
+            return None, 0.0
+        similarities = self.vectors @ vector
+        best = int(similarities.argmax())
+        return self.entries[best], float(similarities[best])
+
+
+class SemanticCacheService:
+    """语义缓存服务"""
+
+    def __init__(self):
+        self.enabled = settings.SEMANTIC_CACHE_ENABLED
+        self.threshold = settings.SEMANTIC_CACHE_THRESHOLD
+        self.ttl = settings.SEMANTIC_CACHE_TTL
+        self.max_entries = settings.SEMANTIC_CACHE_MAX_ENTRIES
+        self.local_dim = settings.SEMANTIC_CACHE_LOCAL_DIM
+        self.backend = self._resolve_backend(settings.SEMANTIC_CACHE_EMBEDDING)
+        self.embedding_model = settings.SEMANTIC_CACHE_EMBEDDING_MODEL or {
+            "dashscope": "text-embedding-v3",
+            "openai": "text-embedding-3-small",
+        }.get(self.backend, "char-ngram")
+        self._indexes: Dict[str, _ScopeIndex] = {}
+        self._lookups = 0
+        self._hits = 0
+        self._stores = 0
+        self._errors = 0
+        self._lookup_seconds = 0.0
+
+    @staticmethod
+    def _resolve_backend(backend: str) -> str:
+        if backend != "auto":
+            return backend
+        if settings.DASHSCOPE_API_KEY:
+            return "dashscope"
+        if settings.OPENAI_API_KEY:
+            return "openai"
+        return "local"
+
+    @staticmethod
+    def scope_for(course_id: Optional[int]) -> str:
+        return f"course:{course_id}" if course_id is not None else GLOBAL_SCOPE
+
+    @staticmethod
+    def is_cacheable(messages: List[Dict[str, str]]) -> bool:
+        """只缓存没有上下文的问题：发给大模型的消息中除系统提示词外只有当前问题"""
+        return sum(1 for m in messages if m.get("role") != "system") == 1
+
+    def _local_embedding(self, text: str):
+        """本地向量：字符2/3-gram和英文单词哈希到固定维度（只反映措辞的相似，不理解语义）"""
+        import numpy as np
+
+        vector = np.zeros(self.local_dim, dtype=np.float32)
+        grams = _WORD_PATTERN.findall(text)
+        compact = text.replace(" ", "")
+        for n in (2, 3):
+            grams += [compact[i:i + n] for i in range(len(compact) - n + 1)]
+        for gram in grams or [compact]:
+            h = zlib.crc32(gram.encode("utf-8"))
+            vector[h % self.local_dim] += 1.0 if (h >> 16) & 1 else -1.0
+        return vector
+
+    async def embed(self, question: str):
+        """计算归一化后的问题向量"""
+        import numpy as np
+
+        text = normalize_question(question)
+        if self.backend == "dashscope":
+            from app.services.dashscope_service import dashscope_service
+            vector = np.asarray((await dashscope_service.embed_texts([text], self.embedding_model))[0], dtype=np.float32)
+        elif self.backend == "openai":
+            from app.services.ai_service import ai_service
+            response = await asyncio.to_thread(ai_service.client.embeddings.create, model=self.embedding_model, input=text)
+            vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        else:
+            vector = self._local_embedding(text)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    async def _purged_at(self, scope: str) -> float:
+        """该作用域最近一次被清除的时间（包括全部清除）"""
+        from app.core.cache import cache_service
+
+        values = await cache_service.aget_many([PURGE_KEY_PREFIX + ALL_SCOPES, PURGE_KEY_PREFIX + scope])
+        return max(values.values(), default=0.0)
+
+    async def lookup(self, question: str, course_id: Optional[int] = None) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """
+        查找相似问题的缓存回答，返回（命中的条目或None, 问题向量）
+        问题向量用于未命中时写入缓存；计算向量失败时返回 (None, None)，本次不使用缓存
+        """
+        started = time.perf_counter()
+        self._lookups += 1
+        scope = self.scope_for(course_id)
+        try:
+            vector = await self.embed(question)
+            purged_at = await self._purged_at(scope)
+        except Exception as e:
+            self._errors += 1
+            print(f"⚠️  语义缓存查找失败: {e}")
+            return None, None
+
+        index = self._indexes.get(scope)
+        hit = None
+        if index is not None:
+            index.prune(time.time(), purged_at)
+            entry, similarity = index.search(vector)
+            if entry is not None and similarity >= self.threshold:
+                entry["hits"] += 1
+                self._hits += 1
+                hit = {**entry, "similarity": round(similarity, 4)}
+        self._lookup_seconds += time.perf_counter() - started
+        return hit, vector
+
+    def store(self, question: str, answer: str, vector, course_id: Optional[int] = None):
+        """写入一条问答（vector为lookup返回的问题向量）"""
+        if vector is None or not answer:
+            return
+        now = time.time()
+        scope = self.scope_for(course_id)
+        self._indexes.setdefault(scope, _ScopeIndex()).add(vector, {
+            "question": question,
+            "answer": answer,
+            "created_at": now,
+            "expires_at": now + self.ttl,
+            "hits": 0,
+        }, self.max_entries)
+        self._stores += 1
+
+    async def purge(self, course_id: Optional[int] = None) -> int:
+        """清除一个课程（默认全部）的缓存，返回本进程中移除的条目数"""
+        from app.core.cache import cache_service
+
+        scope = self.scope_for(course_id) if course_id is not None else ALL_SCOPES
+        # 清除时间同步给其他worker（它们在下次查找时丢弃更早的条目）
+        await cache_service.aset(PURGE_KEY_PREFIX + scope, time.time(), ttl=self.ttl)
+        if scope == ALL_SCOPES:
+            removed = sum(len(index) for index in self._indexes.values())
+            self._indexes.clear()
+        else:
+            index = self._indexes.pop(scope, None)
+            removed = len(index) if index is not None else 0
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率和各作用域的条目数（当前进程）"""
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "embedding_model": self.embedding_model,
+            "threshold": self.threshold,
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "misses": self._lookups - self._hits - self._errors,
+            "errors": self._errors,
+            "hit_rate": round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+            "stores": self._stores,
+            "avg_lookup_ms": round(self._lookup_seconds / self._lookups * 1000, 2) if self._lookups else 0.0,
+            "scopes": {scope: len(index) for scope, index in self._indexes.items()},
+        }
+
+
+semantic_cache_service = lazy_service("semantic_cache_service", SemanticCacheService)
@@ -3,16 +3,19 @@
 使用Whisper模型进行语音转文字
 """
 import os
+import importlib.util
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
+from app.core.config import settings
+from app.core.model_manager import model_manager
+from app.core.service_registry import lazy_service
 
 class SpeechToTextService:
     """语音转文字服务"""
     
     def __init__(self):
         self.whisper_available = False
-        self.model = None
-        self.model_size = "base"  # base, small, medium, large
+        self.model_size = settings.WHISPER_MODEL  # base, small, medium, large
         try:
             self._init_model()
         except Exception as e:
@@ -21,31 +24,37 @@ class SpeechToTextService:
             self.whisper_available = False
     
     def _init_model(self):
-        """初始化Whisper模型"""
-        try:
-            import whisper
-            self.whisper_available = True
-            
-            # 根据配置加载模型（延迟加载，避免启动时占用太多资源）
-            # self.model = whisper.load_model(self.model_size)
-            print(f"Whisper已就绪，模型大小: {self.model_size}")
-        except ImportError:
+        """注册Whisper模型加载器（不在导入时加载，由model_manager按预热策略加载）"""
+        if importlib.util.find_spec("whisper") is None:
             print("警告: Whisper未安装，语音识别功能不可用")
             print("安装方法: pip install openai-whisper")
             self.whisper_available = False
-        except Exception as e:
-            # 捕获其他可能的错误
-            print(f"警告: Whisper初始化时出现错误: {e}")
-            self.whisper_available = False
+            return
+        
+        model_size = self.model_size
+        
+        def _load_whisper():
+            import whisper
+            return whisper.load_model(model_size)
+        
+        model_manager.register_model("whisper", _load_whisper, {
+            "description": f"Whisper {model_size}",
+            "size_mb": 300,
+            "warmup": "background",
+        })
+        self.whisper_available = True
+        print(f"Whisper已就绪，模型大小: {self.model_size}")
+    
+    @property
+    def model(self):
+        """当前Whisper模型（未加载时触发加载）"""
+        if not self.whisper_available:
+            return None
+        return model_manager.get_model("whisper")
     
     def load_model(self):
-        """延迟加载模型"""
-        if self.model is None and self.whisper_available:
-            try:
-                import whisper
-                self.model = whisper.load_model(self.model_size)
-            except Exception as e:
-                print(f"加载Whisper模型错误: {e}")
+        """加载模型（已由model_manager预热时直接返回）"""
+        return self.model
     
     def transcribe(
         self, 
@@ -64,25 +73,22 @@ class SpeechToTextService:
                 "language": language or "unknown"
             }
         
-        self.load_model()
-        
-        if self.model is None:
-            return {
-                "text": "模型加载失败",
-                "segments": [],
-                "language": language or "unknown"
-            }
-        
         try:
-            import whisper
-            
-            # 转写音频
-            result = self.model.transcribe(
-                audio_path,
-                language=language,
-                task=task,
-                verbose=False
-            )
+            with model_manager.use_model("whisper") as model:
+                if model is None:
+                    return {
+                        "text": "模型加载失败",
+                        "segments": [],
+                        "language": language or "unknown"
+                    }
+                
+                # 转写音频
+                result = model.transcribe(
+                    audio_path,
+                    language=language,
+                    task=task,
+                    verbose=False
+                )
             
             # 格式化结果
             segments = []
@@ -185,5 +191,5 @@ class SpeechToTextService:
         return results
 
 # 单例模式
-speech_service = SpeechToTextService()
+speech_service = lazy_service("speech_service", SpeechToTextService)
 
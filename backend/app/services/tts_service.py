@@ -4,6 +4,7 @@ Coqui TTS文本转语音服务
 """
 import os
 from typing import Dict, Optional, Any
+from app.core.service_registry import lazy_service
 
 class TTSService:
     """Coqui TTS服务"""
@@ -101,5 +102,5 @@ class TTSService:
             return {"error": str(e)}
 
 # 全局实例
-tts_service = TTSService()
+tts_service = lazy_service("tts_service", TTSService)
 
@@ -5,6 +5,7 @@ import os
 import sys
 from typing import Dict, List, Optional, Any
 from pathlib import Path
+from app.core.service_registry import lazy_service
 
 class VideoEditingService:
     """视频编辑服务"""
@@ -139,5 +140,5 @@ class VideoEditingService:
             return {"error": str(e)}
 
 # 全局实例
-video_editing_service = VideoEditingService()
+video_editing_service = lazy_service("video_editing_service", VideoEditingService)
 
@@ -12,6 +12,7 @@ from typing import Dict, Any, Optional, List
 from pathlib import Path
 from app.core.config import settings
 from app.services.dashscope_service import dashscope_service
+from app.core.service_registry import lazy_service
 
 
 class VideoGenerationService:
@@ -387,5 +388,5 @@ class VideoGenerationService:
 
 
 # 全局实例
-video_generation_service = VideoGenerationService()
+video_generation_service = lazy_service("video_generation_service", VideoGenerationService)
 
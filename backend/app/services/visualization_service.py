@@ -5,7 +5,7 @@
 import io
 import base64
 from typing import Dict, List, Optional, Any
-import numpy as np
+from app.core.service_registry import lazy_service
 
 class VisualizationService:
     """可视化服务"""
@@ -320,5 +320,5 @@ class VisualizationService:
         }
 
 # 单例模式
-visualization_service = VisualizationService()
+visualization_service = lazy_service("visualization_service", VisualizationService)
 
@@ -3,29 +3,66 @@ WhisperX增强语音识别服务
 提供更准确的语音识别和说话人分离
 """
 import os
+import importlib.util
 from typing import Dict, List, Optional, Any
+from app.core.model_manager import model_manager
+from app.core.service_registry import lazy_service
 
 class WhisperXService:
-    """WhisperX语音识别服务"""
+    """WhisperX语音识别服务
+    
+    转写模型和各语言的对齐模型都注册到model_manager，加载一次后复用，
+    不再在每次转写时重新加载。
+    """
     
     def __init__(self):
         self.whisperx_available = False
-        self.model = None
         self.model_size = "base"
         self._init_whisperx()
     
     def _init_whisperx(self):
-        """初始化WhisperX"""
+        """注册WhisperX模型加载器"""
         # WhisperX应该通过pip安装: pip install whisperx
-        try:
-            import whisperx
-            self.whisperx = whisperx
-            self.whisperx_available = True
-            print(f"✅ WhisperX已安装，模型大小: {self.model_size}")
-        except ImportError:
+        if importlib.util.find_spec("whisperx") is None:
             print("警告: WhisperX未安装，增强语音识别功能受限")
             print("安装方法: pip install whisperx 或运行 python install_local_models.py")
             self.whisperx_available = False
+            return
+        
+        model_size = self.model_size
+        
+        def _load_whisperx():
+            import whisperx
+            return whisperx.load_model(model_size, "cpu", compute_type="int8")
+        
+        model_manager.register_model("whisperx", _load_whisperx, {
+            "description": f"WhisperX {model_size} (int8)",
+            "size_mb": 300,
+            "warmup": "lazy",
+        })
+        self.whisperx_available = True
+        print(f"✅ WhisperX已安装，模型大小: {self.model_size}")
+    
+    @property
+    def whisperx(self):
+        import whisperx
+        return whisperx
+    
+    def _align_model_name(self, language_code: str) -> str:
+        """按语言注册对齐模型（首次使用时注册）"""
+        model_name = f"whisperx_align_{language_code}"
+        if model_name not in model_manager.model_loaders:
+            def _load_align():
+                import whisperx
+                model_a, metadata = whisperx.load_align_model(language_code=language_code, device="cpu")
+                return {"model": model_a, "metadata": metadata}
+            
+            model_manager.register_model(model_name, _load_align, {
+                "description": f"WhisperX对齐模型 ({language_code})",
+                "size_mb": 400,
+                "warmup": "lazy",
+            })
+        return model_name
     
     def transcribe(
         self,
@@ -44,17 +81,26 @@ class WhisperXService:
             }
         
         try:
-            # 加载模型
-            model = self.whisperx.load_model(self.model_size, "cpu", compute_type="int8")
-            
             # 转写
             audio = self.whisperx.load_audio(audio_path)
-            result = model.transcribe(audio, batch_size=batch_size, language=language)
+            with model_manager.use_model("whisperx") as model:
+                if model is None:
+                    return {
+                        "error": "WhisperX模型加载失败",
+                        "text": "",
+                        "segments": []
+                    }
+                result = model.transcribe(audio, batch_size=batch_size, language=language)
             
             # 对齐（获取词级时间戳）
             if align:
-                model_a, metadata = self.whisperx.load_align_model(language_code=language or result["language"], device="cpu")
-                result = self.whisperx.align(result["segments"], model_a, metadata, audio, "cpu", return_char_alignments=False)
+                align_model_name = self._align_model_name(language or result["language"])
+                with model_manager.use_model(align_model_name) as aligner:
+                    if aligner is not None:
+                        result = self.whisperx.align(
+                            result["segments"], aligner["model"], aligner["metadata"],
+                            audio, "cpu", return_char_alignments=False
+                        )
             
             # 说话人分离
             if diarize:
@@ -76,5 +122,5 @@ class WhisperXService:
             }
 
 # 全局实例
-whisperx_service = WhisperXService()
+whisperx_service = lazy_service("whisperx_service", WhisperXService)
 
@@ -0,0 +1,80 @@
+"""
+缓存编解码基准测试：对比旧的json.dumps字符串与各序列化/压缩组合的体积和耗时
+
+用法: python benchmark_cache_codec.py [--scenes 200] [--rounds 200]
+"""
+import sys
+import os
+import json
+import time
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.core.cache_codec import CacheCodec, SERIALIZERS, COMPRESSORS
+from app.services.script_analysis_service import ScriptAnalysisService
+
+
+def build_payload(scene_count: int) -> dict:
+    """构造与analyze_script结果结构相近的负载（包含完整parsed_structure）"""
+    lines = []
+    for i in range(scene_count):
+        lines.append(f"内景 咖啡馆 第{i}场 - 日")
+        lines.append("小明推门走进咖啡馆，环顾四周，目光落在角落里的老人身上。")
+        lines.append("小明")
+        lines.append("您好，请问这里有人坐吗？我找了很久才找到这家店。")
+        lines.append("老人")
+        lines.append("坐吧，年轻人。这家店开了三十年了，很多人都是偶然走进来的。")
+    script_content = "\n".join(lines)
+    parsed = ScriptAnalysisService().parse_script_basic(script_content)
+    return {
+        "success": True,
+        "parsed_structure": parsed,
+        "analysis": {
+            "structure": "剧本结构分析。" * 50,
+            "characters": "角色分析。" * 50,
+            "suggestions": ["建议加强冲突", "建议调整节奏", "建议丰富人物动机"] * 10,
+        },
+    }
+
+
+def bench(payload: dict, rounds: int, encode, decode) -> tuple:
+    data = encode(payload)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(payload)
+    encode_ms = (time.perf_counter() - start) * 1000 / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        decode(data)
+    decode_ms = (time.perf_counter() - start) * 1000 / rounds
+    return len(data), encode_ms, decode_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缓存编解码基准测试")
+    parser.add_argument("--scenes", type=int, default=200, help="剧本场景数")
+    parser.add_argument("--rounds", type=int, default=200, help="每种组合重复次数")
+    args = parser.parse_args()
+
+    payload = build_payload(args.scenes)
+    # 旧实现：json.dumps后以UTF-8字符串写入Redis
+    baseline_size, baseline_enc, baseline_dec = bench(
+        payload, args.rounds,
+        lambda v: json.dumps(v).encode("utf-8"),
+        lambda b: json.loads(b)
+    )
+
+    print(f"负载: {args.scenes}个场景, 重复 {args.rounds} 次")
+    print(f"{'编码方式':<22}{'字节数':>10}{'节省':>9}{'编码ms':>10}{'解码ms':>10}")
+    print(f"{'json (旧)':<22}{baseline_size:>10}{'-':>9}{baseline_enc:>10.3f}{baseline_dec:>10.3f}")
+    for serializer in SERIALIZERS:
+        for compression in COMPRESSORS:
+            codec = CacheCodec(serializer=serializer, compression=compression)
+            size, enc_ms, dec_ms = bench(payload, args.rounds, codec.encode, codec.decode)
+            saved = 1 - size / baseline_size
+            name = f"{serializer}+{compression}"
+            print(f"{name:<22}{size:>10}{saved:>8.1%}{enc_ms:>10.3f}{dec_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+CLIP微批处理基准测试：不同max_batch_size / max_wait_ms下的吞吐与延迟
+
+并发客户端以闭环方式持续提交匹配请求，统计每秒请求数与p50/p95/p99延迟。
+默认使用与CLIP ViT-B/32投影层规模相近的numpy矩阵运算模拟前向计算（不依赖模型文件）；
+传入 --images 时使用真实的clip_service.match_image_text_batch。
+
+用法: python benchmark_clip_batching.py [--clients 32] [--duration 3] [--images a.jpg b.jpg]
+"""
+import sys
+import os
+import time
+import asyncio
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from app.core.batching import MicroBatcher
+
+TEXT_OPTIONS = ["一个人在咖啡馆", "城市夜景", "海边日落", "室内对话场景"]
+
+
+class SyntheticCLIP:
+    """模拟CLIP编码：每个样本经过几层全连接，批量时共享权重读取"""
+
+    def __init__(self, input_dim: int = 3072, hidden_dim: int = 768, layers: int = 4):
+        rng = np.random.default_rng(0)
+        self.input_dim = input_dim
+        self.weights = [rng.standard_normal((input_dim, hidden_dim), dtype=np.float32)]
+        self.weights += [rng.standard_normal((hidden_dim, hidden_dim), dtype=np.float32) for _ in range(layers - 1)]
+        self.text_features = rng.standard_normal((len(TEXT_OPTIONS), hidden_dim), dtype=np.float32)
+        self.rng = rng
+
+    def match_image_text_batch(self, requests):
+        x = self.rng.standard_normal((len(requests), self.input_dim), dtype=np.float32)
+        for w in self.weights:
+            x = np.maximum(x @ w, 0)
+        logits = x @ self.text_features.T
+        return [{"success": True, "best": int(np.argmax(row))} for row in logits]
+
+
+def build_backend(images):
+    if not images:
+        return SyntheticCLIP().match_image_text_batch, "synthetic"
+    from app.services.clip_service import clip_service
+    if not clip_service.clip_available:
+        print("⚠️  CLIP未安装，改用模拟负载")
+        return SyntheticCLIP().match_image_text_batch, "synthetic"
+    return clip_service.match_image_text_batch, "clip"
+
+
+async def run_config(batch_fn, images, clients: int, duration: float, max_batch_size: int, max_wait_ms: float):
+    async def run_batch(items):
+        return await asyncio.to_thread(batch_fn, items)
+
+    batcher = MicroBatcher(run_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(idx: int):
+        i = 0
+        while time.perf_counter() < deadline:
+            image = images[(idx + i) % len(images)] if images else None
+            started = time.perf_counter()
+            await batcher.submit((image, TEXT_OPTIONS))
+            latencies.append(time.perf_counter() - started)
+            i += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    elapsed = time.perf_counter() - started
+    ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "avg_batch": batcher.stats()["avg_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLIP微批处理基准测试")
+    parser.add_argument("--clients", type=int, default=32, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=3, help="每种配置运行秒数")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--waits", type=float, nargs="+", default=[2, 10], help="max_wait_ms取值")
+    parser.add_argument("--images", nargs="*", default=[], help="使用真实CLIP时的测试图像")
+    args = parser.parse_args()
+
+    batch_fn, backend = build_backend(args.images)
+    print(f"后端: {backend}, 并发客户端: {args.clients}, 每组 {args.duration}s")
+    print(f"{'batch':>6}{'wait_ms':>9}{'req/s':>10}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'平均批量':>10}")
+    for max_batch_size in args.batch_sizes:
+        waits = [0] if max_batch_size == 1 else args.waits
+        for max_wait_ms in waits:
+            r = asyncio.run(run_config(
+                batch_fn, args.images, args.clients, args.duration, max_batch_size, max_wait_ms
+            ))
+            print(
+                f"{max_batch_size:>6}{max_wait_ms:>9g}{r['throughput']:>10.1f}"
+                f"{r['p50']:>9.2f}{r['p95']:>9.2f}{r['p99']:>9.2f}{r['avg_batch']:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+数据库并发基准测试：async接口中使用同步Session与AsyncSession的对比
+
+并发协程模拟“获取项目剧本列表”接口，同时运行一个每10ms唤醒一次的心跳协程，
+统计吞吐、请求延迟以及事件循环最大阻塞时间（心跳延迟）。同步Session的查询直接在事件循环上执行，
+心跳延迟会随并发和查询耗时增长；AsyncSession的查询在驱动线程/网络IO中完成，事件循环保持响应。
+
+默认使用系统临时目录中的独立SQLite文件，不影响开发数据库。
+
+用法: python benchmark_db_concurrency.py [--concurrency 50] [--requests 2000] [--database-url postgresql://...]
+"""
+import sys
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.core.database import Base, to_async_url
+from app.models.user import User
+from app.models.course import Course
+from app.models.project import Project, Script
+
+
+def seed(sync_engine, projects: int, scripts_per_project: int):
+    """创建表并写入测试数据"""
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    Session = sessionmaker(bind=sync_engine)
+    with Session() as db:
+        teacher = User(username="bench_teacher", email="bench@example.com", hashed_password="x", role="teacher")
+        db.add(teacher)
+        db.flush()
+        course = Course(name="基准课程", teacher_id=teacher.id)
+        db.add(course)
+        db.flush()
+        for i in range(projects):
+            project = Project(name=f"项目{i}", course_id=course.id, owner_id=teacher.id)
+            db.add(project)
+            db.flush()
+            db.add_all([
+                Script(project_id=project.id, title=f"剧本{j}", content="内景 咖啡馆 - 日\n" * 40)
+                for j in range(scripts_per_project)
+            ])
+        db.commit()
+
+
+async def heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """心跳协程：记录实际唤醒时间与预期时间的差值"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(mode: str, handler, concurrency: int, total: int, projects: int):
+    stop = asyncio.Event()
+    lags, latencies = [], []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await handler(i % projects + 1)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await beat
+
+    latencies.sort()
+    lags.sort()
+    pct = lambda values, p: values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+    print(
+        f"{mode:<8}{total / elapsed:>10.1f}{pct(latencies, 0.5):>10.2f}{pct(latencies, 0.95):>10.2f}"
+        f"{pct(lags, 0.99):>12.2f}{(lags[-1] * 1000 if lags else 0.0):>12.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库并发基准测试")
+    parser.add_argument(
+        "--database-url",
+        default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_db_concurrency.db')}"
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--scripts", type=int, default=20, help="每个项目的剧本数")
+    args = parser.parse_args()
+
+    sync_engine = create_engine(
+        args.database_url,
+        connect_args={"check_same_thread": False} if "sqlite" in args.database_url else {}
+    )
+    seed(sync_engine, args.projects, args.scripts)
+    SyncSession = sessionmaker(bind=sync_engine, autoflush=False)
+
+    async def sync_handler(project_id: int):
+        # 旧实现：在async接口中直接执行同步查询
+        db = SyncSession()
+        try:
+            project = db.get(Project, project_id)
+            scripts = db.query(Script).filter(Script.project_id == project.id).all()
+            return [(s.id, s.title, len(s.content)) for s in scripts]
+        finally:
+            db.close()
+
+    async def main_async():
+        async_engine = create_async_engine(to_async_url(args.database_url))
+        AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+        async def async_handler(project_id: int):
+            async with AsyncSession() as db:
+                project = await db.get(Project, project_id)
+                scripts = (await db.scalars(select(Script).where(Script.project_id == project.id))).all()
+                return [(s.id, s.title, len(s.content)) for s in scripts]
+
+        print(f"数据库: {args.database_url}, 并发: {args.concurrency}, 请求数: {args.requests}")
+        print(f"{'模式':<8}{'req/s':>10}{'p50ms':>10}{'p95ms':>10}{'心跳p99ms':>12}{'心跳max ms':>12}")
+        await run("sync", sync_handler, args.concurrency, args.requests, args.projects)
+        await run("async", async_handler, args.concurrency, args.requests, args.projects)
+        await async_engine.dispose()
+
+    asyncio.run(main_async())
+    sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
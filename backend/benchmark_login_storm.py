@@ -0,0 +1,134 @@
+"""
+登录风暴基准测试：密码哈希在事件循环内执行 vs 在线程池中执行
+
+模拟上课时大量学生同时登录：并发客户端持续调用 /api/auth/login，同时一个探测客户端每10ms请求一次
+与登录无关的 /api/health，统计登录吞吐以及探测请求的p50/p99/max延迟（从计划发送时间算起）。
+所有请求在同一个事件循环中通过ASGI直接调用应用（相当于单个uvicorn worker）：
+inline模式下哈希计算阻塞事件循环，探测请求的尾延迟随登录并发上升；pool模式下事件循环保持响应。
+
+默认使用系统临时目录中的独立SQLite文件，不影响开发数据库。
+
+用法: python benchmark_login_storm.py [--logins 200] [--concurrency 50] [--rounds 290000]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="登录风暴基准测试")
+    parser.add_argument("--logins", type=int, default=200, help="每种模式的登录请求总数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发登录客户端数")
+    parser.add_argument("--users", type=int, default=50, help="测试用户数")
+    parser.add_argument("--rounds", type=int, default=290000, help="pbkdf2_sha256迭代次数（越大单次哈希越慢）")
+    parser.add_argument("--workers", type=int, default=None, help="密码哈希线程数（默认使用配置）")
+    return parser.parse_args()
+
+
+args = parse_args()
+# 在导入应用之前切换到独立的基准数据库
+db_path = os.path.join(tempfile.gettempdir(), "bench_login_storm.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+import httpx
+from app.core.database import Base, engine, async_engine, SessionLocal
+from app.core.security import PasswordHasher, pwd_context
+from app.models.user import User
+import app.core.security as security
+import main
+
+
+def seed(users: int):
+    """创建测试用户（所有用户使用同一个密码哈希，避免准备阶段耗时过长）"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    hashed = pwd_context.hash("password123")
+    with SessionLocal() as db:
+        db.add_all([
+            User(username=f"student{i}", email=f"student{i}@example.com", hashed_password=hashed,
+                 full_name=f"学生{i}", role="student")
+            for i in range(users)
+        ])
+        db.commit()
+
+
+class InlineHasher(PasswordHasher):
+    """旧实现：在事件循环中直接计算哈希"""
+
+    async def _run(self, fn, *args):
+        return fn(*args)
+
+
+async def run(mode: str, hasher: PasswordHasher):
+    security.password_hasher = hasher
+    main_auth = sys.modules["app.api.auth"]
+    main_auth.password_hasher = hasher
+
+    transport = httpx.ASGITransport(app=main.app)
+    probe_latencies, login_latencies = [], []
+    stop = asyncio.Event()
+    counter = iter(range(args.logins))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def probe():
+            # 延迟从计划发送时间算起，包含事件循环被阻塞导致的调度延迟
+            while not stop.is_set():
+                scheduled = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                await client.get("/api/health")
+                probe_latencies.append(time.perf_counter() - scheduled)
+
+        async def login_worker():
+            for i in counter:
+                started = time.perf_counter()
+                response = await client.post("/api/auth/login", data={
+                    "username": f"student{i % args.users}", "password": "password123"
+                })
+                assert response.status_code in (200, 503), response.text
+                login_latencies.append(time.perf_counter() - started)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*[login_worker() for _ in range(args.concurrency)])
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await probe_task
+
+    probe_latencies.sort()
+    login_latencies.sort()
+    pct = lambda values, p: values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+    print(
+        f"{mode:<8}{args.logins / elapsed:>10.1f}{pct(login_latencies, 0.5):>12.1f}{pct(login_latencies, 0.99):>12.1f}"
+        f"{pct(probe_latencies, 0.5):>12.2f}{pct(probe_latencies, 0.99):>12.2f}"
+        f"{(probe_latencies[-1] * 1000 if probe_latencies else 0.0):>12.2f}"
+    )
+    hasher.shutdown()
+
+
+def main_bench():
+    pwd_context.update(pbkdf2_sha256__default_rounds=args.rounds)
+    seed(args.users)
+    started = time.perf_counter()
+    pwd_context.hash("password123")
+    print(f"单次哈希耗时: {(time.perf_counter() - started) * 1000:.1f} ms（pbkdf2_sha256, rounds={args.rounds}）")
+    print(f"登录请求: {args.logins}, 并发: {args.concurrency}, 数据库: {db_path}")
+    print(f"{'模式':<8}{'登录/s':>10}{'登录p50ms':>12}{'登录p99ms':>12}{'探测p50ms':>12}{'探测p99ms':>12}{'探测max ms':>12}")
+
+    async def run_all():
+        # 两种模式在同一个事件循环中运行（异步引擎的连接池绑定事件循环）
+        await run("inline", InlineHasher(workers=1, max_pending=10 ** 6))
+        await run("pool", PasswordHasher(workers=args.workers, max_pending=10 ** 6))
+        await async_engine.dispose()
+
+    asyncio.run(run_all())
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,198 @@
+"""
+启动与导入耗时基准测试
+
+在全新的解释器中以 `python -X importtime` 导入 main:app，解析导入耗时输出，
+报告累计耗时最多的模块、各路由模块（app.api.*）和服务模块（app.services.*）的耗时，以及启动后的常驻内存（RSS）。
+多次运行取中位数，并与保存的基线JSON对比：总导入耗时或RSS超出阈值时以非零状态码退出，便于在评审中发现启动回归。
+
+用法:
+    python benchmark_startup.py                       # 与默认基线对比
+    python benchmark_startup.py --save-baseline       # 以本次结果更新基线
+    python benchmark_startup.py --top 30 --runs 5 --startup
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "startup_baseline.json")
+
+# 子进程中执行：导入应用（可选执行启动事件），最后一行输出耗时与RSS
+CHILD_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+if {startup!r}:
+    from fastapi.testclient import TestClient
+    with TestClient(main.app):
+        pass
+finished = time.perf_counter()
+rss_kb = 0
+try:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss_kb //= 1024
+print("__BENCH__" + json.dumps({{
+    "import_s": imported - started,
+    "startup_s": finished - imported,
+    "rss_mb": rss_kb / 1024,
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> Dict[str, Dict[str, float]]:
+    """解析 -X importtime 输出（'import time: 自身us | 累计us | 模块'）：{模块: {"self_ms", "cumulative_ms"}}"""
+    modules: Dict[str, Dict[str, float]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            head, cumulative_us, name = line.split("|")
+            self_us = int(head.split(":", 1)[1])
+            modules[name.strip()] = {"self_ms": self_us / 1000, "cumulative_ms": int(cumulative_us) / 1000}
+        except ValueError:
+            continue
+    return modules
+
+
+def run_once(startup: bool) -> Dict:
+    """在新解释器中导入一次应用"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_CODE.format(startup=startup)],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    result_line = next((l for l in proc.stdout.splitlines() if l.startswith("__BENCH__")), None)
+    if proc.returncode != 0 or result_line is None:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"导入 main:app 失败（退出码 {proc.returncode}）")
+    result = json.loads(result_line[len("__BENCH__"):])
+    result["modules"] = parse_importtime(proc.stderr)
+    return result
+
+
+def summarize(runs: List[Dict], top: int, startup: bool) -> Dict:
+    """多次运行取中位数"""
+    median = lambda values: round(statistics.median(values), 2)
+    names = set.intersection(*(set(r["modules"]) for r in runs))
+    cumulative = {n: median([r["modules"][n]["cumulative_ms"] for r in runs]) for n in names}
+    self_ms = {n: median([r["modules"][n]["self_ms"] for r in runs]) for n in names}
+    group = lambda prefix: {
+        n: cumulative[n] for n in sorted(names) if n.startswith(prefix) and n.count(".") == prefix.count(".")
+    }
+    return {
+        "python": sys.version.split()[0],
+        "runs": len(runs),
+        "startup_events": startup,
+        "import_ms": median([r["import_s"] * 1000 for r in runs]),
+        "startup_ms": median([r["startup_s"] * 1000 for r in runs]),
+        "rss_mb": median([r["rss_mb"] for r in runs]),
+        "top_modules": [
+            {"module": n, "cumulative_ms": cumulative[n], "self_ms": self_ms[n]}
+            for n in sorted(names, key=lambda n: cumulative[n], reverse=True)[:top]
+        ],
+        "routers": group("app.api."),
+        "services": group("app.services."),
+    }
+
+
+def print_report(summary: Dict, baseline: Dict = None):
+    base_modules = {m["module"]: m["cumulative_ms"] for m in (baseline or {}).get("top_modules", [])}
+    base_modules.update((baseline or {}).get("routers", {}))
+    base_modules.update((baseline or {}).get("services", {}))
+
+    def delta(name, value):
+        if name not in base_modules:
+            return ""
+        return f"{value - base_modules[name]:+10.1f}"
+
+    print(f"Python {summary['python']}，运行 {summary['runs']} 次取中位数")
+    print(f"导入 main:app: {summary['import_ms']:.1f} ms，启动事件: {summary['startup_ms']:.1f} ms，RSS: {summary['rss_mb']:.1f} MB")
+    print(f"\n累计导入耗时最多的 {len(summary['top_modules'])} 个模块:")
+    print(f"{'累计ms':>10}{'自身ms':>10}{'对比基线':>10}  模块")
+    for m in summary["top_modules"]:
+        print(f"{m['cumulative_ms']:>10.1f}{m['self_ms']:>10.1f}{delta(m['module'], m['cumulative_ms']):>10}  {m['module']}")
+    for title, key in (("路由模块", "routers"), ("服务模块", "services")):
+        print(f"\n{title}（累计ms，包含其首次导入的依赖）:")
+        for name, value in sorted(summary[key].items(), key=lambda kv: kv[1], reverse=True):
+            print(f"{value:>10.1f}{'':>10}{delta(name, value):>10}  {name}")
+
+
+def compare(
+    summary: Dict, baseline: Dict, threshold: float, min_import_ms: float, min_rss_mb: float, min_module_ms: float
+) -> List[str]:
+    """返回超出阈值的回归项：总导入耗时、RSS，以及单个路由/服务模块的累计导入耗时"""
+    checks = [
+        ("导入耗时", baseline.get("import_ms"), summary["import_ms"], "ms", min_import_ms),
+        ("RSS", baseline.get("rss_mb"), summary["rss_mb"], "MB", min_rss_mb),
+    ]
+    for key in ("routers", "services"):
+        for name, after in summary[key].items():
+            checks.append((name, baseline.get(key, {}).get(name), after, "ms", min_module_ms))
+
+    regressions = []
+    for label, before, after, unit, min_delta in checks:
+        if not before:
+            continue
+        change = after - before
+        if change > min_delta and change / before > threshold:
+            regressions.append(f"{label}: {before:.1f}{unit} -> {after:.1f}{unit}（{change / before:+.0%}）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动与导入耗时基准测试")
+    parser.add_argument("--runs", type=int, default=3, help="运行次数（取中位数）")
+    parser.add_argument("--top", type=int, default=20, help="显示累计耗时最多的模块数")
+    parser.add_argument("--startup", action="store_true", help="导入后同时执行FastAPI启动/关闭事件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线JSON路径")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果写入基线")
+    parser.add_argument("--threshold", type=float, default=0.2, help="视为回归的相对增幅")
+    parser.add_argument("--min-import-ms", type=float, default=100, help="导入耗时的最小绝对增量（过滤噪声）")
+    parser.add_argument("--min-rss-mb", type=float, default=10, help="RSS的最小绝对增量（过滤噪声）")
+    parser.add_argument("--min-module-ms", type=float, default=50, help="单个模块导入耗时的最小绝对增量（过滤噪声）")
+    args = parser.parse_args()
+
+    runs = [run_once(args.startup) for _ in range(args.runs)]
+    summary = summarize(runs, args.top, args.startup)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n[OK] 基线已保存: {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"\n未找到基线 {args.baseline}，使用 --save-baseline 创建")
+        return
+    if baseline.get("startup_events", False) != args.startup:
+        print("\n⚠️  基线与本次是否执行启动事件（--startup）不一致，对比结果仅供参考")
+    regressions = compare(
+        summary, baseline, args.threshold, args.min_import_ms, args.min_rss_mb, args.min_module_ms
+    )
+    if regressions:
+        print("\n[REGRESSION] 启动性能相对基线退化:")
+        for item in regressions:
+            print(f"  - {item}")
+        sys.exit(1)
+    print(f"\n[OK] 未超出基线阈值（导入 {baseline['import_ms']:.1f} ms，RSS {baseline['rss_mb']:.1f} MB）")
+
+
+if __name__ == "__main__":
+    main()
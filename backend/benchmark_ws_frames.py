@@ -0,0 +1,145 @@
+"""
+WebSocket流式回复帧合并基准测试
+
+模拟大量学生同时接收流式回复：每个WebSocket连接发送一个问题，模拟的大模型按固定节奏返回增量
+（每个节拍返回若干个单字符增量，相当于逐字符切分的token流）。请求直接通过ASGI调用 websocket_chat，
+不经过网络，统计的是服务端序列化、发送和事件循环调度的开销。
+
+对比以下策略的帧数、帧/秒、平均帧大小，以及每个活跃连接消耗的CPU：
+- off：每个增量单独发送一个JSON帧（原来的行为）
+- json：按 --interval-ms / --max-bytes 合并后发送JSON帧
+- binary：按相同策略合并后发送UTF-8二进制帧
+
+默认使用系统临时目录中的独立SQLite文件，不影响开发数据库。
+
+用法: python benchmark_ws_frames.py [--streams 100] [--chars 400] [--interval-ms 50] [--max-bytes 1024]
+"""
+import os
+import io
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import contextlib
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="WebSocket流式回复帧合并基准测试")
+    parser.add_argument("--streams", type=int, default=100, help="同时进行的流式回复数")
+    parser.add_argument("--chars", type=int, default=400, help="每条回复的字符数")
+    parser.add_argument("--tick-rate", type=float, default=25, help="模拟模型每秒返回的节拍数")
+    parser.add_argument("--chars-per-tick", type=int, default=4, help="每个节拍返回的单字符增量数")
+    parser.add_argument("--interval-ms", type=float, default=50, help="合并策略：最长缓冲时间（毫秒）")
+    parser.add_argument("--max-bytes", type=int, default=1024, help="合并策略：缓冲区字节数上限")
+    return parser.parse_args()
+
+
+args = parse_args()
+# 在导入应用之前切换到独立的基准数据库
+db_path = os.path.join(tempfile.gettempdir(), "bench_ws_frames.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+from app.core.config import settings
+from app.core.database import Base, engine, async_engine
+from app.services.ai_service import ai_service
+import main
+
+REPLY = ("三分法构图是把画面横竖各分成三等份，把主体放在分割线或交点上，" * 100)[:args.chars]
+
+# (名称, 帧格式, 合并间隔ms, 合并字节数)
+POLICIES = [
+    ("off", "json", 0, 0),
+    ("json", "json", args.interval_ms, args.max_bytes),
+    ("binary", "binary", args.interval_ms, args.max_bytes),
+]
+
+
+async def fake_stream(messages, temperature=0.7):
+    """模拟逐字符切分的模型输出"""
+    for start in range(0, len(REPLY), args.chars_per_tick):
+        await asyncio.sleep(1 / args.tick_rate)
+        for char in REPLY[start:start + args.chars_per_tick]:
+            yield char
+
+
+async def run_stream(frame_format: str, counters: dict):
+    """通过ASGI直接建立一个WebSocket连接，发送一个问题并接收完整回复"""
+    inbox: asyncio.Queue = asyncio.Queue()
+    await inbox.put({"type": "websocket.connect"})
+    received = []
+
+    async def send(message):
+        if message["type"] != "websocket.send":
+            return
+        if message.get("bytes") is not None:
+            counters["chunk_frames"] += 1
+            counters["bytes"] += len(message["bytes"])
+            received.append(message["bytes"].decode("utf-8"))
+            return
+        text = message["text"]
+        counters["bytes"] += len(text.encode("utf-8"))
+        if text.startswith('{"type": "chunk"'):
+            counters["chunk_frames"] += 1
+            received.append(text)
+        elif text.startswith('{"type": "session"'):
+            await inbox.put({"type": "websocket.receive", "text": '{"message": "什么是三分法构图"}'})
+        elif text.startswith('{"type": "end"'):
+            await inbox.put({"type": "websocket.disconnect", "code": 1000})
+
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+        "path": "/api/chat/ws", "raw_path": b"/api/chat/ws", "root_path": "",
+        "query_string": f"frames={frame_format}".encode(), "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80), "subprotocols": [],
+    }
+    await main.app(scope, inbox.get, send)
+    counters["replies"] += 1 if received else 0
+
+
+async def run_policy(name: str, frame_format: str, interval_ms: float, max_bytes: int):
+    settings.CHAT_STREAM_FLUSH_INTERVAL_MS = interval_ms
+    settings.CHAT_STREAM_FLUSH_BYTES = max_bytes
+    counters = {"chunk_frames": 0, "bytes": 0, "replies": 0}
+
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    # 每条回复都会打印TTFT日志，基准测试期间不输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*[run_stream(frame_format, counters) for _ in range(args.streams)])
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    frames = counters["chunk_frames"]
+    print(
+        f"{name:<8}{frames:>10}{frames / elapsed:>10.0f}{counters['bytes'] / max(frames, 1):>10.1f}"
+        f"{cpu * 1000 / args.streams:>14.1f}{cpu / elapsed / args.streams * 100:>12.2f}%{elapsed:>9.2f}"
+    )
+    assert counters["replies"] == args.streams, "部分连接没有收到回复"
+
+
+def main_bench():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    ai_service.stream_chat_completion = fake_stream
+
+    deltas = len(REPLY)
+    print(f"并发流: {args.streams}，每条回复 {deltas} 个增量，约 {deltas / args.chars_per_tick / args.tick_rate:.1f} 秒")
+    print(f"合并策略: {args.interval_ms:g} ms / {args.max_bytes} 字节，数据库: {db_path}")
+    print(f"{'策略':<8}{'增量帧数':>10}{'帧/秒':>10}{'平均帧字节':>10}{'CPU ms/连接':>14}{'CPU/连接':>13}{'耗时s':>9}")
+
+    async def run_all():
+        # 所有策略在同一个事件循环中运行（异步引擎的连接池绑定事件循环）
+        for policy in POLICIES:
+            await run_policy(*policy)
+        # 等待回复结束后调度的后台任务（对话摘要）完成
+        await asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()}))
+        await async_engine.dispose()
+
+    asyncio.run(run_all())
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -170,6 +170,64 @@ app.include_router(pdf_reader.router, prefix="/api", tags=["PDF阅读器"])
 # 视频生成路由（通义万相）
 app.include_router(video_generation.router, tags=["视频生成"])
 
+@app.on_event("startup")
+async def log_database_settings():
+    """打印实际生效的数据库设置（SQLite PRAGMA / 连接池参数）"""
+    import asyncio
+    from app.core.database import log_database_settings as _log_database_settings
+    await asyncio.to_thread(_log_database_settings)
+
+@app.on_event("startup")
+async def warmup_models():
+    """启用推理进程池时由worker加载模型；否则在API进程按预热策略加载（eager同步，background后台线程）
+    
+    服务单例延迟构建，进程池关闭时先构建预加载列表中的服务，使其模型在预热前完成注册。
+    """
+    import asyncio
+    from app.core.model_manager import model_manager
+    from app.core.service_registry import service_registry
+    from app.core.worker_pool import model_worker_pool
+    if model_worker_pool.enabled:
+        await asyncio.to_thread(model_worker_pool.start)
+    else:
+        await asyncio.to_thread(service_registry.build_modules, model_worker_pool.preload)
+        await asyncio.to_thread(model_manager.start_warmup)
+
+@app.on_event("startup")
+async def probe_ollama():
+    """后台异步探测Ollama服务，不阻塞启动；首次使用时若尚未完成会等待同一次探测"""
+    import asyncio
+    from app.services.ollama_service import ollama_service
+    app.state.ollama_probe = asyncio.create_task(ollama_service.ensure_available())
+
+@app.on_event("shutdown")
+async def flush_message_store():
+    """写入队列中尚未保存的聊天消息"""
+    from app.core.service_registry import service_registry
+    if service_registry.is_built("message_store"):
+        from app.services.message_store import message_store
+        await message_store.close()
+
+@app.on_event("shutdown")
+async def close_cache_connections():
+    """关闭异步Redis连接池"""
+    from app.core.cache import cache_service
+    await cache_service.aclose()
+    cache_service.close()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    """关闭密码哈希线程池"""
+    from app.core.security import password_hasher
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def stop_model_workers():
+    """关闭模型推理进程池"""
+    import asyncio
+    from app.core.worker_pool import model_worker_pool
+    await asyncio.to_thread(model_worker_pool.shutdown)
+
 @app.get("/")
 async def root():
     return {
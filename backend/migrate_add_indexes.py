@@ -0,0 +1,112 @@
+"""
+数据库迁移脚本：为高频外键查询添加（复合）索引
+
+可重复执行：已存在的索引会跳过。每个索引前后打印对应查询的执行计划（EXPLAIN QUERY PLAN），
+便于确认查询从全表扫描（SCAN）变为索引查找（SEARCH ... USING INDEX）。
+新建的数据库由模型中的 __table_args__ 直接创建同名索引，无需执行本脚本。
+
+用法: python migrate_add_indexes.py [数据库文件路径]
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+# (索引名, 表名, 列, 受影响的查询, 查询参数)
+INDEXES = [
+    (
+        "ix_scripts_project_id", "scripts", ["project_id"],
+        "SELECT * FROM scripts WHERE project_id = ?", (1,)
+    ),
+    (
+        "ix_storyboards_project_id_order", "storyboards", ["project_id", "order"],
+        'SELECT * FROM storyboards WHERE project_id = ? ORDER BY "order"', (1,)
+    ),
+    (
+        "ix_media_assets_project_id", "media_assets", ["project_id"],
+        "SELECT * FROM media_assets WHERE project_id = ?", (1,)
+    ),
+    (
+        "ix_evaluations_project_id_created_at", "evaluations", ["project_id", "created_at"],
+        "SELECT * FROM evaluations WHERE project_id = ? ORDER BY created_at DESC", (1,)
+    ),
+    (
+        "ix_course_enrollments_course_id_student_id", "course_enrollments", ["course_id", "student_id"],
+        "SELECT * FROM course_enrollments WHERE course_id = ? AND student_id = ?", (1, 1)
+    ),
+    (
+        "ix_course_enrollments_student_id", "course_enrollments", ["student_id"],
+        "SELECT * FROM course_enrollments WHERE student_id = ?", (1,)
+    ),
+    (
+        "ix_video_generation_jobs_user_id_status", "video_generation_jobs", ["user_id", "status"],
+        "SELECT * FROM video_generation_jobs WHERE user_id = ? AND status = ?", (1, "PENDING")
+    ),
+    (
+        "ix_messages_conversation_id_created_at", "messages", ["conversation_id", "created_at"],
+        "SELECT * FROM messages WHERE conversation_id = ? ORDER BY created_at", (1,)
+    ),
+]
+
+def query_plan(cursor, sql, params):
+    """返回查询计划的文字描述"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return "; ".join(row[-1] for row in cursor.fetchall())
+
+def migrate_add_indexes(db_path=None):
+    """创建缺失的索引并打印执行计划变化"""
+    # 默认使用脚本所在目录（backend目录）下的数据库
+    db_path = Path(db_path) if db_path else Path(__file__).parent / "film_education.db"
+
+    if not db_path.exists():
+        print("数据库文件不存在，将在下次启动时自动创建（包含索引）")
+        return
+
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    try:
+        created = 0
+        for index_name, table, columns, sql, params in INDEXES:
+            # 检查表和列是否存在
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+            if not cursor.fetchone():
+                print(f"{table} 表不存在，跳过 {index_name}")
+                continue
+            cursor.execute(f"PRAGMA table_info({table})")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            missing = [c for c in columns if c not in existing_columns]
+            if missing:
+                print(f"{table} 表缺少列 {', '.join(missing)}，跳过 {index_name}")
+                continue
+
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='index' AND name=?", (index_name,))
+            if cursor.fetchone():
+                print(f"{index_name} 已存在")
+                print(f"    计划: {query_plan(cursor, sql, params)}")
+                continue
+
+            before = query_plan(cursor, sql, params)
+            column_list = ", ".join(f'"{c}"' for c in columns)
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column_list})')
+            after = query_plan(cursor, sql, params)
+            created += 1
+            print(f"[OK] {index_name} 已创建")
+            print(f"    查询: {sql}")
+            print(f"    之前: {before}")
+            print(f"    之后: {after}")
+
+        if created:
+            # 更新统计信息，让查询规划器使用新索引
+            cursor.execute("ANALYZE")
+        conn.commit()
+        print(f"[OK] 索引迁移完成，新建 {created} 个索引")
+
+    except Exception as e:
+        print(f"[ERROR] 迁移失败: {str(e)}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_add_indexes(sys.argv[1] if len(sys.argv) > 1 else None)
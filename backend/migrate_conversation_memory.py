@@ -0,0 +1,59 @@
+"""
+数据库迁移脚本：为conversations表添加对话记忆（滚动摘要）所需的列
+
+可重复执行：已存在的列会跳过。新建的数据库由模型直接创建这些列，无需执行本脚本。
+已有会话不需要回填：summary_message_id为空时，第一次对话后会把窗口之外的历史消息并入摘要。
+
+用法: python migrate_conversation_memory.py [数据库文件路径]
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+# (列名, 列类型)
+COLUMNS = [
+    ("summary", "TEXT"),
+    ("summary_message_id", "INTEGER"),
+]
+
+def migrate_conversation_memory(db_path=None):
+    """为conversations表添加缺失的列"""
+    # 默认使用脚本所在目录（backend目录）下的数据库
+    db_path = Path(db_path) if db_path else Path(__file__).parent / "film_education.db"
+
+    if not db_path.exists():
+        print("数据库文件不存在，将在下次启动时自动创建")
+        return
+
+    conn = sqlite3.connect(str(db_path))
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='conversations'")
+        if not cursor.fetchone():
+            print("conversations表不存在，将在下次启动时自动创建")
+            return
+
+        cursor.execute("PRAGMA table_info(conversations)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+
+        for column, column_type in COLUMNS:
+            if column in existing_columns:
+                print(f"{column} 列已存在")
+                continue
+            print(f"添加 {column} 列...")
+            cursor.execute(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}")
+            print(f"[OK] {column} 列已添加")
+
+        conn.commit()
+        print("[OK] 数据库迁移完成")
+
+    except Exception as e:
+        print(f"[ERROR] 迁移失败: {str(e)}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_conversation_memory(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -117,3 +117,62 @@ def test_get_current_user(test_user):
 
 
 
+
+def test_principal_cached_and_invalidated(test_user):
+    """测试已认证用户缓存：重复请求不再查询用户表，管理员禁用后立即生效"""
+    from sqlalchemy import event
+    from app.core.database import async_engine
+    from app.core.security import create_access_token
+    
+    db = SessionLocal()
+    admin = User(
+        username="admin",
+        email="admin@example.com",
+        hashed_password="x",
+        full_name="Admin",
+        role="admin"
+    )
+    db.add(admin)
+    db.commit()
+    db.close()
+    
+    token = create_access_token({"sub": "testuser", "role": "student"})
+    headers = {"Authorization": f"Bearer {token}"}
+    admin_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+    
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/api/auth/me", headers=headers).status_code == 200
+        assert client.get("/api/auth/me", headers=headers).status_code == 200
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert sum("FROM users" in s for s in statements) == 1
+    
+    response = client.put(f"/api/admin/users/{test_user.id}", json={"is_active": False}, headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 400
+
+def test_login_rehashes_legacy_bcrypt_password():
+    """测试旧bcrypt哈希在登录成功后升级为当前默认方案"""
+    import bcrypt
+    db = SessionLocal()
+    db.add(User(
+        username="legacy",
+        email="legacy@example.com",
+        hashed_password=bcrypt.hashpw(b"oldpass123", bcrypt.gensalt(rounds=4)).decode(),
+        full_name="Legacy User",
+        role="student"
+    ))
+    db.commit()
+    db.close()
+    
+    for _ in range(2):
+        response = client.post("/api/auth/login", data={"username": "legacy", "password": "oldpass123"})
+        assert response.status_code == 200
+    
+    db = SessionLocal()
+    user = db.query(User).filter(User.username == "legacy").first()
+    db.close()
+    assert user.hashed_password.startswith("$pbkdf2-sha256$")
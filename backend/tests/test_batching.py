@@ -0,0 +1,94 @@
+"""
+微批处理测试
+"""
+import sys
+import types
+import asyncio
+from contextlib import contextmanager
+import pytest
+from app.core.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_batches_by_size_and_scatters_results():
+    """测试凑满批量立即执行，结果按提交顺序分发"""
+    calls = []
+
+    async def square_batch(items):
+        calls.append(list(items))
+        return [x * x for x in items]
+
+    batcher = MicroBatcher(square_batch, max_batch_size=4, max_wait_ms=1000)
+    results = await asyncio.wait_for(asyncio.gather(*[batcher.submit(i) for i in range(8)]), timeout=1)
+
+    assert results == [i * i for i in range(8)]
+    assert calls == [[0, 1, 2, 3], [4, 5, 6, 7]]
+    assert batcher.stats()["avg_batch_size"] == 4
+
+
+@pytest.mark.asyncio
+async def test_flushes_partial_batch_after_wait():
+    """测试不足一批时等待max_wait_ms后执行"""
+    async def echo_batch(items):
+        return list(items)
+
+    batcher = MicroBatcher(echo_batch, max_batch_size=16, max_wait_ms=20)
+    assert await asyncio.gather(batcher.submit("a"), batcher.submit("b")) == ["a", "b"]
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["avg_wait_ms"] >= 10
+
+
+@pytest.mark.asyncio
+async def test_batch_error_propagates_to_all_items():
+    """测试批处理异常传递给同批所有请求"""
+    async def failing_batch(items):
+        raise RuntimeError("boom")
+
+    batcher = MicroBatcher(failing_batch, max_batch_size=2, max_wait_ms=5)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_clip_overlong_text_fails_only_its_request(monkeypatch, tmp_path):
+    """测试同批中一个请求的候选文本超过CLIP上下文长度时，只有该请求返回错误"""
+    torch = pytest.importorskip("torch")
+    Image = pytest.importorskip("PIL.Image")
+    from app.core.model_manager import model_manager
+    from app.services.clip_service import CLIPService
+
+    def tokenize(texts, context_length=77):
+        # 与clip.tokenize一致：文本超过上下文长度时抛出RuntimeError
+        rows = []
+        for text in texts:
+            if len(text) > context_length:
+                raise RuntimeError(f"Input {text} is too long for context length {context_length}")
+            rows.append([ord(c) for c in text] + [0] * (context_length - len(text)))
+        return torch.tensor(rows)
+
+    class FakeModel:
+        def encode_image(self, images):
+            return images.flatten(1)[:, :4].float() + 1
+
+        def encode_text(self, tokens):
+            return tokens[:, :4].float() + 1
+
+    @contextmanager
+    def use_model(name):
+        yield {"model": FakeModel(), "preprocess": lambda image: torch.ones(3, 2, 2), "device": "cpu"}
+
+    service = CLIPService()
+    service.clip_available = True
+    monkeypatch.setitem(sys.modules, "clip", types.SimpleNamespace(tokenize=tokenize))
+    monkeypatch.setattr(model_manager, "use_model", use_model)
+    image_path = tmp_path / "frame.png"
+    Image.new("RGB", (4, 4)).save(image_path)
+
+    results = service.match_image_text_batch([
+        (str(image_path), ["远景", "特写"]),
+        (str(image_path), ["一个非常长的镜头描述" * 10]),
+    ])
+
+    assert results[0]["success"] is True
+    assert {m["text"] for m in results[0]["matches"]} == {"远景", "特写"}
+    assert "too long" in results[1]["error"]
@@ -0,0 +1,273 @@
+"""
+缓存服务测试
+"""
+import time
+import asyncio
+import pytest
+from app.core.cache import MemoryCache, CacheService, cache_service, cached, jittered_ttl
+from app.core.cache_codec import CacheCodec
+
+
+def test_memory_cache_lru_eviction():
+    """测试按条目数LRU淘汰"""
+    cache = MemoryCache(max_entries=2, sweep_interval=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # 访问a，使b成为最久未使用
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_byte_budget():
+    """测试按字节数淘汰"""
+    cache = MemoryCache(max_entries=100, max_bytes=200, sweep_interval=0)
+    cache.set("k1", "x" * 80)
+    cache.set("k2", "y" * 80)
+    cache.set("k3", "z" * 80)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 200
+    assert cache.get("k1") is None
+    assert cache.get("k3") == "z" * 80
+
+    # 超过总预算的单个值不缓存
+    cache.set("huge", "h" * 500)
+    assert cache.get("huge") is None
+
+
+def test_memory_cache_expiry_and_stats():
+    """测试过期清理与统计"""
+    cache = MemoryCache(sweep_interval=0)
+    cache.set("short", {"v": 1}, ttl=0)
+    cache.set("long", {"v": 2}, ttl=60)
+
+    assert cache.cleanup_expired() == 1
+    assert cache.get("short") is None
+    assert cache.get("long") == {"v": 2}
+
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_memory_cache_background_sweeper():
+    """测试后台清理线程"""
+    cache = MemoryCache(sweep_interval=0.05)
+    try:
+        cache.set("tmp", 1, ttl=0)
+        deadline = time.time() + 2
+        while len(cache) and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(cache) == 0
+        assert cache.stats()["bytes"] == 0
+    finally:
+        cache.stop()
+
+
+def test_memory_cache_clear_pattern():
+    """测试按模式清除"""
+    cache = MemoryCache(sweep_interval=0)
+    cache.set("course:1", 1)
+    cache.set("course:2", 2)
+    cache.set("project:1", 3)
+
+    assert cache.clear("course:*") == 2
+    assert cache.get("project:1") == 3
+    cache.clear()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_cached_single_flight():
+    """测试并发请求只执行一次被装饰函数"""
+    calls = 0
+
+    @cached("test_single_flight", ttl=60)
+    async def slow_square(x):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return x * x
+
+    cache_service.clear("test_single_flight:*")
+    results = await asyncio.gather(*[slow_square(7) for _ in range(10)])
+    assert results == [49] * 10
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_stale_while_revalidate():
+    """测试过期后返回旧值并后台刷新"""
+    calls = 0
+
+    @cached("test_swr", ttl=1, stale_ttl=60, jitter=0)
+    async def counter():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    cache_service.clear("test_swr:*")
+    assert await counter() == 1
+
+    # 将缓存条目标记为已过期
+    key = cache_service._make_key("test_swr")
+    entry = cache_service.get(key)
+    entry["fresh_until"] = time.time() - 1
+    cache_service.set(key, entry, 60)
+
+    assert await counter() == 1
+    await asyncio.sleep(0.01)
+    assert calls == 2
+    assert await counter() == 2
+
+
+def test_jittered_ttl():
+    """测试TTL抖动范围"""
+    values = {jittered_ttl(1000, 0.1) for _ in range(50)}
+    assert all(900 <= v <= 1000 for v in values)
+    assert jittered_ttl(1000, 0) == 1000
+
+
+@pytest.fixture
+def fake_redis_cache():
+    """基于fakeredis的缓存服务"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    service = CacheService(
+        redis_client=fakeredis.FakeRedis(server=server, decode_responses=False),
+        async_redis_client=fakeredis.FakeAsyncRedis(server=server, decode_responses=False)
+    )
+    yield service
+    service.close()
+
+
+def test_redis_sync_many(fake_redis_cache):
+    """测试同步批量读写"""
+    fake_redis_cache.set_many({"a": {"x": 1}, "b": [1, 2]}, ttl=60)
+    assert fake_redis_cache.get_many(["a", "b", "missing"]) == {"a": {"x": 1}, "b": [1, 2]}
+    assert fake_redis_cache.redis_client.ttl("a") > 0
+
+
+@pytest.mark.asyncio
+async def test_redis_async_api(fake_redis_cache):
+    """测试异步接口与同步接口共享数据"""
+    await fake_redis_cache.aset("k", {"v": 1}, ttl=60)
+    assert fake_redis_cache.get("k") == {"v": 1}
+    assert await fake_redis_cache.aget("k") == {"v": 1}
+
+    await fake_redis_cache.aset_many({"m1": 1, "m2": 2}, ttl=60)
+    assert await fake_redis_cache.aget_many(["m1", "m2", "m3"]) == {"m1": 1, "m2": 2}
+
+    await fake_redis_cache.adelete("k")
+    assert await fake_redis_cache.aget("k") is None
+
+
+def test_l1_cross_worker_invalidation():
+    """测试两级缓存：一个worker写入后，其他worker的L1被失效"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = CacheService(redis_client=fakeredis.FakeRedis(server=server, decode_responses=False))
+    worker_b = CacheService(redis_client=fakeredis.FakeRedis(server=server, decode_responses=False))
+    try:
+        worker_a.set("courses:list", ["v1"], ttl=60)
+        assert worker_b.get("courses:list") == ["v1"]
+        assert "courses:list" in worker_b.l1_cache
+
+        # 等待订阅线程就绪后再更新
+        time.sleep(0.2)
+        worker_a.set("courses:list", ["v2"], ttl=60)
+        deadline = time.time() + 3
+        while "courses:list" in worker_b.l1_cache and time.time() < deadline:
+            time.sleep(0.02)
+        assert worker_b.get("courses:list") == ["v2"]
+
+        worker_a.delete("courses:list")
+        deadline = time.time() + 3
+        while "courses:list" in worker_b.l1_cache and time.time() < deadline:
+            time.sleep(0.02)
+        assert worker_b.get("courses:list") is None
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_codec_roundtrip_and_compression():
+    """测试编解码往返与大值压缩"""
+    codec = CacheCodec(compression="zlib", compression_threshold=64)
+    small = {"a": 1, "b": "短文本"}
+    large = {"scenes": [{"title": f"内景 {i}", "dialogue": ["台词"] * 20} for i in range(50)]}
+
+    assert codec.decode(codec.encode(small)) == small
+    encoded = codec.encode(large)
+    assert encoded[2:3] == b"z"
+    assert codec.decode(encoded) == large
+
+    stats = codec.stats()
+    assert stats["compressed_count"] == 1
+    assert stats["bytes_saved"] > 0
+
+
+def test_codec_reads_legacy_json():
+    """测试读取旧版本写入的JSON字符串"""
+    codec = CacheCodec()
+    assert codec.decode('{"v": [1, 2]}') == {"v": [1, 2]}
+    assert codec.decode(b'{"v": [1, 2]}') == {"v": [1, 2]}
+
+
+def test_redis_legacy_entry_readable(fake_redis_cache):
+    """测试Redis中的旧JSON条目仍可读取"""
+    fake_redis_cache.redis_client.set("legacy", '{"old": true}')
+    assert fake_redis_cache.get("legacy") == {"old": True}
+
+
+def test_memory_cache_invalidate_tag():
+    """测试内存缓存按标签失效"""
+    cache = MemoryCache(sweep_interval=0)
+    cache.set("project:42:scripts", [1], tags=["project:42"])
+    cache.set("project:42:storyboards", [2], tags=["project:42"])
+    cache.set("project:7:scripts", [3], tags=["project:7"])
+
+    assert cache.invalidate_tag("project:42") == 2
+    assert cache.get("project:42:scripts") is None
+    assert cache.get("project:7:scripts") == [3]
+    assert cache.invalidate_tag("project:42") == 0
+
+
+def test_redis_invalidate_tag_and_scan_clear(fake_redis_cache):
+    """测试Redis按标签失效与SCAN清除"""
+    fake_redis_cache.set("project:42:scripts", [1], ttl=60, tags=["project:42"])
+    fake_redis_cache.set_many({"kb:a": 1, "kb:b": 2}, ttl=60, tags=["kb"])
+    fake_redis_cache.set("other", 3, ttl=60)
+
+    assert fake_redis_cache.invalidate_tag("kb") == 2
+    assert fake_redis_cache.get_many(["kb:a", "kb:b"]) == {}
+    assert not fake_redis_cache.redis_client.exists("cache:tag:kb")
+    assert fake_redis_cache.get("project:42:scripts") == [1]
+
+    fake_redis_cache.clear("project:*")
+    assert fake_redis_cache.get("project:42:scripts") is None
+    assert fake_redis_cache.get("other") == 3
+
+
+@pytest.mark.asyncio
+async def test_cached_tags(fake_redis_cache, monkeypatch):
+    """测试@cached写入标签后可按标签失效"""
+    monkeypatch.setattr("app.core.cache.cache_service", fake_redis_cache)
+    calls = 0
+
+    @cached("course_list", ttl=60, tags=lambda course_id: [f"course:{course_id}"])
+    async def load(course_id):
+        nonlocal calls
+        calls += 1
+        return {"course": course_id, "version": calls}
+
+    assert (await load(7))["version"] == 1
+    assert (await load(7))["version"] == 1
+    assert await fake_redis_cache.ainvalidate_tag("course:7") == 1
+    assert (await load(7))["version"] == 2
@@ -0,0 +1,105 @@
+"""
+对话记忆（滑动窗口 + 滚动摘要）测试
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import Base, engine, SessionLocal
+from app.core.security import get_password_hash, create_access_token
+from app.models.user import User
+from app.models.chat import Conversation
+from app.services.ai_service import ai_service
+from app.services.chat_memory_service import ChatMemoryService, chat_memory_service, estimate_tokens
+from main import app
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    """每个测试前重置数据库"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def headers():
+    db = SessionLocal()
+    db.add(User(
+        username="student",
+        email="student@example.com",
+        hashed_password=get_password_hash("password"),
+        role="student"
+    ))
+    db.commit()
+    db.close()
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'student', 'role': 'student'})}"}
+
+def make_service(max_turns=2, budget=1000, summary_tokens=100):
+    service = ChatMemoryService()
+    service.max_turns = max_turns
+    service.token_budget = budget
+    service.summary_max_tokens = summary_tokens
+    return service
+
+def test_split_window_keeps_last_turns():
+    """测试最近K轮原样保留，更早的消息进入摘要"""
+    service = make_service(max_turns=2)
+    messages = []
+    for i in range(4):
+        messages += [{"role": "user", "content": f"问题{i}"}, {"role": "assistant", "content": f"回答{i}"}]
+    older, recent = service.split_window(messages)
+    assert [m["content"] for m in recent] == ["问题2", "回答2", "问题3", "回答3"]
+    assert len(older) == 4
+
+def test_split_window_respects_token_budget():
+    """测试超出token预算时窗口缩小，但最后一条消息始终保留"""
+    service = make_service(max_turns=10, budget=50)
+    messages = [
+        {"role": "user", "content": "镜" * 40},
+        {"role": "assistant", "content": "头" * 40},
+        {"role": "user", "content": "构图" * 100},
+    ]
+    older, recent = service.split_window(messages)
+    assert recent == messages[-1:]
+    assert older == messages[:2]
+
+def test_extractive_summary_bounded():
+    """测试摘录方式的摘要不超过长度上限并保留最新内容"""
+    service = make_service(summary_tokens=60)
+    summary = None
+    for i in range(20):
+        summary = service._extractive_summary(summary, [{"role": "user", "content": f"第{i}个问题：三分法构图"}])
+    assert estimate_tokens(summary) <= 60
+    assert "第19个问题" in summary
+
+def test_prompt_bounded_and_summary_stored(headers, monkeypatch):
+    """测试长对话中发给大模型的消息数不随历史增长，旧消息进入会话摘要"""
+    prompts = []
+
+    async def fake_completion(messages, **kwargs):
+        prompts.append(messages)
+        return ai_service._mock_response(messages[-1]["content"])
+
+    monkeypatch.setattr(ai_service, "chat_completion", fake_completion)
+    monkeypatch.setattr(ai_service, "is_llm_available", lambda: False)
+    monkeypatch.setattr(chat_memory_service, "max_turns", 2)
+
+    conversation_id = None
+    for i in range(6):
+        response = client.post(
+            "/api/chat",
+            json={"message": f"第{i}个问题", "conversation_id": conversation_id},
+            headers=headers
+        )
+        assert response.status_code == 200
+        conversation_id = response.json()["conversation_id"]
+
+    # 系统提示词 + 最近2轮（最后一轮只有问题）
+    assert [len(p) for p in prompts] == [2, 4, 4, 4, 4, 4]
+    assert prompts[-1][-1] == {"role": "user", "content": "第5个问题"}
+    assert "第0个问题" in prompts[-1][0]["content"]
+
+    db = SessionLocal()
+    conversation = db.query(Conversation).filter(Conversation.session_id == conversation_id).first()
+    assert "第3个问题" in conversation.summary
+    assert "第4个问题" not in conversation.summary
+    db.close()
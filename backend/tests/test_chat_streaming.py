@@ -0,0 +1,251 @@
+"""
+流式对话测试
+"""
+import json
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import Base, engine, SessionLocal
+from app.core.security import get_password_hash, create_access_token
+from app.core.stream_coalescer import FrameCoalescer
+from app.services import dashscope_service as dashscope_module
+from app.services.ai_service import ai_service
+from app.services.message_store import message_store
+from app.models.chat import Message
+from app.models.user import User
+from app.api.chat import manager, sse_chat_events
+from main import app
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    """每个测试前重置数据库"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+def sse_body(deltas, error=None):
+    """按DashScope的SSE格式构造响应体"""
+    lines = []
+    for i, delta in enumerate(deltas):
+        data = {"output": {"choices": [{"message": {"role": "assistant", "content": delta}}]}}
+        lines += [f"id:{i + 1}", "event:result", f"data:{json.dumps(data, ensure_ascii=False)}", ""]
+    if error:
+        lines += ["event:error", f"data:{json.dumps({'code': error, 'message': '限流'})}", ""]
+    return "\n".join(lines).encode("utf-8")
+
+@pytest.fixture
+def dashscope(monkeypatch):
+    """DashScope服务实例，HTTP请求由测试提供的处理函数响应"""
+    requests = []
+    responses = {}
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, content=responses["body"], headers={"content-type": "text/event-stream"})
+
+    class MockClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(dashscope_module.httpx, "AsyncClient", MockClient)
+    service = dashscope_module.DashScopeService()
+    service.api_key = "sk-test"
+    return service, requests, responses
+
+@pytest.mark.asyncio
+async def test_dashscope_streams_incremental_deltas(dashscope):
+    """测试按SSE事件返回增量，而不是等待完整回复后逐字符返回"""
+    service, requests, responses = dashscope
+    responses["body"] = sse_body(["三分法构图", "是把画面", "横竖各分三等份。"])
+
+    chunks = [c async for c in service.stream_chat_completion([{"role": "user", "content": "什么是三分法构图"}])]
+
+    assert chunks == ["三分法构图", "是把画面", "横竖各分三等份。"]
+    request = requests[0]
+    assert request.headers["X-DashScope-SSE"] == "enable"
+    assert json.loads(request.content)["parameters"]["incremental_output"] is True
+
+@pytest.mark.asyncio
+async def test_dashscope_stream_error_event_raises(dashscope):
+    """测试SSE错误事件抛出异常（调用方据此切换模型或提示中断）"""
+    service, _, responses = dashscope
+    responses["body"] = sse_body([], error="Throttling")
+
+    with pytest.raises(Exception, match="Throttling"):
+        async for _ in service.stream_chat_completion([{"role": "user", "content": "你好"}]):
+            pass
+
+def test_websocket_end_frame_reports_metrics(monkeypatch):
+    """测试WebSocket回复结束时返回首字延迟和生成速度"""
+    async def fake_stream(messages, temperature=0.7):
+        for chunk in ["180度", "轴线规则"]:
+            yield chunk
+
+    monkeypatch.setattr(ai_service, "stream_chat_completion", fake_stream)
+
+    with client.websocket_connect("/api/chat/ws") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        websocket.send_text(json.dumps({"message": "什么是180度规则"}))
+        frames = []
+        while not frames or frames[-1]["type"] != "end":
+            frames.append(websocket.receive_json())
+
+    assert "".join(f["content"] for f in frames if f["type"] == "chunk") == "180度轴线规则"
+    metrics = frames[-1]["metrics"]
+    assert metrics["ttft_ms"] >= 0
+    assert metrics["tokens"] > 0
+
+@pytest.mark.asyncio
+async def test_coalescer_flushes_by_size_and_on_close():
+    """测试缓冲区达到字节上限时合并发送，结束时发送剩余内容"""
+    frames = []
+
+    async def send(content):
+        frames.append(content)
+
+    coalescer = FrameCoalescer(send, interval_ms=10_000, max_bytes=6)
+    for char in "构图abcd":
+        await coalescer.push(char)
+    await coalescer.close()
+
+    # "构图"各占3字节，达到6字节时发送
+    assert frames == ["构图", "abcd"]
+    assert coalescer.deltas == 6
+
+@pytest.mark.asyncio
+async def test_coalescer_flushes_on_timer_when_stream_stalls():
+    """测试模型停顿时，缓冲的内容在合并间隔后发送而不是等到下一个增量"""
+    frames = []
+
+    async def send(content):
+        frames.append(content)
+
+    coalescer = FrameCoalescer(send, interval_ms=20, max_bytes=1024)
+    await coalescer.push("镜")
+    await coalescer.push("头")
+    assert frames == []
+    await asyncio.sleep(0.06)
+    assert frames == ["镜头"]
+    await coalescer.close()
+    assert frames == ["镜头"]
+
+def test_websocket_binary_frames(monkeypatch):
+    """测试 ?frames=binary 时增量以UTF-8二进制帧发送，控制消息仍为JSON"""
+    async def fake_stream(messages, temperature=0.7):
+        for char in "景别与角度":
+            yield char
+
+    monkeypatch.setattr(ai_service, "stream_chat_completion", fake_stream)
+
+    with client.websocket_connect("/api/chat/ws?frames=binary") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        websocket.send_text(json.dumps({"message": "景别有哪些"}))
+        assert websocket.receive_json()["type"] == "start"
+        content = websocket.receive_bytes().decode("utf-8")
+        end = websocket.receive_json()
+
+    # 5个增量在合并间隔内到达，合并为一帧
+    assert content == "景别与角度"
+    assert end["type"] == "end"
+    assert end["metrics"]["frames"] == 1
+
+def test_websocket_failed_turn_keeps_connection(monkeypatch):
+    """测试一轮回复中途失败时只结束这一轮：发送错误帧，连接继续处理下一条消息，断开后移出连接列表"""
+    async def fake_stream(messages, temperature=0.7):
+        yield "蒙太奇"
+        if messages[-1]["content"] == "第一问":
+            raise RuntimeError("upstream reset")
+        yield "是剪辑"
+
+    monkeypatch.setattr(ai_service, "stream_chat_completion", fake_stream)
+
+    with client.websocket_connect("/api/chat/ws") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        websocket.send_text(json.dumps({"message": "第一问"}))
+        frames = []
+        while not frames or frames[-1]["type"] not in ("end", "error"):
+            frames.append(websocket.receive_json())
+        assert frames[-1] == {"type": "error", "message": "upstream reset"}
+
+        websocket.send_text(json.dumps({"message": "第二问"}))
+        frames = []
+        while not frames or frames[-1]["type"] not in ("end", "error"):
+            frames.append(websocket.receive_json())
+        assert frames[-1]["type"] == "end"
+        assert "".join(f["content"] for f in frames if f["type"] == "chunk") == "蒙太奇是剪辑"
+
+    assert manager.active_connections == []
+    db = SessionLocal()
+    replies = [(m.content, m.message_metadata) for m in db.query(Message).filter(Message.role == "assistant").order_by(Message.id)]
+    db.close()
+    assert replies == [("蒙太奇", {"interrupted": True}), ("蒙太奇是剪辑", None)]
+
+def parse_sse(body: str):
+    """把SSE响应体解析为 [(事件名, 数据)]"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_sse_chat_streams_deltas_and_persists(monkeypatch):
+    """测试stream=true时返回SSE事件流，结束事件包含TTFT，消息写入数据库"""
+    db = SessionLocal()
+    db.add(User(username="student", email="s@example.com", hashed_password=get_password_hash("password"), role="student"))
+    db.commit()
+    db.close()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'student', 'role': 'student'})}"}
+
+    async def fake_stream(messages, temperature=0.7):
+        for chunk in ["正反打", "是对话场景", "的常用拍法"]:
+            yield chunk
+
+    monkeypatch.setattr(ai_service, "stream_chat_completion", fake_stream)
+
+    response = client.post("/api/chat", json={"message": "什么是正反打", "stream": True}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[0][0] == "start"
+    assert "".join(data["content"] for name, data in events if name == "chunk") == "正反打是对话场景的常用拍法"
+    assert events[-1][0] == "end"
+    assert events[-1][1]["metrics"]["ttft_ms"] >= 0
+
+    db = SessionLocal()
+    assert [(m.role, m.content) for m in db.query(Message).order_by(Message.id)] == [
+        ("user", "什么是正反打"), ("assistant", "正反打是对话场景的常用拍法")
+    ]
+    db.close()
+
+@pytest.mark.asyncio
+async def test_sse_disconnect_cancels_upstream_and_keeps_partial_reply(monkeypatch):
+    """测试客户端断开时取消上游大模型请求，并保存已生成的部分回复"""
+    upstream = {"cancelled": False}
+
+    async def slow_stream(messages, temperature=0.7):
+        try:
+            yield "长镜头"
+            await asyncio.sleep(30)
+            yield "不会发送"
+        except asyncio.CancelledError:
+            upstream["cancelled"] = True
+            raise
+
+    monkeypatch.setattr(ai_service, "stream_chat_completion", slow_stream)
+
+    events = sse_chat_events(1, "session-1", [{"role": "user", "content": "什么是长镜头"}])
+    assert (await events.__anext__()).startswith("event: start")
+    assert "长镜头" in await events.__anext__()
+    # 模拟客户端断开：响应被取消，生成器关闭
+    await events.aclose()
+    await message_store.flush()
+
+    assert upstream["cancelled"]
+    db = SessionLocal()
+    message = db.query(Message).one()
+    assert (message.role, message.content, message.message_metadata) == ("assistant", "长镜头", {"interrupted": True})
+    db.close()
@@ -2,10 +2,13 @@
 课程管理API测试
 """
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
-from app.core.database import Base, engine, SessionLocal
+from sqlalchemy import event
+from app.core.database import Base, engine, async_engine, SessionLocal
 from app.models.user import User
-from app.models.course import Course
+from app.models.course import Course, CourseEnrollment
+from app.models.project import Project
 from app.core.security import get_password_hash, create_access_token
 from main import app
 
@@ -106,14 +109,85 @@ def test_list_courses(teacher_user):
     assert len(data) == 1
     assert data[0]["name"] == "测试课程"
 
+@contextmanager
+def count_queries():
+    """统计同步与异步引擎执行的SQL语句数"""
+    statements = []
+    
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    engines = [engine, async_engine.sync_engine]
+    for target in engines:
+        event.listen(target, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", _record)
+
+def add_students(course_id: int, count: int, start: int = 0):
+    """批量创建学生，加入课程并各自创建一个项目"""
+    db = SessionLocal()
+    for i in range(start, start + count):
+        student = User(
+            username=f"student{i}",
+            email=f"student{i}@example.com",
+            hashed_password="x",
+            role="student"
+        )
+        db.add(student)
+        db.flush()
+        db.add(CourseEnrollment(course_id=course_id, student_id=student.id))
+        db.add(Project(name=f"项目{i}", course_id=course_id, owner_id=student.id))
+    db.commit()
+    db.close()
 
-
-
-
-
-
-
-
-
-
-
+def test_course_roster_query_count_is_constant(teacher_user):
+    """测试学生名单和学生项目接口的查询次数不随学生数增长"""
+    db = SessionLocal()
+    course = Course(name="测试课程", teacher_id=teacher_user.id)
+    db.add(course)
+    db.commit()
+    course_id = course.id
+    db.close()
+    headers = get_auth_headers(teacher_user)
+    # 先请求一次，使认证用户进入principal缓存，后续测量只包含接口自身的查询
+    client.get("/api/auth/me", headers=headers)
+    
+    def measure(path: str):
+        with count_queries() as statements:
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        return len(statements), response.json()
+    
+    add_students(course_id, 2)
+    small_students = measure(f"/api/courses/{course_id}/students")
+    small_projects = measure(f"/api/courses/{course_id}/student-projects")
+    
+    add_students(course_id, 30, start=2)
+    large_students = measure(f"/api/courses/{course_id}/students")
+    large_projects = measure(f"/api/courses/{course_id}/student-projects")
+    
+    assert len(large_students[1]) == 32
+    assert len(large_projects[1]) == 32
+    assert large_projects[1][0]["owner"]["username"] == "student0"
+    assert large_students[0] == small_students[0]
+    assert large_projects[0] == small_projects[0]
+
+def test_student_list_courses_single_query(student_user, teacher_user):
+    """测试学生课程列表只执行一次课程查询"""
+    db = SessionLocal()
+    courses = [Course(name=f"课程{i}", teacher_id=teacher_user.id) for i in range(5)]
+    db.add_all(courses)
+    db.flush()
+    for course in courses[:3]:
+        db.add(CourseEnrollment(course_id=course.id, student_id=student_user.id))
+    db.commit()
+    db.close()
+    
+    with count_queries() as statements:
+        response = client.get("/api/courses/", headers=get_auth_headers(student_user))
+    assert response.status_code == 200
+    assert sorted(c["name"] for c in response.json()) == ["课程0", "课程1", "课程2"]
+    assert len([s for s in statements if "FROM courses" in s]) == 1
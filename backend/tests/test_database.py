@@ -0,0 +1,32 @@
+"""
+数据库配置测试
+"""
+from sqlalchemy import create_engine
+from app.core.database import to_async_url, engine_options, install_sqlite_pragmas
+
+
+def test_to_async_url():
+    """测试同步URL转换为异步驱动URL"""
+    assert to_async_url("sqlite:///./film_education.db") == "sqlite+aiosqlite:///./film_education.db"
+    assert to_async_url("postgresql://u:p@db/film") == "postgresql+asyncpg://u:p@db/film"
+    assert to_async_url("postgresql+asyncpg://u:p@db/film") == "postgresql+asyncpg://u:p@db/film"
+
+
+def test_engine_options_only_for_server_databases():
+    """测试只有服务端数据库使用显式连接池参数"""
+    assert engine_options("sqlite:///./film_education.db") == {}
+    options = engine_options("postgresql://u:p@db/film")
+    assert options["pool_pre_ping"] is True
+    assert options["pool_size"] > 0
+
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """测试新连接启用WAL等PRAGMA"""
+    url = f"sqlite:///{tmp_path / 'pragma.db'}"
+    engine = create_engine(url)
+    install_sqlite_pragmas(engine, url)
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+    engine.dispose()
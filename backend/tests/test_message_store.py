@@ -0,0 +1,97 @@
+"""
+聊天消息延迟批量写入测试
+"""
+import json
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import Base, engine, SessionLocal
+from app.models.chat import Conversation, Message
+from app.services.ai_service import ai_service
+from app.services.chat_memory_service import chat_memory_service
+from app.services.message_store import MessageStore
+from main import app
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    """每个测试前重置数据库"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+def stored_messages():
+    db = SessionLocal()
+    messages = [(m.conversation_id, m.role, m.content) for m in db.query(Message).order_by(Message.id)]
+    db.close()
+    return messages
+
+@pytest.mark.asyncio
+async def test_flush_writes_in_batches():
+    """测试flush按批次写入全部消息，Future得到消息ID"""
+    store = MessageStore()
+    store.batch_size = 2
+    store.interval = 60
+    futures = [await store.add(1, "user", f"问题{i}") for i in range(5)]
+
+    await store.flush()
+
+    assert [await f for f in futures] == [1, 2, 3, 4, 5]
+    assert store.stats()["batches"] == 3
+    assert [content for _, _, content in stored_messages()] == [f"问题{i}" for i in range(5)]
+
+@pytest.mark.asyncio
+async def test_background_flush_after_interval():
+    """测试未达到批次大小时，消息在写入间隔后由后台任务写入"""
+    store = MessageStore()
+    store.interval = 0.02
+    future = await store.add(1, "user", "什么是蒙太奇")
+
+    assert stored_messages() == []
+    assert await asyncio.wait_for(future, timeout=2) == 1
+    assert stored_messages() == [(1, "user", "什么是蒙太奇")]
+
+@pytest.mark.asyncio
+async def test_flush_one_conversation_leaves_others_queued():
+    """测试按会话flush只写入该会话的消息，其他会话的消息留在队列中"""
+    store = MessageStore()
+    store.interval = 60
+    await store.add(1, "user", "会话1的问题")
+    await store.add(2, "user", "会话2的问题")
+    future = await store.add(1, "assistant", "会话1的回答")
+
+    await store.flush(1)
+
+    assert await future == 2
+    assert stored_messages() == [(1, "user", "会话1的问题"), (1, "assistant", "会话1的回答")]
+    assert store.stats()["pending"] == 1
+    await store.close()
+    assert stored_messages()[-1] == (2, "user", "会话2的问题")
+
+def test_websocket_messages_persisted_on_disconnect(monkeypatch):
+    """测试WebSocket断开后消息全部写入，移出窗口的消息进入摘要"""
+    async def fake_stream(messages, temperature=0.7):
+        yield f"回答：{messages[-1]['content']}"
+
+    monkeypatch.setattr(ai_service, "stream_chat_completion", fake_stream)
+    monkeypatch.setattr(ai_service, "is_llm_available", lambda: False)
+    monkeypatch.setattr(chat_memory_service, "max_turns", 1)
+
+    with client.websocket_connect("/api/chat/ws") as websocket:
+        assert websocket.receive_json()["type"] == "session"
+        for i in range(3):
+            websocket.send_text(json.dumps({"message": f"问题{i}"}))
+            while websocket.receive_json()["type"] != "end":
+                pass
+
+    assert [(role, content) for _, role, content in stored_messages()] == [
+        ("user", "问题0"), ("assistant", "回答：问题0"),
+        ("user", "问题1"), ("assistant", "回答：问题1"),
+        ("user", "问题2"), ("assistant", "回答：问题2"),
+    ]
+    db = SessionLocal()
+    conversation = db.query(Conversation).one()
+    assert "问题1" in conversation.summary
+    assert conversation.summary_message_id == 4
+    db.close()
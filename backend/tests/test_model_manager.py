@@ -0,0 +1,84 @@
+"""
+模型管理器测试
+"""
+from app.core.model_manager import ModelManager
+
+MB = 1024 * 1024
+
+
+def make_loader(size_mb: int):
+    """返回占用约size_mb内存的假模型"""
+    def loader():
+        return b"x" * (size_mb * MB)
+    return loader
+
+
+def test_lru_eviction_under_budget():
+    """测试超出内存预算时卸载最久未使用的模型"""
+    manager = ModelManager(memory_budget_bytes=50 * MB)
+    for name in ("clip", "whisper", "xtts"):
+        manager.register_model(name, make_loader(20), {"size_mb": 20})
+
+    assert manager.get_model("clip") is not None
+    assert manager.get_model("whisper") is not None
+    manager.get_model("clip")  # clip最近使用
+    assert manager.get_model("xtts") is not None
+
+    assert "whisper" not in manager.models
+    assert set(manager.models) == {"clip", "xtts"}
+    assert manager.resident_bytes() <= 50 * MB
+    assert manager.memory_status()["evictions"] == 1
+
+
+def test_pinned_and_in_use_models_not_evicted():
+    """测试固定模型和正在使用的模型不会被卸载"""
+    manager = ModelManager(memory_budget_bytes=50 * MB)
+    manager.register_model("clip", make_loader(20), {"size_mb": 20, "pinned": True})
+    manager.register_model("whisper", make_loader(20), {"size_mb": 20})
+    manager.register_model("musicgen", make_loader(20), {"size_mb": 20})
+
+    manager.get_model("clip")
+    with manager.use_model("whisper") as model:
+        assert model is not None
+        manager.get_model("musicgen")
+        # clip已固定、whisper正在使用，只能超出预算
+        assert set(manager.models) == {"clip", "whisper", "musicgen"}
+
+    manager.unpin_model("clip")
+    assert "clip" not in manager.models
+
+
+def test_model_info_records_residency():
+    """测试模型信息包含内存占用与加载耗时"""
+    manager = ModelManager(memory_budget_bytes=0)
+    manager.register_model("clip", make_loader(10), {"size_mb": 10})
+    manager.get_model("clip")
+
+    info = manager.get_model_info("clip")
+    assert info["loaded"] is True
+    assert info["size_mb"] >= 5
+    assert info["load_time"] is not None
+    assert info["last_used"] is not None
+
+    manager.unload_model("clip")
+    assert manager.get_model_info("clip")["loaded"] is False
+
+
+def test_warmup_policies(monkeypatch):
+    """测试eager/background/lazy预热策略与就绪状态"""
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "MODEL_WARMUP_POLICIES", "whisper=lazy")
+
+    manager = ModelManager(memory_budget_bytes=0)
+    manager.register_model("clip", make_loader(1), {"warmup": "eager"})
+    manager.register_model("tts", make_loader(1), {"warmup": "background"})
+    manager.register_model("whisper", make_loader(1), {"warmup": "background"})
+
+    manager.start_warmup()
+    assert "clip" in manager.models
+    manager._warmup_thread.join(timeout=5)
+
+    status = manager.warmup_status()
+    assert status["ready"] is True
+    assert status["models"] == {"clip": "ready", "tts": "ready", "whisper": "lazy"}
+    assert "whisper" not in manager.models
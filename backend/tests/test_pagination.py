@@ -0,0 +1,112 @@
+"""
+键集分页测试
+"""
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import Base, engine, SessionLocal
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.security import get_password_hash, create_access_token
+from app.models.user import User
+from app.models.course import Course
+from app.models.project import Project, Storyboard
+from main import app
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    """每个测试前重置数据库"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def project_with_storyboards():
+    """创建一个包含7个分镜的项目（顺序值有重复，用id区分先后）"""
+    db = SessionLocal()
+    teacher = User(
+        username="teacher",
+        email="teacher@example.com",
+        hashed_password=get_password_hash("password"),
+        role="teacher"
+    )
+    db.add(teacher)
+    db.flush()
+    course = Course(name="电影导论", teacher_id=teacher.id)
+    db.add(course)
+    db.flush()
+    project = Project(name="短片", course_id=course.id, owner_id=teacher.id)
+    db.add(project)
+    db.flush()
+    db.add_all([
+        Storyboard(project_id=project.id, scene_number=i, description=f"镜头{i}", order=i // 2)
+        for i in range(7)
+    ])
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': teacher.username, 'role': 'teacher'})}"}
+    project_id = project.id
+    db.close()
+    return project_id, headers
+
+def test_cursor_roundtrip():
+    """测试游标编码与解析"""
+    assert decode_cursor(encode_cursor([3, 42]), 2) == [3, 42]
+
+def test_storyboards_follow_cursor_to_last_page(project_with_storyboards):
+    """测试按游标翻页能不重复、不遗漏地取完全部分镜"""
+    project_id, headers = project_with_storyboards
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3, "include_total": pages == 0}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/projects/{project_id}/storyboards", params=params, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        if pages == 0:
+            assert data["total"] == 7
+        else:
+            assert data["total"] is None
+        seen.extend(sb["scene_number"] for sb in data["items"])
+        pages += 1
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == list(range(7))
+    assert pages == 3
+
+def test_storyboards_with_null_order_not_skipped(project_with_storyboards):
+    """测试顺序为空的分镜按顺序0参与排序，翻页时不被跳过"""
+    project_id, headers = project_with_storyboards
+    db = SessionLocal()
+    db.add_all([
+        Storyboard(project_id=project_id, scene_number=7, description="未排序"),
+        Storyboard(project_id=project_id, scene_number=8, description="未排序"),
+    ])
+    db.commit()
+    # 列默认值为0，插入后再置空（旧数据或直接写库的行）
+    db.query(Storyboard).filter(Storyboard.scene_number >= 7).update({Storyboard.order: None})
+    db.commit()
+    assert db.query(Storyboard).filter(Storyboard.order.is_(None)).count() == 2
+    db.close()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        data = client.get(f"/api/projects/{project_id}/storyboards", params=params, headers=headers).json()
+        seen.extend(sb["scene_number"] for sb in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    # 顺序值：0,0,1,1,2,2,3，空值视为0，相同顺序按id排列
+    assert seen == [0, 1, 7, 8, 2, 3, 4, 5, 6]
+
+def test_invalid_cursor_rejected(project_with_storyboards):
+    """测试无效游标返回400"""
+    project_id, headers = project_with_storyboards
+    response = client.get(
+        f"/api/projects/{project_id}/storyboards", params={"cursor": "not-a-cursor"}, headers=headers
+    )
+    assert response.status_code == 400
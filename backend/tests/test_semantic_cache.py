@@ -0,0 +1,183 @@
+"""
+语义缓存测试
+"""
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import Base, engine, SessionLocal
+from app.core.security import get_password_hash, create_access_token
+from app.services.ai_service import ai_service
+from app.services.semantic_cache_service import SemanticCacheService, semantic_cache_service
+from app.models.chat import Message
+from app.models.course import Course, CourseEnrollment
+from app.models.user import User
+from main import app
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def setup_database():
+    """每个测试前重置数据库"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def cache():
+    """使用本地向量的缓存实例"""
+    service = SemanticCacheService()
+    service.backend = "local"
+    service.threshold = 0.8
+    return service
+
+@pytest.mark.asyncio
+async def test_similar_question_hits_and_different_question_misses(cache):
+    """测试措辞相近的问题命中缓存，不同的问题不命中"""
+    _, vector = await cache.lookup("什么是三分法构图？")
+    cache.store("什么是三分法构图？", "把画面横竖各分三等份", vector)
+
+    hit, _ = await cache.lookup("什么是三分法构图")
+    assert hit["answer"] == "把画面横竖各分三等份"
+    assert hit["similarity"] >= 0.99
+    hit, _ = await cache.lookup("What is the 180-degree rule")
+    assert hit is None
+
+    stats = cache.stats()
+    assert (stats["lookups"], stats["hits"], stats["misses"], stats["stores"]) == (3, 1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3, abs=1e-4)
+
+@pytest.mark.asyncio
+async def test_scoped_by_course_and_expires(cache):
+    """测试缓存按课程隔离，过期后不再命中"""
+    _, vector = await cache.lookup("what is the 180-degree rule", course_id=1)
+    cache.store("what is the 180-degree rule", "摄影机保持在轴线一侧", vector, course_id=1)
+
+    assert (await cache.lookup("What is the 180 degree rule?", course_id=2))[0] is None
+    assert (await cache.lookup("What is the 180 degree rule?", course_id=1))[0] is not None
+
+    cache._indexes["course:1"].entries[0]["expires_at"] = time.time() - 1
+    assert (await cache.lookup("What is the 180 degree rule?", course_id=1))[0] is None
+    assert cache.stats()["scopes"] == {"course:1": 0}
+
+@pytest.mark.asyncio
+async def test_purge_drops_entries_in_other_workers(cache):
+    """测试清除时间通过共享缓存同步，其他worker中更早的条目也不再命中"""
+    other_worker = SemanticCacheService()
+    other_worker.backend = "local"
+    other_worker.threshold = 0.8
+    _, vector = await other_worker.lookup("什么是正反打", course_id=3)
+    other_worker.store("什么是正反打", "对话场景的常用拍法", vector, course_id=3)
+    time.sleep(0.01)
+
+    assert await cache.purge(course_id=3) == 0
+    assert (await other_worker.lookup("什么是正反打", course_id=3))[0] is None
+
+def test_repeated_first_turn_question_skips_llm(monkeypatch):
+    """测试新会话中重复的第一个问题直接返回缓存的回答，管理员清除后重新调用大模型"""
+    db = SessionLocal()
+    db.add(User(username="student", email="s@example.com", hashed_password=get_password_hash("password"), role="student"))
+    db.add(User(username="admin", email="a@example.com", hashed_password=get_password_hash("password"), role="admin"))
+    db.commit()
+    db.add(Course(id=7, name="视听语言", teacher_id=2))
+    db.add(CourseEnrollment(course_id=7, student_id=1))
+    db.commit()
+    db.close()
+    student = {"Authorization": f"Bearer {create_access_token({'sub': 'student', 'role': 'student'})}"}
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': 'admin', 'role': 'admin'})}"}
+
+    calls = []
+
+    async def fake_completion(messages, **kwargs):
+        calls.append(messages[-1]["content"])
+        return "景别分为远景、全景、中景、近景和特写"
+
+    monkeypatch.setattr(ai_service, "chat_completion", fake_completion)
+    monkeypatch.setattr(ai_service, "is_llm_available", lambda: True)
+    monkeypatch.setattr(semantic_cache_service, "enabled", True)
+    monkeypatch.setattr(semantic_cache_service, "backend", "local")
+    question = {"message": "景别有哪些？", "course_id": 7}
+
+    first = client.post("/api/chat", json=question, headers=student).json()
+    second = client.post("/api/chat", json=question, headers=student).json()
+    assert second["message"] == first["message"]
+    assert calls == ["景别有哪些？"]
+
+    # 同一会话的后续问题有上下文，不使用缓存
+    client.post("/api/chat", json={**question, "conversation_id": second["conversation_id"]}, headers=student)
+    assert len(calls) == 2
+
+    response = client.delete("/api/admin/semantic-cache", params={"course_id": 7}, headers=admin)
+    assert response.json()["purged"] == 1
+    client.post("/api/chat", json=question, headers=student)
+    assert len(calls) == 3
+
+    db = SessionLocal()
+    cached = [m.message_metadata for m in db.query(Message).filter(Message.role == "assistant").order_by(Message.id)]
+    assert cached[1]["semantic_cache"]["similarity"] >= 0.99
+    assert cached[0] is None and cached[3] is None
+    db.close()
+    assert client.get("/api/admin/semantic-cache", headers=student).status_code == 403
+
+def test_course_scope_requires_course_access(monkeypatch):
+    """测试只能读写自己有权访问的课程的缓存：未加入的课程返回403，不存在的课程返回404"""
+    db = SessionLocal()
+    db.add(User(username="student", email="s@example.com", hashed_password=get_password_hash("password"), role="student"))
+    db.add(User(username="teacher", email="t@example.com", hashed_password=get_password_hash("password"), role="teacher"))
+    db.commit()
+    db.add(Course(id=5, name="剪辑基础", teacher_id=2))
+    db.commit()
+    db.close()
+    student = {"Authorization": f"Bearer {create_access_token({'sub': 'student', 'role': 'student'})}"}
+    teacher = {"Authorization": f"Bearer {create_access_token({'sub': 'teacher', 'role': 'teacher'})}"}
+
+    calls = []
+
+    async def fake_completion(messages, **kwargs):
+        calls.append(messages[-1]["content"])
+        return "跳切是同一镜头中省略时间的剪辑"
+
+    monkeypatch.setattr(ai_service, "chat_completion", fake_completion)
+    monkeypatch.setattr(ai_service, "is_llm_available", lambda: True)
+    monkeypatch.setattr(semantic_cache_service, "enabled", True)
+    monkeypatch.setattr(semantic_cache_service, "backend", "local")
+    stores = semantic_cache_service.stats()["stores"]
+
+    assert client.post("/api/chat", json={"message": "什么是跳切？", "course_id": 5}, headers=student).status_code == 403
+    assert client.post("/api/chat", json={"message": "什么是跳切？", "course_id": 99}, headers=teacher).status_code == 404
+    assert calls == [] and semantic_cache_service.stats()["stores"] == stores
+
+    assert client.post("/api/chat", json={"message": "什么是跳切？", "course_id": 5}, headers=teacher).status_code == 200
+    assert semantic_cache_service.stats()["stores"] == stores + 1
+
+def test_mock_reply_after_provider_failure_is_not_cached(monkeypatch):
+    """测试大模型调用失败时返回的模拟回复不写入缓存（普通请求和SSE流式请求）"""
+    db = SessionLocal()
+    db.add(User(username="student", email="s@example.com", hashed_password=get_password_hash("password"), role="student"))
+    db.commit()
+    db.close()
+    student = {"Authorization": f"Bearer {create_access_token({'sub': 'student', 'role': 'student'})}"}
+
+    class FailingProvider:
+        async def chat_completion(self, **kwargs):
+            raise RuntimeError("upstream timeout")
+
+        async def stream_chat_completion(self, **kwargs):
+            raise RuntimeError("upstream timeout")
+            yield
+
+    monkeypatch.setattr(ai_service, "dashscope_service", FailingProvider())
+    monkeypatch.setattr(ai_service, "use_dashscope", True)
+    monkeypatch.setattr(ai_service, "client", None)
+    monkeypatch.setattr(ai_service, "use_ollama_fallback", False)
+    monkeypatch.setattr(semantic_cache_service, "enabled", True)
+    monkeypatch.setattr(semantic_cache_service, "backend", "local")
+    stores = semantic_cache_service.stats()["stores"]
+
+    response = client.post("/api/chat", json={"message": "什么是蒙太奇？"}, headers=student)
+    assert response.status_code == 200
+    assert "什么是蒙太奇" in response.json()["message"]
+    with client.stream("POST", "/api/chat", json={"message": "什么是长镜头？", "stream": True}, headers=student) as response:
+        body = "".join(response.iter_text())
+    assert "event: end" in body
+
+    assert semantic_cache_service.stats()["stores"] == stores
@@ -0,0 +1,103 @@
+"""
+服务注册表（延迟构建）测试
+"""
+import threading
+from app.core.service_registry import ServiceRegistry
+
+
+class CounterService:
+    """构造时计数的测试服务"""
+    instances = 0
+
+    def __init__(self):
+        CounterService.instances += 1
+        self.name = "counter"
+
+    def greet(self, who: str) -> str:
+        return f"{self.name}: {who}"
+
+
+def test_service_built_on_first_attribute_access():
+    """测试导入（注册）时不构建，首次访问属性时构建并转发调用"""
+    CounterService.instances = 0
+    registry = ServiceRegistry()
+    service = registry.register("counter_service", CounterService)
+
+    assert CounterService.instances == 0
+    assert not registry.is_built("counter_service")
+    assert service.greet("导演") == "counter: 导演"
+    assert service.greet("编剧") == "counter: 编剧"
+    assert CounterService.instances == 1
+    assert registry.stats()[0]["built"] is True
+
+
+def test_concurrent_first_use_builds_once():
+    """测试多线程同时首次访问只构建一个实例"""
+    CounterService.instances = 0
+    registry = ServiceRegistry()
+    service = registry.register("counter_service", CounterService)
+    barrier = threading.Barrier(8)
+
+    def use():
+        barrier.wait()
+        service.greet("x")
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert CounterService.instances == 1
+
+
+def test_setattr_forwards_to_instance():
+    """测试对代理设置属性会作用于真实实例"""
+    registry = ServiceRegistry()
+    service = registry.register("counter_service", CounterService)
+    service.name = "renamed"
+    assert registry.get("counter_service").name == "renamed"
+    assert service.greet("a") == "renamed: a"
+
+
+def test_build_modules_builds_services_of_module():
+    """测试按模块构建其中注册的服务"""
+    registry = ServiceRegistry()
+    registry.register("counter_service", CounterService)
+    assert registry.build_modules([__name__]) == []
+    assert registry.is_built("counter_service")
+
+
+def test_ollama_probe_is_async_and_runs_once(monkeypatch):
+    """测试构建Ollama服务时不探测，首次使用时异步探测一次并缓存结果"""
+    import asyncio
+    import httpx
+    from app.services.ollama_service import OllamaService
+
+    probes = []
+
+    class FakeAsyncClient:
+        def __init__(self, timeout=None):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def get(self, url):
+            probes.append(url)
+            await asyncio.sleep(0)
+            return httpx.Response(200, json={"models": []})
+
+    monkeypatch.setattr(httpx, "AsyncClient", FakeAsyncClient)
+    service = OllamaService()
+    assert probes == []
+    assert not service.checked
+
+    async def first_use():
+        return await asyncio.gather(service.ensure_available(), service.ensure_available())
+
+    assert asyncio.run(first_use()) == [True, True]
+    assert asyncio.run(service.ensure_available())
+    assert len(probes) == 1
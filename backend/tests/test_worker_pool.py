@@ -0,0 +1,110 @@
+"""
+模型推理进程池测试
+"""
+import os
+import time
+import asyncio
+import pytest
+from app.core.worker_pool import (
+    ModelWorkerPool,
+    WorkerPoolBusy,
+    WorkerTaskError,
+    WorkerTimeoutError,
+)
+
+
+@pytest.fixture
+def pool():
+    """不预加载服务模块的小进程池"""
+    worker_pool = ModelWorkerPool(
+        processes=1,
+        max_queue=2,
+        task_timeout=30,
+        max_tasks_per_worker=3,
+        preload=[],
+        warmup=False
+    )
+    yield worker_pool
+    worker_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_in_worker_process(pool):
+    """测试任务在独立进程中执行并返回结果，异常带回worker的错误信息"""
+    assert await pool.run("math:sqrt", 16) == 4.0
+    assert await pool.run("os:getpid") != os.getpid()
+
+    with pytest.raises(WorkerTaskError) as exc_info:
+        await pool.run("math:sqrt", -1)
+    assert exc_info.value.exc_type == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_worker_recycled_after_max_tasks(pool):
+    """测试worker执行max_tasks个任务后被替换"""
+    first_pid = await pool.run("os:getpid")
+    await pool.run("os:getpid")
+    await pool.run("os:getpid")
+    assert await pool.run("os:getpid") != first_pid
+    assert pool.stats()["recycled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_kills_worker_and_queue_limit(pool):
+    """测试超时终止worker并重建，以及等待队列上限"""
+    started = time.perf_counter()
+    with pytest.raises(WorkerTimeoutError):
+        await pool.run("time:sleep", 30, timeout=0.5)
+    assert time.perf_counter() - started < 5
+    # 重建后的worker可以继续执行任务
+    assert await pool.run("math:sqrt", 9) == 3.0
+
+    # 1个执行中 + 2个等待，第4个被拒绝
+    tasks = [asyncio.ensure_future(pool.run("time:sleep", 0.3)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(WorkerPoolBusy):
+        await pool.run("time:sleep", 0.3)
+    await asyncio.gather(*tasks)
+    assert pool.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_thread_fallback_when_no_processes():
+    """测试进程数为0时在线程中执行"""
+    worker_pool = ModelWorkerPool(processes=0)
+    assert await worker_pool.run("os:getpid") == os.getpid()
+
+
+def register_dummy_model():
+    """在worker中注册并加载一个测试模型（run_on_all的任务目标）"""
+    from app.core.model_manager import model_manager
+    model_manager.register_model("dummy", lambda: [1, 2, 3], {"size_mb": 1})
+    return model_manager.get_model("dummy") is not None
+
+
+@pytest.mark.asyncio
+async def test_model_actions_run_in_workers(pool):
+    """测试模型管理操作在worker中执行，worker上报的驻留情况反映固定状态"""
+    results = await pool.run_on_all("os:getpid")
+    assert [r["result"] for r in results] == [r["pid"] for r in results]
+    assert results[0]["pid"] != os.getpid()
+
+    results = await pool.apply_model_action("pin", "dummy")
+    assert results[0]["exc_type"] == "ValueError"
+    assert pool.pinned_models == set()
+
+    assert (await pool.run_on_all("tests.test_worker_pool:register_dummy_model"))[0]["result"] is True
+    results = await pool.apply_model_action("pin", "dummy")
+    assert results[0]["result"]["loaded"] and results[0]["result"]["pinned"]
+    assert pool.pinned_models == {"dummy"}
+
+    # 驻留情况在任务完成后上报
+    for _ in range(50):
+        models = pool.residency()[0].get("models", {})
+        if models.get("dummy", {}).get("pinned"):
+            break
+        await asyncio.sleep(0.05)
+    assert models["dummy"]["pinned"]
+    assert pool.stats()["workers"][0]["loaded_models"] == ["dummy"]
+    # run_on_all的任务不计入推理任务统计
+    assert pool.stats()["completed"] == 0
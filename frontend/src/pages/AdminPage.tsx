@@ -1,7 +1,7 @@
 import { useEffect, useState } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { Users, BookOpen, Settings, BarChart3, Shield, Trash2, Edit } from 'lucide-react'
-import { api } from '../utils/api'
+import { api, fetchAllPages } from '../utils/api'
 
 interface User {
   id: number
@@ -56,8 +56,7 @@ export default function AdminPage() {
 
   const loadUsers = async () => {
     try {
-      const res = await api.get('/api/admin/users')
-      setUsers(res.data)
+      setUsers(await fetchAllPages<User>('/api/admin/users'))
     } catch (error: any) {
       console.error('加载用户失败:', error)
       if (error.response?.status === 403) {
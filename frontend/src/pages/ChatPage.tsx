@@ -1,7 +1,7 @@
 import { useState, useRef, useEffect } from 'react'
 import { Send, User, Loader2 } from 'lucide-react'
 import ReactMarkdown from 'react-markdown'
-import { chatApi, ChatMessage } from '../utils/api'
+import { chatApi, ChatMessage, ChatStreamEvent } from '../utils/api'
 
 export default function ChatPage() {
   const [messages, setMessages] = useState<ChatMessage[]>([])
@@ -10,6 +10,9 @@ export default function ChatPage() {
   const [conversationId, setConversationId] = useState<string | null>(null)
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const wsRef = useRef<WebSocket | null>(null)
+  // WebSocket无法建立（如代理不支持升级）时改用SSE流式接口
+  const useSseRef = useRef(false)
+  const sseAbortRef = useRef<AbortController | null>(null)
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' })
@@ -19,50 +22,100 @@ export default function ChatPage() {
     scrollToBottom()
   }, [messages])
 
-  const connectWebSocket = () => {
+  // 离开页面时中止进行中的SSE请求（服务端随之停止生成）
+  useEffect(() => () => sseAbortRef.current?.abort(), [])
+
+  const appendChunk = (content: string) => {
+    setMessages((prev) => {
+      // 创建新数组，避免直接修改原数组
+      const newMessages = prev.map(msg => ({ ...msg }))
+      const lastMessage = newMessages[newMessages.length - 1]
+      if (lastMessage && lastMessage.role === 'assistant') {
+        // 直接追加新内容（服务端按时间/大小合并的增量，不需要检查重复）
+        lastMessage.content = (lastMessage.content || '') + content
+      }
+      return newMessages
+    })
+  }
+
+  // WebSocket的JSON控制消息与SSE事件格式相同
+  const handleStreamEvent = (data: ChatStreamEvent | { type: 'session'; conversation_id: string }) => {
+    if (data.type === 'session') {
+      setConversationId(data.conversation_id)
+    } else if (data.type === 'start') {
+      if (data.conversation_id) setConversationId(data.conversation_id)
+      setMessages((prev) => [
+        ...prev,
+        { role: 'assistant', content: '' },
+      ])
+      setLoading(true)
+    } else if (data.type === 'chunk') {
+      appendChunk(data.content || '')
+    } else if (data.type === 'end') {
+      setLoading(false)
+      scrollToBottom()
+    } else if (data.type === 'error') {
+      setLoading(false)
+      alert(`错误: ${data.message}`)
+    }
+  }
+
+  const streamOverSse = async (messageContent: string) => {
+    const controller = new AbortController()
+    sseAbortRef.current = controller
+    try {
+      await chatApi.streamMessage(
+        { message: messageContent, conversation_id: conversationId || undefined },
+        handleStreamEvent,
+        controller.signal
+      )
+    } catch (error) {
+      if (!controller.signal.aborted) {
+        console.error('流式对话失败:', error)
+        alert('发送失败，请稍后重试')
+      }
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  const connectWebSocket = (pendingMessage?: string) => {
     // 使用相对路径，通过nginx代理
     const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
     const wsHost = window.location.host
-    const ws = new WebSocket(`${wsProtocol}//${wsHost}/api/chat/ws`)
+    // 回复增量使用二进制帧（UTF-8文本），控制消息仍为JSON
+    const ws = new WebSocket(`${wsProtocol}//${wsHost}/api/chat/ws?frames=binary`)
+    ws.binaryType = 'arraybuffer'
+    const decoder = new TextDecoder()
+    let opened = false
     
     ws.onopen = () => {
+      opened = true
       console.log('WebSocket连接已建立')
+      if (pendingMessage) {
+        ws.send(JSON.stringify({ message: pendingMessage }))
+      }
     }
 
     ws.onmessage = (event) => {
-      const data = JSON.parse(event.data)
-      
-      if (data.type === 'session') {
-        setConversationId(data.conversation_id)
-      } else if (data.type === 'start') {
-        setMessages((prev) => [
-          ...prev,
-          { role: 'assistant', content: '' },
-        ])
-        setLoading(true)
-      } else if (data.type === 'chunk') {
-        setMessages((prev) => {
-          // 创建新数组，避免直接修改原数组
-          const newMessages = prev.map(msg => ({ ...msg }))
-          const lastMessage = newMessages[newMessages.length - 1]
-          if (lastMessage && lastMessage.role === 'assistant') {
-            // 直接追加新内容（流式传输是逐字符的，不需要检查重复）
-            const newContent = data.content || ''
-            lastMessage.content = (lastMessage.content || '') + newContent
-          }
-          return newMessages
-        })
-      } else if (data.type === 'end') {
-        setLoading(false)
-        scrollToBottom()
-      } else if (data.type === 'error') {
-        setLoading(false)
-        alert(`错误: ${data.message}`)
+      if (event.data instanceof ArrayBuffer) {
+        appendChunk(decoder.decode(event.data))
+        return
       }
+      handleStreamEvent(JSON.parse(event.data))
     }
 
     ws.onerror = (error) => {
       console.error('WebSocket错误:', error)
+      if (!opened) {
+        // 连接未能建立，之后的消息改用SSE发送
+        console.log('WebSocket不可用，改用SSE流式对话')
+        useSseRef.current = true
+        if (pendingMessage) {
+          streamOverSse(pendingMessage)
+          return
+        }
+      }
       setLoading(false)
     }
 
@@ -88,14 +141,14 @@ export default function ChatPage() {
     setInput('')
     setLoading(true)
 
-    // 确保WebSocket连接
+    if (useSseRef.current) {
+      streamOverSse(messageContent)
+      return
+    }
+
+    // 确保WebSocket连接（连接建立后发送消息）
     if (!wsRef.current || wsRef.current.readyState === WebSocket.CLOSED) {
-      const ws = connectWebSocket()
-      // 等待连接建立
-      ws.onopen = () => {
-        console.log('WebSocket连接已建立，发送消息')
-        ws.send(JSON.stringify({ message: messageContent }))
-      }
+      connectWebSocket(messageContent)
     } else if (wsRef.current.readyState === WebSocket.CONNECTING) {
       // 如果正在连接，等待连接完成
       const checkConnection = setInterval(() => {
@@ -105,10 +158,7 @@ export default function ChatPage() {
         } else if (wsRef.current && wsRef.current.readyState === WebSocket.CLOSED) {
           clearInterval(checkConnection)
           // 重新连接
-          const ws = connectWebSocket()
-          ws.onopen = () => {
-            ws.send(JSON.stringify({ message: messageContent }))
-          }
+          connectWebSocket(messageContent)
         }
       }, 100)
     } else if (wsRef.current.readyState === WebSocket.OPEN) {
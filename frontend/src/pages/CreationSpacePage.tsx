@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react'
 import { Plus, FileText, Image, Play, Edit, Trash2, PenTool, Sparkles, Wand2, Loader2, Save, X } from 'lucide-react'
-import { api } from '../utils/api'
+import { api, fetchAllPages } from '../utils/api'
 import InspirationDice from '../components/InspirationDice'
 import AgentCharacter from '../components/AgentCharacter'
 
@@ -76,8 +76,7 @@ export default function CreationSpacePage() {
     }
     
     try {
-      const res = await api.get('/api/projects/')
-      setProjects(res.data)
+      setProjects(await fetchAllPages<Project>('/api/projects/'))
     } catch (error: any) {
       if (error.code !== 'ERR_NETWORK' && error.response?.status !== 401) {
         console.error('加载项目失败:', error)
@@ -119,8 +118,7 @@ export default function CreationSpacePage() {
 
   const loadStoryboards = async (projectId: number) => {
     try {
-      const res = await api.get(`/api/projects/${projectId}/storyboards`)
-      setStoryboards(res.data)
+      setStoryboards(await fetchAllPages<Storyboard>(`/api/projects/${projectId}/storyboards`))
     } catch (error: any) {
       if (error.code !== 'ERR_NETWORK') {
         console.error('加载分镜失败:', error)
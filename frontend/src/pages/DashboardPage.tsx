@@ -1,7 +1,7 @@
 import { useEffect, useState } from 'react'
 import { Link } from 'react-router-dom'
 import { BookOpen, PenTool, FileText, Video, TrendingUp } from 'lucide-react'
-import { api } from '../utils/api'
+import { api, fetchAllPages } from '../utils/api'
 import AgentCharacter from '../components/AgentCharacter'
 import WordCloud from '../components/WordCloud'
 
@@ -38,10 +38,10 @@ export default function DashboardPage() {
     try {
       const [coursesRes, projectsRes] = await Promise.all([
         api.get('/api/courses/'),
-        api.get('/api/projects/')
+        fetchAllPages<Project>('/api/projects/')
       ])
       setCourses(coursesRes.data)
-      setProjects(projectsRes.data)
+      setProjects(projectsRes)
     } catch (error: any) {
       if (error.code !== 'ERR_NETWORK') {
         console.error('加载数据失败:', error)
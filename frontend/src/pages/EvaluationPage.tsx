@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react'
 import { FileText, Star, TrendingUp, Download, Sparkles, MessageSquare } from 'lucide-react'
-import { api } from '../utils/api'
+import { api, fetchAllPages } from '../utils/api'
 
 interface Evaluation {
   id: number
@@ -49,10 +49,10 @@ export default function EvaluationPage() {
 
   const loadProjects = async () => {
     try {
-      const res = await api.get('/api/projects/')
-      setProjects(res.data)
-      if (res.data.length > 0) {
-        setSelectedProjectId(res.data[0].id)
+      const projects = await fetchAllPages<Project>('/api/projects/')
+      setProjects(projects)
+      if (projects.length > 0) {
+        setSelectedProjectId(projects[0].id)
       }
     } catch (error: any) {
       if (error.code !== 'ERR_NETWORK') {
@@ -85,6 +85,27 @@ api.interceptors.response.use(
   }
 )
 
+// 键集分页响应：next_cursor 为空表示没有下一页
+export interface Page<T> {
+  items: T[]
+  next_cursor: string | null
+  total?: number | null
+}
+
+// 按 next_cursor 依次请求，取回分页列表接口的全部数据
+export async function fetchAllPages<T>(url: string, params: Record<string, any> = {}): Promise<T[]> {
+  const items: T[] = []
+  let cursor: string | null = null
+  do {
+    const response: { data: Page<T> } = await api.get<Page<T>>(url, {
+      params: { ...params, limit: 200, ...(cursor ? { cursor } : {}) },
+    })
+    items.push(...response.data.items)
+    cursor = response.data.next_cursor
+  } while (cursor)
+  return items
+}
+
 export interface ChatMessage {
   role: 'user' | 'assistant' | 'system'
   content: string
@@ -95,6 +116,8 @@ export interface ChatRequest {
   message: string
   conversation_id?: string
   stream?: boolean
+  course_id?: number
+  use_cache?: boolean
 }
 
 export interface ChatResponse {
@@ -104,6 +127,12 @@ export interface ChatResponse {
   timestamp: string
 }
 
+export type ChatStreamEvent =
+  | { type: 'start'; conversation_id: string; role: string }
+  | { type: 'chunk'; content: string }
+  | { type: 'end'; conversation_id: string; metrics: { ttft_ms: number; tokens: number; tokens_per_second: number | null } }
+  | { type: 'error'; message: string }
+
 export interface Conversation {
   id: string
   title: string
@@ -125,16 +154,54 @@ export const chatApi = {
     return response.data
   },
   
+  // 流式对话（SSE），不需要WebSocket；signal中止时服务端会停止生成
+  streamMessage: async (
+    request: ChatRequest,
+    onEvent: (event: ChatStreamEvent) => void,
+    signal?: AbortSignal
+  ): Promise<void> => {
+    const token = localStorage.getItem('access_token')
+    const response = await fetch(`${API_URL}/api/chat`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify({ ...request, stream: true }),
+      signal,
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`流式对话请求失败: ${response.status}`)
+    }
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const blocks = buffer.split('\n\n')
+      buffer = blocks.pop() || ''
+      for (const block of blocks) {
+        const fields: Record<string, string> = {}
+        for (const line of block.split('\n')) {
+          const index = line.indexOf(': ')
+          if (index > 0) fields[line.slice(0, index)] = line.slice(index + 2)
+        }
+        if (fields.event && fields.data) {
+          onEvent({ type: fields.event, ...JSON.parse(fields.data) } as ChatStreamEvent)
+        }
+      }
+    }
+  },
+  
   getConversations: async (): Promise<Conversation[]> => {
     const response = await api.get<Conversation[]>('/api/conversations')
     return response.data
   },
   
   getMessages: async (conversationId: string): Promise<ChatMessage[]> => {
-    const response = await api.get<ChatMessage[]>(
-      `/api/conversations/${conversationId}/messages`
-    )
-    return response.data
+    return fetchAllPages<ChatMessage>(`/api/conversations/${conversationId}/messages`)
   },
 }
 
@@ -158,8 +225,7 @@ export const knowledgeApi = {
   },
   
   getDocuments: async (): Promise<Document[]> => {
-    const response = await api.get<Document[]>('/api/knowledge/documents')
-    return response.data
+    return fetchAllPages<Document>('/api/knowledge/documents')
   },
   
   deleteDocument: async (documentId: number): Promise<void> => {